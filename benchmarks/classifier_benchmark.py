@@ -0,0 +1,92 @@
+# Built-in imports
+from argparse import ArgumentParser
+from pathlib import Path
+from random import Random
+from re import match as re_match
+from sys import path as sys_path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+# Local imports
+sys_path.insert(0, Path(__file__).resolve().parent.parent.joinpath('src').as_posix())
+
+from utils.classifier import url_regexes, classify_url, is_url_input
+from utils.general import is_valid_url, iter_lines_from_file
+
+
+def generate_input_file(path: Path, line_count: int, duplicate_ratio: float = 0.2, seed: int = 0) -> None:
+    """
+    Generate an input file with a realistic mix of URL forms, playlists, queries and duplicate lines.
+    :param path: The path to the generated file.
+    :param line_count: The number of lines.
+    :param duplicate_ratio: The fraction of lines that repeat an earlier line.
+    :param seed: The random seed.
+    """
+
+    random = Random(seed)
+    alphabet = 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789-_'
+    templates = [
+        'https://www.youtube.com/watch?v={}',
+        'https://youtu.be/{}?si=abcdef',
+        'https://www.youtube.com/shorts/{}',
+        'https://music.youtube.com/watch?v={}&feature=share',
+        'https://www.youtube.com/playlist?list=PL{}',
+        'artist {} - song title (official audio)'
+    ]
+    lines = []
+
+    for _ in range(line_count):
+        if lines and random.random() < duplicate_ratio:
+            lines.append(random.choice(lines))
+        else:
+            lines.append(random.choice(templates).format(''.join(random.choice(alphabet) for _ in range(11))))
+
+    path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+
+def run_legacy(path: Path) -> int:
+    lines = list(set([line.strip() for line in path.read_text('utf-8').splitlines() if line.strip()]))
+    urls = [line for line in lines if is_valid_url(line, online_check=False)]
+
+    for url in urls:
+        for regexes in url_regexes.values():
+            if not re_match(regexes['playlist'], url):
+                re_match(regexes['single'], url)
+
+    return len(lines)
+
+def run_streaming(path: Path) -> int:
+    line_count = 0
+
+    for line in iter_lines_from_file(path, fix_lines=True):
+        line_count += 1
+
+        if is_url_input(line):
+            classify_url(line)
+
+    return line_count
+
+def main() -> None:
+    parser = ArgumentParser(description='Measure the input classification throughput (lines per second).')
+    parser.add_argument('--lines', type=int, nargs='+', default=[10000, 100000, 500000], help='Input sizes in lines')
+    parser.add_argument('--skip-legacy', action='store_true', help='Only measure the streaming classifier')
+    args = parser.parse_args()
+
+    print(f'{"lines":>10} {"engine":>10} {"unique":>10} {"time (s)":>9} {"lines/s":>12}')
+
+    with TemporaryDirectory(prefix='syncgroove-bench-') as temporary_dir:
+        for line_count in args.lines:
+            input_path = Path(temporary_dir, f'input_{line_count}.txt')
+            generate_input_file(input_path, line_count)
+
+            engines = [('streaming', run_streaming)] + ([] if args.skip_legacy else [('legacy', run_legacy)])
+
+            for engine_name, engine_func in engines:
+                start_time = perf_counter()
+                unique_lines = engine_func(input_path)
+                elapsed_time = perf_counter() - start_time
+
+                print(f'{line_count:>10} {engine_name:>10} {unique_lines:>10} {elapsed_time:>9.3f} {line_count / elapsed_time:>12,.0f}')
+
+
+if __name__ == '__main__':
+    main()
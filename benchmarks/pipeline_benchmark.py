@@ -0,0 +1,379 @@
+# Built-in imports
+from argparse import ArgumentParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from json import dumps, loads
+from pathlib import Path
+from re import compile as re_compile
+from resource import getrusage, RUSAGE_SELF, RUSAGE_CHILDREN
+from subprocess import run as subprocess_run, PIPE
+from sys import executable, modules, path as sys_path, platform
+from tempfile import TemporaryDirectory
+from threading import Lock, Thread
+from time import perf_counter, sleep, time
+from types import ModuleType
+from typing import Any, Dict, List, Optional
+
+# Local imports
+sys_path.insert(0, Path(__file__).resolve().parent.parent.joinpath('src').as_posix())
+
+from utils.functions import get_ffmpeg_binary
+
+
+range_regex = re_compile(r'bytes=(\d*)-(\d*)')
+playlist_id_regex = re_compile(r'list=PLbench_(\d+)_(\d+)')
+thumbnail_count = 10
+
+
+class Throttle:
+    """
+    A bandwidth limit shared by every connection of the local server.
+    """
+
+    def __init__(self, bandwidth: float) -> None:
+        """
+        Initialize the Throttle class.
+        :param bandwidth: The bandwidth in Mbps (0 disables the limit).
+        """
+
+        self.rate: float = bandwidth * 1_000_000 / 8
+        self._next_time = 0.0
+        self._lock = Lock()
+
+    def consume(self, size: int) -> None:
+        if not self.rate:
+            return
+
+        with self._lock:
+            now = perf_counter()
+            self._next_time = max(self._next_time, now) + size / self.rate
+            delay = self._next_time - now
+
+        if delay > 0:
+            sleep(delay)
+
+
+def create_server(files: Dict[str, bytes], latency: float, bandwidth: float) -> ThreadingHTTPServer:
+    """
+    Create a local HTTP server that stands in for the YouTube CDN (audio streams and thumbnails), with range request support.
+    :param files: The content served for each path prefix ("/audio/" and "/thumbnails/<index>.jpg").
+    :param latency: The delay before each response, in seconds.
+    :param bandwidth: The total bandwidth of the server, in Mbps (0 disables the limit).
+    :return: The ThreadingHTTPServer object (not started).
+    """
+
+    throttle = Throttle(bandwidth)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *_: Any) -> None:
+            pass
+
+        def get_content(self) -> Optional[bytes]:
+            path = self.path.split('?')[0]
+
+            if path.startswith('/audio/'):
+                return files['/audio/']
+
+            return files.get(path)
+
+        def send_content_headers(self) -> Optional[bytes]:
+            sleep(latency)
+            content = self.get_content()
+
+            if content is None:
+                self.send_response(404)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return None
+
+            start, end = 0, len(content) - 1
+            match = range_regex.fullmatch(self.headers.get('Range', ''))
+
+            if match and (match.group(1) or match.group(2)):
+                if match.group(1):
+                    start = int(match.group(1))
+                    end = min(end, int(match.group(2))) if match.group(2) else end
+                else:
+                    start = max(0, len(content) - int(match.group(2)))
+
+                self.send_response(206)
+                self.send_header('Content-Range', f'bytes {start}-{end}/{len(content)}')
+            else:
+                self.send_response(200)
+
+            self.send_header('Content-Type', 'audio/webm' if self.path.startswith('/audio/') else 'image/jpeg')
+            self.send_header('Content-Length', str(end - start + 1))
+            self.send_header('Accept-Ranges', 'bytes')
+            self.end_headers()
+
+            return content[start:end + 1]
+
+        def do_HEAD(self) -> None:
+            self.send_content_headers()
+
+        def do_GET(self) -> None:
+            content = self.send_content_headers()
+
+            if not content:
+                return
+
+            for offset in range(0, len(content), 65536):
+                chunk = content[offset:offset + 65536]
+                throttle.consume(len(chunk))
+
+                try:
+                    self.wfile.write(chunk)
+                except (BrokenPipeError, ConnectionResetError):
+                    return
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+
+    return server
+
+def generate_synthetic_audio(ffmpeg_path: str, duration: int, codec: str) -> bytes:
+    """
+    Generate a synthetic stereo audio stream, similar to a YouTube audio stream.
+    :param ffmpeg_path: The path to the FFmpeg binary.
+    :param duration: The duration in seconds.
+    :param codec: "opus" (WebM, copied without re-encoding) or "aac" (M4A, re-encoded).
+    :return: The file content.
+    """
+
+    codec_args = ['-c:a', 'libopus', '-b:a', '128k', '-f', 'webm'] if codec == 'opus' else ['-c:a', 'aac', '-b:a', '128k', '-f', 'ipod', '-movflags', '+frag_keyframe+empty_moov']
+    command = [
+        ffmpeg_path, '-hide_banner', '-nostdin', '-loglevel', 'error',
+        '-f', 'lavfi', '-i', f'sine=frequency=440:sample_rate=48000:duration={duration}',
+        '-f', 'lavfi', '-i', f'anoisesrc=color=pink:sample_rate=48000:duration={duration}',
+        '-filter_complex', '[0:a][1:a]amerge=inputs=2[a]', '-map', '[a]',
+        *codec_args, 'pipe:1'
+    ]
+
+    return subprocess_run(command, stdout=PIPE, check=True).stdout
+
+def generate_thumbnails(count: int) -> Dict[str, bytes]:
+    """
+    Generate distinct 1280x720 JPEG thumbnails (the tracks share them, like videos of the same channel often do).
+    :param count: The number of thumbnails.
+    :return: The content of each thumbnail, by server path.
+    """
+
+    from PIL import Image
+
+    thumbnails = {}
+
+    for index in range(count):
+        output = BytesIO()
+        Image.new('RGB', (1280, 720), ((index * 40) % 256, (index * 90) % 256, (index * 150) % 256)).save(output, format='JPEG', quality=90)
+        thumbnails[f'/thumbnails/{index}.jpg'] = output.getvalue()
+
+    return thumbnails
+
+def build_input_lines(track_count: int) -> List[str]:
+    """
+    Build the input of a scenario: three quarters of the tracks as video URLs and the rest as a single playlist.
+    :param track_count: The number of tracks.
+    :return: The input lines.
+    """
+
+    playlist_size = track_count // 4
+    lines = [f'https://www.youtube.com/watch?v=bench{index:06d}' for index in range(track_count - playlist_size)]
+
+    if playlist_size:
+        lines.append(f'https://www.youtube.com/playlist?list=PLbench_{track_count - playlist_size}_{playlist_size}')
+
+    return lines
+
+def install_fake_streamsnapper(base_url: str, extract_latency: float, codec: str) -> None:
+    """
+    Replace the streamsnapper module with a fake extractor that answers from the local server, without any network access.
+    :param base_url: The base URL of the local server.
+    :param extract_latency: The simulated duration of each extraction, search and playlist request, in seconds.
+    :param codec: The codec of the served audio stream ("opus" or "aac").
+    """
+
+    from utils.classifier import extract_video_id
+
+    extension = 'webm' if codec == 'opus' else 'm4a'
+    itag = 251 if codec == 'opus' else 140
+
+    class InformationStructure:
+        # Same layout as the streamsnapper structure (private attributes behind read-only properties), so the extraction cache is benchmarked with the real shape
+        def __init__(self, **fields: Any) -> None:
+            for key, value in fields.items():
+                setattr(self, f'_{key}', value)
+
+        def __getattr__(self, name: str) -> Any:
+            try:
+                return self.__dict__[f'_{name}']
+            except KeyError:
+                raise AttributeError(name) from None
+
+        def to_dict(self) -> Dict[str, Any]:
+            return dict(sorted({key[1:]: value for key, value in self.__dict__.items()}.items()))
+
+    class YouTube:
+        def __init__(self, logging: bool = False) -> None:
+            self._video_id: Optional[str] = None
+            self.information: Any = None
+            self.best_audio_stream: Optional[Dict[str, Any]] = None
+
+        def extract(self, url: str) -> None:
+            sleep(extract_latency)
+            self._video_id = extract_video_id(url)
+
+        def analyze_information(self, check_thumbnails: bool = False, retrieve_dislike_count: bool = False) -> None:
+            index = int(self._video_id[5:])
+            self.information = InformationStructure(
+                id=self._video_id,
+                title=f'Benchmark Track {index}',
+                cleanTitle=f'Benchmark Track {index}',
+                channelName=f'Benchmark Channel {index % thumbnail_count}',
+                uploadTimestamp=1_700_000_000 + index,
+                thumbnails=[f'{base_url}/thumbnails/{index % thumbnail_count}.jpg']
+            )
+
+        def analyze_audio_streams(self, preferred_language: str = 'local') -> None:
+            self.best_audio_stream = {
+                'url': f'{base_url}/audio/{self._video_id}.{extension}?expire={int(time()) + 6 * 3600}',
+                'itag': itag,
+                'codec': codec,
+                'extension': extension,
+                'bitrate': 128
+            }
+
+    class YouTubeExtractor:
+        def get_playlist_videos(self, url: str) -> List[str]:
+            sleep(extract_latency)
+            start, count = map(int, playlist_id_regex.search(url).groups())
+
+            return [f'https://www.youtube.com/watch?v=bench{index:06d}' for index in range(start, start + count)]
+
+        def search(self, query: str) -> List[str]:
+            sleep(extract_latency)
+
+            return [f'https://www.youtube.com/watch?v=bench{abs(hash(query)) % 1_000_000:06d}']
+
+    module = ModuleType('streamsnapper')
+    module.YouTube = YouTube
+    module.YouTubeExtractor = YouTubeExtractor
+    modules['streamsnapper'] = module
+
+def run_worker(track_count: int, base_url: str, working_dir: str, extract_latency: float, codec: str) -> None:
+    """
+    Run one scenario through the real classify -> extract -> download -> transcode -> tag flow and print its measurements as JSON.
+    :param track_count: The number of tracks.
+    :param base_url: The base URL of the local server.
+    :param working_dir: The directory where the outputs and the state files are written.
+    :param extract_latency: The simulated extraction latency, in seconds.
+    :param codec: The codec of the served audio stream.
+    """
+
+    install_fake_streamsnapper(base_url, extract_latency, codec)
+
+    from utils.bandwidth import BandwidthManager
+    from utils.classifier import iter_track_urls
+    from utils.config import Config
+    from utils.metrics import get_metrics
+    from utils.pipeline import TrackJob, build_track_pipeline
+    from utils.policy import TranscodeStats
+    from utils.transcoder import TranscodePool
+
+    class BenchmarkConfig(Config):
+        default_downloaded_musics_path = Path(working_dir, 'music').as_posix()
+        covers_path = Path(working_dir, 'covers').as_posix()
+        incomplete_downloads_path = Path(working_dir, 'music', '.incomplete').as_posix()
+
+    Path(BenchmarkConfig.default_downloaded_musics_path).mkdir(parents=True, exist_ok=True)
+    metrics = get_metrics()
+    metrics.enabled = True
+
+    completion_times: List[float] = []
+    start_time = perf_counter()
+
+    # The input is resolved while the first tracks are already in the pipeline, as in a real run
+    urls = iter_track_urls(build_input_lines(track_count), BenchmarkConfig.search_workers, None, BenchmarkConfig.playlist_workers, BenchmarkConfig.ingestion_buffer_size)
+
+    with BandwidthManager(Path(working_dir, 'bandwidth.json'), BenchmarkConfig.max_bandwidth, BenchmarkConfig.max_download_connections, BenchmarkConfig.download_workers) as bandwidth_manager, TranscodePool(BenchmarkConfig.transcode_workers) as transcode_pool:
+        pipeline = build_track_pipeline(BenchmarkConfig, bandwidth_manager, TranscodeStats(), transcode_pool)
+        finished_jobs = pipeline.run((TrackJob(url) for url in urls), on_complete=lambda job: completion_times.append(perf_counter() - start_time))
+
+    elapsed_time = perf_counter() - start_time
+    self_usage, children_usage = getrusage(RUSAGE_SELF), getrusage(RUSAGE_CHILDREN)
+    cpu_time = self_usage.ru_utime + self_usage.ru_stime + children_usage.ru_utime + children_usage.ru_stime
+    succeeded = sum(1 for job in finished_jobs if job.succeeded)
+    errors = [f'{job.failed_stage}: {job.error}' for job in finished_jobs if not job.succeeded]
+
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    divisor = 1024 * 1024 if platform == 'darwin' else 1024
+
+    print(dumps({
+        'tracks': track_count,
+        'succeeded': succeeded,
+        'first_error': errors[0] if errors else None,
+        'wall_time': round(elapsed_time, 3),
+        'first_track_time': round(completion_times[0], 3) if completion_times else None,
+        'tracks_per_minute': round(succeeded / elapsed_time * 60, 1) if elapsed_time else 0.0,
+        'cpu_time': round(cpu_time, 3),
+        'cpu_percent': round(cpu_time / elapsed_time * 100, 1) if elapsed_time else 0.0,
+        'python_peak_rss_mib': round(self_usage.ru_maxrss / divisor, 1),
+        'children_peak_rss_mib': round(children_usage.ru_maxrss / divisor, 1),
+        'stages': {name: stage['mean_seconds'] for name, stage in metrics.get_report()['stages'].items()}
+    }))
+
+def main() -> None:
+    parser = ArgumentParser(description='Run the whole pipeline offline, against a fake extractor and a local HTTP server, and measure its throughput.')
+    parser.add_argument('--tracks', type=int, nargs='+', default=[1, 100, 1000], help='Number of tracks of each scenario')
+    parser.add_argument('--duration', type=int, default=180, help='Duration of the synthetic audio stream, in seconds')
+    parser.add_argument('--codec', default='opus', choices=['opus', 'aac'], help='Codec of the served stream ("opus" is copied, "aac" is re-encoded)')
+    parser.add_argument('--latency', type=float, default=0.05, help='Delay before each HTTP response, in seconds')
+    parser.add_argument('--bandwidth', type=float, default=0, help='Total bandwidth of the local server, in Mbps (0 is unlimited)')
+    parser.add_argument('--extract-latency', type=float, default=0.2, help='Simulated duration of each extraction, in seconds')
+    args = parser.parse_args()
+
+    ffmpeg_path = get_ffmpeg_binary()
+
+    if not ffmpeg_path:
+        raise SystemExit('FFmpeg was not found in the system PATH.')
+
+    files = {'/audio/': generate_synthetic_audio(ffmpeg_path, args.duration, args.codec), **generate_thumbnails(thumbnail_count)}
+
+    # The server runs in this process, so its CPU time is not counted in the measurements of the scenarios
+    server = create_server(files, args.latency, args.bandwidth)
+    Thread(target=server.serve_forever, name='benchmark-server', daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_address[1]}'
+    results: List[Dict] = []
+
+    try:
+        for track_count in args.tracks:
+            # Every scenario runs in a fresh interpreter, so peak RSS values and caches are not shared between scenarios
+            with TemporaryDirectory(prefix='syncgroove-bench-') as working_dir:
+                process = subprocess_run([executable, __file__, '--worker', str(track_count), base_url, working_dir, str(args.extract_latency), args.codec], stdout=PIPE, check=True)
+                results.append(loads(process.stdout.decode('utf-8').strip().splitlines()[-1]))
+    finally:
+        server.shutdown()
+
+    print(f'{"tracks":>7} {"ok":>6} {"wall (s)":>9} {"first (s)":>10} {"tracks/min":>11} {"CPU (%)":>8} {"python RSS (MiB)":>17} {"children RSS (MiB)":>19}')
+
+    for result in results:
+        print(f'{result["tracks"]:>7} {result["succeeded"]:>6} {result["wall_time"]:>9} {str(result["first_track_time"]):>10} {result["tracks_per_minute"]:>11} {result["cpu_percent"]:>8} {result["python_peak_rss_mib"]:>17} {result["children_peak_rss_mib"]:>19}')
+
+    for result in results:
+        print(f'\n{result["tracks"]} track(s), mean time per span: ' + ', '.join(f'{name} {seconds:.3f} s' for name, seconds in result['stages'].items()))
+
+        if result['first_error']:
+            print(f'First error: {result["first_error"]}')
+
+
+if __name__ == '__main__':
+    worker_parser = ArgumentParser(add_help=False)
+    worker_parser.add_argument('--worker', nargs=5)
+    worker_args, _ = worker_parser.parse_known_args()
+
+    if worker_args.worker:
+        track_count, base_url, working_dir, extract_latency, codec = worker_args.worker
+        run_worker(int(track_count), base_url, working_dir, float(extract_latency), codec)
+    else:
+        main()
@@ -0,0 +1,80 @@
+# Built-in imports
+from argparse import ArgumentParser
+from os import environ, read as os_read
+from pathlib import Path
+from selectors import DefaultSelector, EVENT_READ
+from statistics import median
+from subprocess import Popen, PIPE, STDOUT
+from sys import executable
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from typing import Optional
+
+
+script_path = Path(__file__).resolve().parent.parent.joinpath('src', 'syncgroove.py')
+prompt_markers = ('›'.encode('utf-8'),)
+
+
+def measure_time_to_first_prompt(working_dir: str, timeout: float) -> Optional[float]:
+    """
+    Start the application and measure the time until its first interactive prompt is printed.
+    :param working_dir: The working directory (the application creates its data folder there).
+    :param timeout: The maximum time to wait, in seconds.
+    :return: The elapsed time in seconds or None if no prompt was seen before the timeout.
+    """
+
+    start_time = perf_counter()
+    process = Popen([executable, script_path.as_posix()], cwd=working_dir, stdin=PIPE, stdout=PIPE, stderr=STDOUT, env={**environ, 'PYTHONIOENCODING': 'utf-8'})
+    selector = DefaultSelector()
+    selector.register(process.stdout, EVENT_READ)
+    output = b''
+    elapsed_time = None
+
+    try:
+        while perf_counter() - start_time < timeout:
+            if not selector.select(timeout=0.05):
+                if process.poll() is not None:
+                    break
+
+                continue
+
+            chunk = os_read(process.stdout.fileno(), 65536)
+
+            if not chunk:
+                break
+
+            output += chunk
+
+            if any(marker in output for marker in prompt_markers):
+                elapsed_time = perf_counter() - start_time
+                break
+    finally:
+        process.kill()
+        process.wait()
+        selector.close()
+
+    return elapsed_time
+
+def main() -> None:
+    parser = ArgumentParser(description='Measure the application time-to-first-prompt.')
+    parser.add_argument('--runs', type=int, default=5, help='Number of measured runs')
+    parser.add_argument('--timeout', type=float, default=120, help='Maximum time to wait for the prompt, per run')
+    args = parser.parse_args()
+
+    with TemporaryDirectory(prefix='syncgroove-bench-') as working_dir:
+        # The first run fills the caches (FFmpeg path, version check), it is reported separately
+        cold_time = measure_time_to_first_prompt(working_dir, args.timeout)
+        warm_times = [measure_time_to_first_prompt(working_dir, args.timeout) for _ in range(args.runs)]
+
+    warm_times = [warm_time for warm_time in warm_times if warm_time is not None]
+
+    print(f'Cold start: {f"{cold_time:.3f} s" if cold_time is not None else "no prompt before the timeout"}')
+
+    if warm_times:
+        print(f'Warm start: median {median(warm_times):.3f} s, min {min(warm_times):.3f} s, max {max(warm_times):.3f} s ({len(warm_times)} run(s))')
+    else:
+        print('Warm start: no prompt before the timeout')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+# Built-in imports
+from argparse import ArgumentParser
+from json import dumps, loads
+from pathlib import Path
+from resource import getrusage, RUSAGE_SELF, RUSAGE_CHILDREN
+from subprocess import run as subprocess_run, PIPE
+from sys import executable, path as sys_path, platform
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from typing import Dict, List
+
+# Local imports
+sys_path.insert(0, Path(__file__).resolve().parent.parent.joinpath('src').as_posix())
+
+from utils.functions import get_ffmpeg_binary, transcode_audio
+
+
+def generate_synthetic_input(ffmpeg_path: str, output_path: Path, duration: int) -> None:
+    """
+    Generate a synthetic stereo Opus/WebM source, similar to a YouTube audio stream.
+    :param ffmpeg_path: The path to the FFmpeg binary.
+    :param output_path: The path to the generated file.
+    :param duration: The duration in seconds.
+    """
+
+    command = [
+        ffmpeg_path, '-hide_banner', '-nostdin', '-loglevel', 'error', '-y',
+        '-f', 'lavfi', '-i', f'sine=frequency=440:sample_rate=48000:duration={duration}',
+        '-f', 'lavfi', '-i', f'anoisesrc=color=pink:sample_rate=48000:duration={duration}',
+        '-filter_complex', '[0:a][1:a]amerge=inputs=2[a]', '-map', '[a]',
+        '-c:a', 'libopus', '-b:a', '128k', output_path.as_posix()
+    ]
+    subprocess_run(command, check=True)
+
+def run_worker(backend: str, input_path: str, output_path: str) -> None:
+    """
+    Transcode a single file and print the wall time and peak RSS (in MiB) as JSON.
+    :param backend: The transcoding backend.
+    :param input_path: The path to the source file (it is copied first, since transcode_audio deletes its input).
+    :param output_path: The path to the output file.
+    """
+
+    source_path = Path(output_path).with_suffix('.src' + Path(input_path).suffix)
+    source_path.write_bytes(Path(input_path).read_bytes())
+
+    start_time = perf_counter()
+    transcode_audio(source_path, output_path, 128, backend)
+    elapsed_time = perf_counter() - start_time
+
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    divisor = 1024 * 1024 if platform == 'darwin' else 1024
+
+    print(dumps({
+        'backend': backend,
+        'wall_time': round(elapsed_time, 3),
+        'python_peak_rss_mib': round(getrusage(RUSAGE_SELF).ru_maxrss / divisor, 1),
+        'ffmpeg_peak_rss_mib': round(getrusage(RUSAGE_CHILDREN).ru_maxrss / divisor, 1)
+    }))
+
+def main() -> None:
+    parser = ArgumentParser(description='Compare peak RSS and wall time of the transcoding backends on long synthetic inputs.')
+    parser.add_argument('--durations', type=int, nargs='+', default=[600, 1800, 3600], help='Input durations in seconds')
+    parser.add_argument('--backends', nargs='+', default=['ffmpeg', 'pydub'], choices=['ffmpeg', 'pydub'], help='Backends to compare')
+    args = parser.parse_args()
+
+    ffmpeg_path = get_ffmpeg_binary()
+
+    if not ffmpeg_path:
+        raise SystemExit('FFmpeg was not found in the system PATH.')
+
+    results: List[Dict] = []
+
+    with TemporaryDirectory(prefix='syncgroove-bench-') as temporary_dir:
+        for duration in args.durations:
+            input_path = Path(temporary_dir, f'input_{duration}.webm')
+            generate_synthetic_input(ffmpeg_path, input_path, duration)
+
+            for backend in args.backends:
+                # Every measurement runs in a fresh interpreter, so peak RSS values are not shared between runs
+                output_path = Path(temporary_dir, f'output_{duration}_{backend}.opus')
+                process = subprocess_run([executable, __file__, '--worker', backend, input_path.as_posix(), output_path.as_posix()], stdout=PIPE, check=True)
+                result = loads(process.stdout.decode('utf-8').strip().splitlines()[-1])
+                result['duration'] = duration
+                results.append(result)
+
+    print(f'{"duration (s)":>12} {"backend":>8} {"wall (s)":>9} {"python RSS (MiB)":>17} {"ffmpeg RSS (MiB)":>17}')
+
+    for result in results:
+        print(f'{result["duration"]:>12} {result["backend"]:>8} {result["wall_time"]:>9} {result["python_peak_rss_mib"]:>17} {result["ffmpeg_peak_rss_mib"]:>17}')
+
+
+if __name__ == '__main__':
+    worker_parser = ArgumentParser(add_help=False)
+    worker_parser.add_argument('--worker', nargs=3)
+    worker_args, _ = worker_parser.parse_known_args()
+
+    if worker_args.worker:
+        run_worker(*worker_args.worker)
+    else:
+        main()
@@ -1,13 +1,10 @@
 # Built-in imports
+from argparse import ArgumentParser
+from itertools import chain
 from pathlib import Path
-from datetime import datetime
-from logging import getLogger, CRITICAL
-from typing import List
-from sys import exit
-
-# Third-party imports
-from streamsnapper import YouTube
-from turbodl import TurboDL
+from signal import signal, SIGTERM
+from typing import Iterator, List, Optional
+from sys import exit, stdin
 
 # Local imports
 from utils.config import Config
@@ -20,128 +17,170 @@ from utils.general import (
     is_valid_url,
     clear_terminal,
     make_dirs,
-    download_app_icon,
-    is_image_corrupted,
-    download_latest_ffmpeg,
     open_windows_filedialog_selector,
-    get_latest_app_version,
-    extract_lines_from_file
+    iter_lines_from_file
 )
-from utils.classifier import sort_urls_by_type_and_domain
-from utils.functions import transcode_and_edit_metadata
-
-
-class InputQueriesTemplate:
-    def __init__(self) -> None:
-        self._queries: List[str] = []
-        self._urls: List[str] = []
+from utils.daemon import QueueDaemon
+from utils.library import LibraryIndex
+from utils.metrics import get_metrics
+from utils.pipeline import TrackJob
+from utils.preflight import PreflightChecks
+from utils.progress import ProgressDashboard
+from utils.resilience import get_request_guard
+from utils.runner import BatchResult, SyncRunner
+
+
+def prepare_application(metrics_path: Optional[str] = None) -> PreflightChecks:
+    """
+    Create the required directories, enable the metrics if needed and start the background checks.
+    :param metrics_path: The directory where the metrics are exported (if None, the metrics are disabled).
+    :return: The started PreflightChecks object.
+    """
+
+    # Record the timing spans, bytes and errors of the run when a metrics directory is given
+    get_metrics().enabled = bool(metrics_path)
 
-        class SortedURLs:
-            class youtube:
-                def __init__(self) -> None:
-                    pass
-
-            class youtube_music:
-                def __init__(self) -> None:
-                    pass
+    # Initialize Colorama for colored terminal output
+    init_colorama(autoreset=True)
 
-        self.SortedURLs = SortedURLs()
+    # Create the required directories
+    make_dirs(Config.temporary_path)
+    make_dirs(Config.main_path)
+    make_dirs(Config.main_resources_path)
+    make_dirs(Config.media_path)
+    make_dirs(Config.default_downloaded_musics_path)
 
+    # Start the version check, the application icon check and the FFmpeg check in the background, their results are collected before the download starts
+    return PreflightChecks(Config).start()
 
-def main() -> None:
-    # Initialize Colorama for colored terminal output
-    init_colorama(autoreset=True)
+def export_metrics(metrics_path: Optional[str], report_name: Optional[str] = None) -> None:
+    if metrics_path:
+        exported_paths = get_metrics().export(metrics_path, report_name)
+        print(f'{Bracket("info", Color.blue)} {Color.blue}Metrics exported to {Color.cyan}{", ".join(exported_path.as_posix() for exported_path in exported_paths)}')
 
-    # Set the terminal title
-    set_terminal_title(Config, f'{Config.fancy_name} {Config.version} - by gh@Henrique-Coder')
+def report_preflight_checks(preflight_checks: PreflightChecks, interactive: bool = True) -> None:
+    """
+    Report the results of the background checks.
+    :param preflight_checks: The started PreflightChecks object.
+    :param interactive: If True, an outdated or unknown version must be acknowledged with ENTER, otherwise it is only reported.
+    """
 
-    # Check if the app version is up-to-date
-    print(f'{Bracket("info", Color.blue, 1)} {Color.blue}Checking if the application is up-to-date...')
-    latest_app_version = get_latest_app_version()
-    clear_terminal(Config)
+    latest_app_version = preflight_checks.get_latest_app_version()
 
     if latest_app_version is not None:
         if Config.version < latest_app_version:
-            input(
+            message = (
                 f'{Bracket("warning", Color.yellow, 1)} {Color.yellow}The local version of the application is out of date, the latest version available is {Color.green}{latest_app_version}'
-                f'{Bracket("warning", Color.yellow, 1)} {Color.yellow}Download it at {Color.blue}https://github.com/Henrique-Coder/syncgroove/releases/tag/v{latest_app_version} {Color.yellow}or press ENTER to continue and use it anyway (not recommended)'
+                f'{Bracket("warning", Color.yellow, 1)} {Color.yellow}Download it at {Color.blue}https://github.com/Henrique-Coder/syncgroove/releases/tag/v{latest_app_version}'
             )
-    else:
+
+            if interactive:
+                input(f'{message} {Color.yellow}or press ENTER to continue and use it anyway (not recommended)')
+            else:
+                print(message)
+    elif interactive:
         input(f'{Bracket("warning", Color.yellow, 1)} {Color.yellow}Failed to check the latest version of the application, restart the application to try again or press ENTER to continue and use it anyway (not recommended)')
+    else:
+        print(f'{Bracket("warning", Color.yellow, 1)} {Color.yellow}Failed to check the latest version of the application')
 
-    # Create the required directories
-    make_dirs(Config.temporary_path)
-    make_dirs(Config.main_path)
-    make_dirs(Config.main_resources_path)
-    make_dirs(Config.media_path)
-    make_dirs(Config.default_downloaded_musics_path)
+    icon_status = preflight_checks.get_icon_status()
 
-    # Add required directories to the system PATH
-    # ...
-
-    # Check if application icon file exists, if not, download it
-    print(f'{Bracket("info", Color.blue, 1)} {Color.blue}Checking if the application icon file exists...')
-    app_icon_path = Path(Config.media_path, 'icon.ico')
-
-    if not app_icon_path.exists():
-        clear_terminal(Config)
-        print(f'{Bracket("warning", Color.yellow, 1)} {Color.yellow}The application icon file does not exist, downloading it...')
-        download_app_icon(app_icon_path)
-    elif is_image_corrupted(app_icon_path):
-        clear_terminal(Config)
-        print(f'{Bracket("warning", Color.yellow, 1)} {Color.yellow}The application icon file exists but is corrupted, re-downloading it...')
-        download_app_icon(app_icon_path)
-    else:
-        clear_terminal(Config)
-        print(f'{Bracket("success", Color.green, 1)} {Color.green}The application icon file exists and is working properly')
+    if icon_status == 'downloaded':
+        print(f'{Bracket("warning", Color.yellow)} {Color.yellow}The application icon file did not exist and has been downloaded')
+    elif icon_status == 'redownloaded':
+        print(f'{Bracket("warning", Color.yellow)} {Color.yellow}The application icon file was corrupted and has been re-downloaded')
+    elif icon_status == 'failed':
+        print(f'{Bracket("warning", Color.yellow)} {Color.yellow}Failed to download the application icon file')
 
-    # Set the logging level to CRITICAL for the FFmpeg and FFprobe classes
-    getLogger('pyffmpeg.pseudo_ffprobe.FFprobe').setLevel(CRITICAL)
-    getLogger('pyffmpeg.misc.Paths').setLevel(CRITICAL)
+    if preflight_checks.get_ffmpeg_path() is None:
+        print(f'{Bracket("warning", Color.yellow)} {Color.yellow}Failed to find or download the FFmpeg binary, the transcoding falls back to pydub (in memory)')
 
-    # Check if FFmpeg binary file exists, if not, download it
-    print(f'{Bracket("info", Color.blue, 1)} {Color.blue}Checking and downloading the latest FFmpeg binary files (if necessary)...')
-    download_latest_ffmpeg(Config)
-    clear_terminal(Config)
+def check_ffmpeg_requirement(runner: SyncRunner) -> bool:
+    """
+    Make sure FFmpeg is available if the configuration needs it, printing the error otherwise.
+    :param runner: The opened SyncRunner object.
+    :return: True if the downloads can start, False otherwise.
+    """
 
-    # Ask the user for their internet connection speed
-    connection_speed_path = Path(Config.main_resources_path, 'connection_speed.txt')
-    cached_connection_speed = 'auto'
+    try:
+        runner.check_ffmpeg()
+    except Exception as e:
+        print(f'{Bracket("error", Color.red, 1)} {Color.red}{e}')
+        return False
 
-    if connection_speed_path.exists():
-        cached_connection_speed = connection_speed_path.read_text()
+    return True
 
-        if not cached_connection_speed or 'auto' in cached_connection_speed.lower():
-            cached_connection_speed = 'auto'
-        else:
-            try:
-                cached_connection_speed = float(cached_connection_speed)
-            except ValueError:
-                cached_connection_speed = 'auto'
-                connection_speed_path.write_text(cached_connection_speed)
-
-    while True:
-        connection_speed = input(f'{Bracket("info", Color.blue, 1)} {Color.blue}What is your internet connection speed in Mbps (Press ENTER to use the cached value: "{cached_connection_speed}"): ')
-
-        if not connection_speed:
-            connection_speed = cached_connection_speed
-            break
-        elif 'auto' in connection_speed.lower():
-            connection_speed = 'auto'
-            connection_speed_path.write_text(connection_speed)
-            break
-        else:
-            try:
-                connection_speed = float(connection_speed)
-                connection_speed_path.write_text(str(connection_speed))
-                break
-            except ValueError:
-                print(f'{Bracket("warning", Color.yellow, 1)} {Color.yellow}Invalid input, please enter a valid number or "auto"')
+def format_finished_job(job: TrackJob) -> str:
+    if job.skip_reason == 'duplicate':
+        return f'{Bracket("info", Color.blue)} {Color.blue}The URL {Color.cyan}{job.url}{Color.blue} is already in the music library as {Color.light_green}{job.output_path.as_posix()}{Color.blue}, skipped'
+    elif job.skip_reason == 'archived':
+        return f'{Bracket("info", Color.blue)} {Color.blue}The URL {Color.cyan}{job.url}{Color.blue} has already been downloaded with all its outputs, skipped'
+    elif job.succeeded:
+        return f'{Bracket("success", Color.green)} {Color.green}The audio file {Color.cyan}{job.information.title}{Color.green} by {Color.cyan}{job.information.channelName}{Color.green} has been downloaded and processed successfully ({Color.cyan}{job.transcode_decision.action}{Color.green}) to {Color.light_green}{job.output_path.as_posix()}'
 
-    clear_terminal(Config)
+    return f'{Bracket("error", Color.red)} {Color.red}An error occurred while processing the URL {Color.cyan}{job.url}{Color.red} ({job.failed_stage} stage): {job.error}'
+
+def create_progress_dashboard() -> ProgressDashboard:
+    # A single status line redrawn in place on a terminal, a periodic log line otherwise (e.g. redirected to a file)
+    return ProgressDashboard(Config.progress_refresh_rate, Config.progress_log_interval)
+
+def report_unfinished_tracks(runner: SyncRunner) -> None:
+    """
+    Print the number of tracks interrupted by a previous run, they resume from the last stage they completed when they are queued again.
+    :param runner: The opened SyncRunner object.
+    """
+
+    unfinished_count = runner.journal.get_unfinished_count()
+
+    if unfinished_count:
+        print(f'{Bracket("info", Color.blue)} {Color.blue}The job journal holds {Color.cyan}{unfinished_count}{Color.blue} unfinished track(s) from a previous run, they resume from their last completed stage when they are queued again')
+
+def report_batch_stats(runner: SyncRunner, result: BatchResult) -> None:
+    """
+    Print the statistics of a processed batch (only what happened during this batch, also in a long-running process).
+    :param runner: The SyncRunner object that processed the batch.
+    :param result: The BatchResult object.
+    """
+
+    counters = result.counters
+    extraction_cache_stats, bandwidth_stats, transcode_counts = counters['extraction_cache'], counters['bandwidth'], counters['transcode']
+
+    ingestion_stats = result.ingestion_stats
 
-    # Initialize the InputQueries object
-    InputQueries = InputQueriesTemplate()
+    if ingestion_stats:
+        print(f'{Bracket("info", Color.blue, 1)} {Color.blue}Input: {Color.cyan}{ingestion_stats.urls}{Color.blue} URL(s) ({Color.cyan}{ingestion_stats.playlists}{Color.blue} playlist(s), {Color.cyan}{ingestion_stats.unsupported_urls}{Color.blue} unsupported) and {Color.cyan}{ingestion_stats.queries}{Color.blue} queries ({Color.cyan}{ingestion_stats.unresolved_queries}{Color.blue} without results), resolved to {Color.cyan}{ingestion_stats.tracks}{Color.blue} unique track(s) ({Color.cyan}{ingestion_stats.duplicates}{Color.blue} duplicate(s) collapsed)')
+
+    playlist_sync_stats = counters['playlist_sync']
+
+    if playlist_sync_stats['enumerated'] or playlist_sync_stats['from_snapshot']:
+        print(f'{Bracket("info", Color.blue)} {Color.blue}Playlists: {Color.cyan}{playlist_sync_stats["enumerated"]}{Color.blue} enumerated ({Color.cyan}{playlist_sync_stats["changed"]}{Color.blue} changed, {Color.cyan}{playlist_sync_stats["reordered"]}{Color.blue} reordered), {Color.cyan}{playlist_sync_stats["from_snapshot"]}{Color.blue} reused from a recent snapshot, {Color.cyan}{playlist_sync_stats["added"]}{Color.blue} track(s) added, {Color.cyan}{playlist_sync_stats["removed"]}{Color.blue} removed ({Color.cyan}{playlist_sync_stats["moved"]}{Color.blue} moved out of the music folder)')
+
+    print(f'{Bracket("info", Color.blue, 1)} {Color.blue}Skipped {Color.cyan}{len(result.skipped_urls)}{Color.blue} track(s) that were already downloaded (download archive) and {Color.cyan}{len(result.duplicate_jobs)}{Color.blue} track(s) already in the music library under another name or video ID')
+    print(f'{Bracket("info", Color.blue)} {Color.blue}Extraction cache: {Color.cyan}{extraction_cache_stats["information_hits"]}{Color.blue} information hit(s), {Color.cyan}{extraction_cache_stats["information_misses"]}{Color.blue} miss(es), {Color.cyan}{extraction_cache_stats["streams_hits"]}{Color.blue} stream hit(s), {Color.cyan}{extraction_cache_stats["streams_misses"]}{Color.blue} miss(es)')
+
+    if bandwidth_stats['seconds']:
+        print(f'{Bracket("info", Color.blue)} {Color.blue}Bandwidth: {Color.cyan}{bandwidth_stats["bytes"] * 8 / 1_000_000 / bandwidth_stats["seconds"]:.1f} Mbps{Color.blue} average per download, {Color.cyan}{runner.bandwidth_manager.estimated_bandwidth:.1f} Mbps{Color.blue} estimated in total')
+
+    connection_stats = counters['connections']
+    print(f'{Bracket("info", Color.blue)} {Color.blue}HTTP connections: {Color.cyan}{connection_stats["requests"]}{Color.blue} request(s), {Color.cyan}{connection_stats["reused_connections"]}{Color.blue} reused connection(s), {Color.cyan}{connection_stats["new_connections"]}{Color.blue} new connection(s) in the shared pools')
+
+    if connection_stats['turbodl_downloads']:
+        print(f'{Bracket("info", Color.blue)} {Color.blue}TurboDL: {Color.cyan}{connection_stats["turbodl_downloads"]}{Color.blue} download(s) with their own connections, outside the shared pools (up to {Color.cyan}{connection_stats["turbodl_max_connections"]}{Color.blue} connection(s) in total)')
+
+    circuit_breaker = get_request_guard().circuit_breaker
+
+    if counters['circuit_breaker']['opened']:
+        print(f'{Bracket("warning", Color.yellow)} {Color.yellow}The remote services failed too often, all requests were paused {Color.cyan}{counters["circuit_breaker"]["opened"]}{Color.yellow} time(s) for {Color.cyan}{circuit_breaker.cooldown:.0f}s{Color.yellow} (circuit breaker)')
+
+    print(f'{Bracket("info", Color.blue)} {Color.blue}Transcode decisions: {Color.cyan}{transcode_counts["remux"]}{Color.blue} remuxed, {Color.cyan}{transcode_counts["rewrap"]}{Color.blue} rewrapped, {Color.cyan}{transcode_counts["transcode"]}{Color.blue} transcoded ({Color.cyan}{transcode_counts["remux"] + transcode_counts["rewrap"]}/{sum(transcode_counts.values())}{Color.blue} re-encodes avoided)')
+
+def main(metrics_path: Optional[str] = None) -> None:
+    preflight_checks = prepare_application(metrics_path)
+
+    # Set the terminal title
+    set_terminal_title(Config, f'{Config.fancy_name} {Config.version} - by gh@Henrique-Coder')
+
+    clear_terminal(Config)
 
     # Ask the user if they want to load the queries from a file or write them manually
     print(
@@ -154,7 +193,7 @@ def main() -> None:
     # Ask the user to choose the input method
     user_input = input(f'{Color.light_white} ›{Color.blue} ').strip()
 
-    # Load queries from a file
+    # Load queries from a file (the file is read lazily, as the pipeline asks for more tracks)
     if not user_input:
         clear_terminal(Config, 1)
         print(f'{Bracket("info", Color.blue)} {Color.blue}Loading queries from a file...')
@@ -166,96 +205,181 @@ def main() -> None:
             print(f'{Bracket("error", Color.red, 1)} {Color.red}No file selected, exiting...')
             exit(1)
 
-        extracted_queries = extract_lines_from_file(queries_filepath, fix_lines=True)
+        input_lines = iter_lines_from_file(queries_filepath, fix_lines=True)
 
-        if not extracted_queries:
+        try:
+            first_line = next(input_lines, None)
+        except (FileNotFoundError, PermissionError, UnicodeDecodeError):
+            first_line = None
+
+        if first_line is None:
             clear_terminal(Config, 1)
             print(f'{Bracket("error", Color.red, 1)} {Color.red}The file is empty or cannot be read, exiting...')
             exit(1)
 
-        for query in extracted_queries:
-            validation_value = is_valid_url(query, online_check=False)
-
-            if validation_value:
-                InputQueries._urls.append(query)
-            elif validation_value is False:
-                InputQueries._queries.append(query)
+        input_lines = chain([first_line], input_lines)
 
     # Write queries manually
     else:
-        validation_value = is_valid_url(user_input, online_check=False)
+        input_lines = []
+
+        while user_input:
+            if is_valid_url(user_input, online_check=False) is not None:
+                input_lines.append(user_input)
 
-        if validation_value:
-            InputQueries._urls.append(user_input)
-        elif validation_value is False:
-            InputQueries._queries.append(user_input)
+            user_input = input(f'{Color.light_white} ›{Color.blue} ').strip()
 
-        while True:
-            query = input(f'{Color.light_white} ›{Color.blue} ').strip()
+    clear_terminal(Config)
 
-            if not query:
-                break
+    # Collect the results of the background checks
+    print(f'{Bracket("info", Color.blue, 1)} {Color.blue}Waiting for the application checks to finish...')
+    report_preflight_checks(preflight_checks)
 
-            validation_value = is_valid_url(query, online_check=False)
+    print(f'{Bracket("info", Color.blue, 1)} {Color.blue}Starting the download process, the queries are searched and the playlists are expanded while the first tracks are already downloading...')
 
-            if validation_value:
-                InputQueries._urls.append(query)
-            elif validation_value is False:
-                InputQueries._queries.append(query)
+    # Stream every track through the extract -> download -> transcode -> tag pipeline as soon as its URL is resolved
+    try:
+        with SyncRunner(Config, preflight_checks) as runner:
+            report_unfinished_tracks(runner)
 
-    clear_terminal(Config)
-    print(f'{Bracket("info", Color.blue, 1)} {Color.blue}The following queries/URLs are being processed. This may take some time...')
-    print(f'{Bracket("info", Color.blue)} {Color.blue}Queries ({Color.cyan}{len(InputQueries._queries)}{Color.blue} item(s): {Color.cyan}{InputQueries._queries}')
-    print(f'{Bracket("info", Color.blue)} {Color.blue}URLs ({Color.cyan}{len(InputQueries._urls)}{Color.blue} item(s)): {Color.cyan}{InputQueries._urls}')
+            if not check_ffmpeg_requirement(runner):
+                input(f'{Bracket("info", Color.blue, 1)} {Color.blue}Press any key to exit...')
+                exit(1)
 
-    # Sort the URLs by their type
-    InputQueries = sort_urls_by_type_and_domain(InputQueries)
+            with create_progress_dashboard() as progress:
+                result = runner.run(input_lines, on_complete=lambda job: progress.log(format_finished_job(job)), progress=progress)
+    except KeyboardInterrupt:
+        print(f'{Bracket("error", Color.red, 1)} {Color.red}The download process was interrupted by the user, partially written files have been removed, exiting...')
+        export_metrics(metrics_path)
+        exit(1)
 
-    print(f'{Bracket("info", Color.blue, 1)} {Color.blue}The queries/URLs have been successfully processed and sorted by type and domain, below you will see a summary of the process carried out.')
-    print(f'{Bracket("info", Color.blue)} {Color.blue}1. {Color.cyan}{InputQueries.SortedURLs.youtube.fancy_name} {Color.light_blue}[Final Single] {Color.blue}({Color.cyan}{len(InputQueries.SortedURLs.youtube.single_urls)} URL(s){Color.blue}): {Color.cyan}{InputQueries.SortedURLs.youtube.single_urls}')
-    print(f'{Bracket("info", Color.blue)} {Color.blue}1.1 {Color.cyan}{InputQueries.SortedURLs.youtube.fancy_name} {Color.blue}[Single] ({Color.cyan}{len(InputQueries.SortedURLs.youtube.mixed_urls["single"])} URL(s){Color.blue}): {Color.cyan}{InputQueries.SortedURLs.youtube.mixed_urls["single"]}')
-    print(f'{Bracket("info", Color.blue)} {Color.blue}1.2 {Color.cyan}{InputQueries.SortedURLs.youtube.fancy_name} {Color.blue}[Playlist] ({Color.cyan}{len(InputQueries.SortedURLs.youtube.mixed_urls["playlist"])} URL(s){Color.blue}): {Color.cyan}{InputQueries.SortedURLs.youtube.mixed_urls["playlist"]}')
-    print(f'{Bracket("info", Color.blue)} {Color.blue}2. {Color.cyan}{InputQueries.SortedURLs.youtube_music.fancy_name} {Color.light_blue}[Final Single] {Color.blue}({Color.cyan}{len(InputQueries.SortedURLs.youtube_music.single_urls)} URL(s){Color.blue}): {Color.cyan}{InputQueries.SortedURLs.youtube_music.single_urls}')
-    print(f'{Bracket("info", Color.blue)} {Color.blue}2.1 {Color.cyan}{InputQueries.SortedURLs.youtube_music.fancy_name} {Color.blue}[Single] ({Color.cyan}{len(InputQueries.SortedURLs.youtube_music.mixed_urls["single"])} URL(s){Color.blue}): {Color.cyan}{InputQueries.SortedURLs.youtube_music.mixed_urls["single"]}')
-    print(f'{Bracket("info", Color.blue)} {Color.blue}2.2 {Color.cyan}{InputQueries.SortedURLs.youtube_music.fancy_name} {Color.blue}[Playlist] ({Color.cyan}{len(InputQueries.SortedURLs.youtube_music.mixed_urls["playlist"])} URL(s){Color.blue}): {Color.cyan}{InputQueries.SortedURLs.youtube_music.mixed_urls["playlist"]}')
+    report_batch_stats(runner, result)
+    export_metrics(metrics_path)
 
-    print(f'{Bracket("info", Color.blue, 1)} {Color.blue}Starting the download process...')
+    # Exit the application
+    input(f'{Bracket("info", Color.light_green, 1)} {Color.light_green}The download process has been completed successfully, {Color.green}{len(result.succeeded_jobs)} music(s) {Color.light_green}have been downloaded and processed, press any key to exit...')
+    exit(0)
 
-    # Initialize the Snapper object
-    youtube = YouTube(logging=False)
+def run_headless(input_paths: List[str], metrics_path: Optional[str] = None) -> int:
+    """
+    Process query files (or the standard input) without any prompt.
+    :param input_paths: The paths to the query files, "-" reads the standard input.
+    :param metrics_path: The directory where the metrics are exported (if None, the metrics are disabled).
+    :return: The exit code (0 if every track succeeded, 1 otherwise).
+    """
+
+    preflight_checks = prepare_application(metrics_path)
+
+    def iter_input_lines() -> Iterator[str]:
+        for input_path in input_paths:
+            if input_path == '-':
+                yield from (line.strip() for line in stdin if line.strip())
+            else:
+                yield from iter_lines_from_file(input_path, fix_lines=True)
+
+    try:
+        with SyncRunner(Config, preflight_checks) as runner:
+            report_preflight_checks(preflight_checks, interactive=False)
+            report_unfinished_tracks(runner)
+
+            if not check_ffmpeg_requirement(runner):
+                return 1
+
+            with create_progress_dashboard() as progress:
+                result = runner.run(iter_input_lines(), on_complete=lambda job: progress.log(format_finished_job(job)), progress=progress)
+    except KeyboardInterrupt:
+        print(f'{Bracket("error", Color.red, 1)} {Color.red}The download process was interrupted, partially written files have been removed, exiting...')
+        export_metrics(metrics_path)
+        return 1
+    except (FileNotFoundError, PermissionError, UnicodeDecodeError) as e:
+        print(f'{Bracket("error", Color.red, 1)} {Color.red}Failed to read the input: {e}')
+        return 1
+
+    report_batch_stats(runner, result)
+    export_metrics(metrics_path)
+    print(f'{Bracket("info", Color.blue, 1)} {Color.blue}{Color.cyan}{len(result.succeeded_jobs)}{Color.blue} track(s) downloaded, {Color.cyan}{len(result.failed_jobs)}{Color.blue} failed')
+
+    return 0 if not result.failed_jobs else 1
+
+def run_library_scan() -> int:
+    """
+    Index the music library (tags and audio fingerprints), only reading the files that changed since the previous scan.
+    :return: The exit code.
+    """
 
-    for url in InputQueries.SortedURLs.youtube.single_urls + InputQueries.SortedURLs.youtube_music.single_urls:
-        print(f'{Bracket("info", Color.blue, 1)} {Color.blue}Extracting information from the URL {Color.cyan}{url}{Color.blue}...')
-        try:
-            youtube.extract(url=url)
-        except Exception as e:
-            print(f'{Bracket("error", Color.red, 1)} {Color.red}An error occurred while processing the URL {Color.cyan}{url}{Color.red}: {e}')
-            continue
+    init_colorama(autoreset=True)
+    make_dirs(Config.main_resources_path)
 
-        youtube.analyze_information(check_thumbnails=True, retrieve_dislike_count=False)
-        youtube.analyze_audio_streams(preferred_language='local')
+    print(f'{Bracket("info", Color.blue, 1)} {Color.blue}Scanning the music library {Color.cyan}{Path(Config.default_downloaded_musics_path).as_posix()}{Color.blue}...')
 
-        information = youtube.information
-        stream_info = youtube.best_audio_stream
+    with LibraryIndex(Config.library_index_path) as library_index:
+        scan_stats = library_index.scan(Config.default_downloaded_musics_path, Config.library_scan_workers)
 
-        cover_image_path = Path(Config.temporary_path, f'.tmp_{information.id}_cover.jpg').resolve()
-        audio_path = Path(Config.default_downloaded_musics_path, f'{information.cleanTitle} [{information.id}].{stream_info["extension"]}').resolve()
+    print(f'{Bracket("info", Color.blue)} {Color.blue}Library: {Color.cyan}{scan_stats["indexed"]}{Color.blue} new or changed file(s) indexed, {Color.cyan}{scan_stats["unchanged"]}{Color.blue} unchanged, {Color.cyan}{scan_stats["removed"]}{Color.blue} removed, {Color.cyan}{scan_stats["duplicates"]}{Color.blue} duplicate(s) with the same audio content')
 
-        print(f'{Bracket("info", Color.blue)} {Color.blue}Downloading {Color.cyan}{stream_info["size"]} bytes {Color.blue}from {Color.cyan}{information.title}{Color.blue} by {Color.cyan}{information.channelName}{Color.blue} to {Color.cyan}{audio_path.as_posix()}')
-        turbodl = TurboDL(max_connections='auto', connection_speed=connection_speed, overwrite=True, show_progress_bars=True)
-        turbodl.download(url=information.thumbnails[0], output_path=cover_image_path)
-        turbodl.download(url=stream_info['url'], output_path=audio_path)
+    return 0
 
-        print(f'{Bracket("info", Color.blue)} {Color.blue}Transcoding audio to {Color.cyan}OPUS {Color.blue}codec and adding metadata...')
-        transcode_and_edit_metadata(path=audio_path, output_path=audio_path.with_suffix('.opus'), bitrate=int(stream_info['bitrate']), title=information.title, artist=information.channelName, year=datetime.fromtimestamp(information.uploadTimestamp).year, cover_image=cover_image_path)
-        print(f'{Bracket("success", Color.green)} {Color.green}The audio file has been downloaded and processed successfully to {Color.light_green}{audio_path.with_suffix(".opus").as_posix()}')
+def run_daemon(queue_path: str, metrics_path: Optional[str] = None) -> int:
+    """
+    Process the query files dropped in a queue directory until the process is stopped (Ctrl+C or SIGTERM).
+    The pre-flight checks and the warm-up are paid once for the whole process.
+    :param queue_path: The queue directory.
+    :param metrics_path: The directory where the metrics are exported after each batch (if None, the metrics are disabled).
+    :return: The exit code.
+    """
 
-    # Exit the application
-    total_downloaded_musics = len(InputQueries.SortedURLs.youtube.single_urls) + len(InputQueries.SortedURLs.youtube_music.single_urls)
-    input(f'{Bracket("info", Color.light_green, 1)} {Color.light_green}The download process has been completed successfully, {Color.green}{total_downloaded_musics} music(s) {Color.light_green}have been downloaded and processed, press any key to exit...')
-    exit(0)
+    preflight_checks = prepare_application(metrics_path)
+
+    def report_event(event: str, path: Path, result: Optional[BatchResult]) -> None:
+        if event == 'started':
+            # Every batch gets its own metrics report
+            get_metrics().reset()
+            print(f'{Bracket("info", Color.blue, 1)} {Color.blue}Processing the job {Color.cyan}{path.name}')
+            return
+
+        if result:
+            report_batch_stats(runner, result)
+            export_metrics(metrics_path, f'batch-{int(get_metrics().started_at)}-{path.stem}')
+
+        if event == 'done':
+            print(f'{Bracket("success", Color.green)} {Color.green}The job {Color.cyan}{path.name}{Color.green} has been completed')
+        else:
+            print(f'{Bracket("error", Color.red)} {Color.red}The job {Color.cyan}{path.name}{Color.red} has failed, see {Color.cyan}{Path(queue_path, "failed", path.stem + ".json").as_posix()}')
+
+    try:
+        with SyncRunner(Config, preflight_checks) as runner:
+            report_preflight_checks(preflight_checks, interactive=False)
+            report_unfinished_tracks(runner)
+
+            if not check_ffmpeg_requirement(runner):
+                return 1
+
+            daemon = QueueDaemon(runner, queue_path, Config.daemon_poll_interval, on_event=report_event)
+            signal(SIGTERM, lambda *_: daemon.stop())
+
+            print(f'{Bracket("info", Color.blue, 1)} {Color.blue}Watching the queue {Color.cyan}{Path(queue_path).resolve().as_posix()}{Color.blue} (add *.txt files with one query/URL per line), press Ctrl+C to stop')
+            daemon.run_forever()
+    except KeyboardInterrupt:
+        print(f'{Bracket("info", Color.blue, 1)} {Color.blue}Stopping, the interrupted job will be processed again on the next start')
+
+    return 0
 
 
 if __name__ == '__main__':
+    parser = ArgumentParser(description=f'{Config.fancy_name} {Config.version}')
+    mode_group = parser.add_mutually_exclusive_group()
+    mode_group.add_argument('--input', nargs='+', metavar='FILE', help='Process these query files (one query/URL per line, "-" reads the standard input) without any prompt, then exit')
+    mode_group.add_argument('--daemon', metavar='DIRECTORY', help='Keep running and process the query files (*.txt) dropped in this queue directory')
+    mode_group.add_argument('--scan-library', action='store_true', help='Index the tags and the audio fingerprints of the music folder (only new and changed files are read), then exit')
+    parser.add_argument('--metrics', nargs='?', const=Config.metrics_path, default=None, metavar='DIRECTORY', help=f'Export a JSON run report and a Prometheus text file with the timing spans, bytes and errors of each stage (default directory: {Config.metrics_path})')
+    args = parser.parse_args()
+
+    if args.input:
+        exit(run_headless(args.input, args.metrics))
+    elif args.daemon:
+        exit(run_daemon(args.daemon, args.metrics))
+    elif args.scan_library:
+        exit(run_library_scan())
+
     clear_terminal(Config)
-    main()
+    main(args.metrics)
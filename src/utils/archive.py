@@ -0,0 +1,165 @@
+# Built-in imports
+from os import PathLike
+from pathlib import Path
+from re import compile as re_compile
+from sqlite3 import connect as sqlite_connect, Row
+from threading import Lock
+from time import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Union
+
+
+archived_filename_regex = re_compile(r'\[([\w-]{11})\]\.opus$')
+
+
+class DownloadArchive:
+    """
+    A persistent SQLite index of the tracks that have already been downloaded and processed.
+    """
+
+    def __init__(self, path: Union[str, PathLike]) -> None:
+        """
+        Initialize the DownloadArchive class.
+        :param path: The path to the SQLite database file (it will be created if it does not exist).
+        """
+
+        self.path: Path = Path(path)
+        self._lock = Lock()
+        self._connection = sqlite_connect(self.path.as_posix(), check_same_thread=False)
+        self._connection.row_factory = Row
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS tracks ('
+            'video_id TEXT PRIMARY KEY, '
+            'output_path TEXT NOT NULL, '
+            'size INTEGER, '
+            'itag TEXT, '
+            'bitrate REAL, '
+            'completed_at REAL NOT NULL)'
+        )
+        self._connection.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute('SELECT COUNT(*) FROM tracks').fetchone()[0]
+
+    def get(self, video_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the archived entry of a video.
+        :param video_id: The video ID.
+        :return: The archived entry or None if the video is not archived.
+        """
+
+        with self._lock:
+            row = self._connection.execute('SELECT * FROM tracks WHERE video_id = ?', (video_id,)).fetchone()
+
+        return dict(row) if row else None
+
+    def contains(self, video_id: Optional[str]) -> bool:
+        """
+        Check if a video has already been processed and its output file still exists.
+        Entries whose output file is gone are removed.
+        :param video_id: The video ID.
+        :return: True if the video can be skipped, False otherwise.
+        """
+
+        if not video_id:
+            return False
+
+        entry = self.get(video_id)
+
+        if not entry:
+            return False
+
+        if not Path(entry['output_path']).is_file():
+            self.remove(video_id)
+            return False
+
+        return True
+
+    def add(self, video_id: str, output_path: Union[str, PathLike], itag: Optional[Union[str, int]] = None, bitrate: Optional[float] = None, completed_at: Optional[float] = None) -> None:
+        """
+        Add (or replace) an archived entry.
+        :param video_id: The video ID.
+        :param output_path: The path to the processed output file.
+        :param itag: The itag of the source stream.
+        :param bitrate: The bitrate of the source stream in kbps.
+        :param completed_at: The completion timestamp (if None, the current time is used).
+        """
+
+        output_path = Path(output_path)
+        size = output_path.stat().st_size if output_path.is_file() else None
+
+        with self._lock:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO tracks (video_id, output_path, size, itag, bitrate, completed_at) VALUES (?, ?, ?, ?, ?, ?)',
+                (video_id, output_path.resolve().as_posix(), size, str(itag) if itag is not None else None, bitrate, completed_at or time())
+            )
+            self._connection.commit()
+
+    def remove(self, video_id: str) -> None:
+        """
+        Remove an archived entry.
+        :param video_id: The video ID.
+        """
+
+        with self._lock:
+            self._connection.execute('DELETE FROM tracks WHERE video_id = ?', (video_id,))
+            self._connection.commit()
+
+    def rebuild(self, music_path: Union[str, PathLike]) -> int:
+        """
+        Rebuild the index by scanning a music directory for files named "<title> [<id>].opus".
+        Existing entries with richer information (itag, bitrate) are kept.
+        :param music_path: The directory to scan.
+        :return: The number of files found.
+        """
+
+        found_files = 0
+
+        with self._lock:
+            for file_path in Path(music_path).glob('*.opus'):
+                found_id = archived_filename_regex.search(file_path.name)
+
+                if not found_id:
+                    continue
+
+                file_stat = file_path.stat()
+                self._connection.execute(
+                    'INSERT OR IGNORE INTO tracks (video_id, output_path, size, completed_at) VALUES (?, ?, ?, ?)',
+                    (found_id.group(1), file_path.resolve().as_posix(), file_stat.st_size, file_stat.st_mtime)
+                )
+                found_files += 1
+
+            self._connection.commit()
+
+        return found_files
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    def __enter__(self) -> 'DownloadArchive':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+
+def filter_archived_urls(urls: Iterable[str], archive: DownloadArchive, video_id_func: Callable[[str], Optional[str]], skipped_urls: Optional[List[str]] = None) -> Iterator[str]:
+    """
+    Lazily drop the URLs whose videos are already in the archive, before anything is extracted.
+    :param urls: The URLs to filter.
+    :param archive: The DownloadArchive object.
+    :param video_id_func: The function that extracts the video ID from a URL.
+    :param skipped_urls: An optional list where the skipped URLs are appended.
+    :return: The URLs that still need to be processed.
+    """
+
+    for url in urls:
+        if archive.contains(video_id_func(url)):
+            if skipped_urls is not None:
+                skipped_urls.append(url)
+
+            continue
+
+        yield url
@@ -0,0 +1,172 @@
+# Built-in imports
+from contextlib import contextmanager
+from json import dumps, loads
+from os import PathLike
+from pathlib import Path
+from threading import Condition, Event
+from time import perf_counter, time
+from typing import Any, Dict, Iterator, Optional, Union
+
+# Local imports
+from utils.resilience import TokenBucket
+
+
+class BandwidthAllocation:
+    """
+    The share of the global budgets granted to a single transfer.
+    """
+
+    def __init__(self, connection_speed: Union[float, str], max_connections: int) -> None:
+        """
+        Initialize the BandwidthAllocation class.
+        :param connection_speed: The bandwidth share in Mbps (or "auto" while no estimate is available).
+        :param max_connections: The number of connections the transfer may open.
+        """
+
+        self.connection_speed: Union[float, str] = connection_speed
+        self.max_connections: int = max_connections
+        self.bytes_transferred: int = 0
+
+
+class BandwidthManager:
+    """
+    Splits a global bandwidth budget and a global connection budget among the concurrent downloads.
+    A configured bandwidth limit is enforced on the bytes read by the downloads (shared byte-rate token bucket), TurboDL downloads only get their share as a speed hint.
+    The bandwidth is measured from the completed transfers and kept as a rolling estimate across runs.
+    """
+
+    def __init__(self, state_path: Union[str, PathLike], max_bandwidth: float = 0, max_connections: int = 16, concurrent_transfers: int = 1, smoothing: float = 0.3, min_sample_size: int = 256 * 1024) -> None:
+        """
+        Initialize the BandwidthManager class.
+        :param state_path: The path to the JSON file where the rolling estimate is kept between runs.
+        :param max_bandwidth: The global bandwidth limit in Mbps (0 disables the limit, the measured estimate is then only used to split the budget).
+        :param max_connections: The maximum number of connections open at the same time, across all downloads.
+        :param concurrent_transfers: The number of downloads expected to run at the same time (the connection budget is split among them).
+        :param smoothing: The weight of the newest measurement in the rolling estimate (0-1).
+        :param min_sample_size: Transfers smaller than this (in bytes) are too short to be measured reliably and are not counted.
+        """
+
+        self.state_path: Path = Path(state_path)
+        self.max_bandwidth: float = max(0.0, float(max_bandwidth))
+        self.max_connections: int = max(1, int(max_connections))
+        self.concurrent_transfers: int = max(1, int(concurrent_transfers))
+        self.smoothing: float = min(1.0, max(0.0, float(smoothing)))
+        self.min_sample_size: int = min_sample_size
+        self.stats: Dict[str, Union[int, float]] = {'transfers': 0, 'bytes': 0, 'seconds': 0.0}
+        self._active_transfers = 0
+        self._free_connections = self.max_connections
+        self._condition = Condition()
+        self._rate_limiter = TokenBucket(self.max_bandwidth * 1_000_000 / 8)
+
+        try:
+            self._state: Dict[str, Any] = loads(self.state_path.read_text('utf-8'))
+        except (FileNotFoundError, PermissionError, ValueError):
+            self._state = {}
+
+    @property
+    def estimated_bandwidth(self) -> Optional[float]:
+        """
+        Get the rolling estimate of the available bandwidth.
+        :return: The estimate in Mbps or None if nothing has been measured yet.
+        """
+
+        with self._condition:
+            return self._state.get('bandwidth_mbps')
+
+    @property
+    def bandwidth_budget(self) -> Optional[float]:
+        """
+        Get the global bandwidth budget shared by the concurrent downloads.
+        :return: The budget in Mbps (the configured limit, capped by the estimate if lower) or None if it is unknown.
+        """
+
+        estimate = self.estimated_bandwidth
+
+        if self.max_bandwidth and estimate:
+            return min(self.max_bandwidth, estimate)
+
+        return self.max_bandwidth or estimate
+
+    @contextmanager
+    def transfer(self) -> Iterator[BandwidthAllocation]:
+        """
+        Reserve a share of the budgets for a transfer, waiting while all connections are in use.
+        The caller sets "bytes_transferred" on the allocation, so a successful transfer updates the estimate.
+        :return: The BandwidthAllocation object of the transfer.
+        """
+
+        budget = self.bandwidth_budget
+
+        with self._condition:
+            while self._free_connections < 1:
+                self._condition.wait()
+
+            self._active_transfers += 1
+            granted_connections = max(1, min(self._free_connections, self.max_connections // max(self._active_transfers, self.concurrent_transfers)))
+            self._free_connections -= granted_connections
+            start_concurrency = self._active_transfers
+
+        connection_speed = round(budget * granted_connections / self.max_connections, 1) if budget else 'auto'
+        allocation = BandwidthAllocation(connection_speed, granted_connections)
+        start_time = perf_counter()
+        succeeded = False
+
+        try:
+            yield allocation
+            succeeded = True
+        finally:
+            duration = perf_counter() - start_time
+
+            with self._condition:
+                end_concurrency = self._active_transfers
+                self._active_transfers -= 1
+                self._free_connections += granted_connections
+                self._condition.notify_all()
+
+        if succeeded and allocation.bytes_transferred >= self.min_sample_size and duration > 0:
+            # Concurrent transfers share the link, so a single transfer only sees part of the total bandwidth
+            self._record(allocation.bytes_transferred, duration, (start_concurrency + end_concurrency) / 2)
+
+    def throttle(self, size: int, cancel_event: Optional[Event] = None) -> float:
+        """
+        Wait until a number of bytes fits in the bandwidth limit shared by every download (does nothing without a configured limit).
+        :param size: The number of bytes just read.
+        :param cancel_event: An optional Event object that interrupts the wait when it is set (an exception is then raised).
+        :return: The time spent waiting, in seconds.
+        """
+
+        return self._rate_limiter.acquire(size, cancel_event)
+
+    def _record(self, size: int, duration: float, concurrency: float) -> None:
+        measured_bandwidth = size * 8 / 1_000_000 / duration * max(1.0, concurrency)
+
+        with self._condition:
+            previous_bandwidth = self._state.get('bandwidth_mbps')
+            bandwidth = measured_bandwidth if previous_bandwidth is None else previous_bandwidth + self.smoothing * (measured_bandwidth - previous_bandwidth)
+
+            self._state.update(bandwidth_mbps=round(bandwidth, 3), samples=self._state.get('samples', 0) + 1, updated_at=time())
+            self.stats['transfers'] += 1
+            self.stats['bytes'] += size
+            self.stats['seconds'] += duration
+
+    def save(self) -> None:
+        """
+        Write the rolling estimate to the state file.
+        """
+
+        with self._condition:
+            data = dumps(self._state, indent=4)
+
+        try:
+            self.state_path.write_text(data, 'utf-8')
+        except (FileNotFoundError, PermissionError):
+            pass
+
+    def close(self) -> None:
+        self.save()
+
+    def __enter__(self) -> 'BandwidthManager':
+        return self
+
+    def __exit__(self, *_: Any) -> None:
+        self.close()
@@ -0,0 +1,252 @@
+# Built-in imports
+from json import dumps, loads
+from os import PathLike
+from pathlib import Path
+from sqlite3 import connect as sqlite_connect
+from threading import Lock
+from time import time
+from types import SimpleNamespace
+from typing import Any, Dict, Optional, Union
+from urllib.parse import urlparse, parse_qs
+
+
+extraction_cache_version = 1  # Bumped when the stored format changes, so the cached information is extracted again
+
+
+def _to_serializable(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {key: _to_serializable(item) for key, item in value.items()}
+    elif callable(getattr(value, 'to_dict', None)):
+        # The streamsnapper structures keep their data in private attributes behind properties, to_dict() gives the public names
+        return _to_serializable(value.to_dict())
+    elif isinstance(value, SimpleNamespace) or hasattr(value, '__dict__'):
+        return {key: _to_serializable(item) for key, item in vars(value).items()}
+    elif isinstance(value, (list, tuple)):
+        return [_to_serializable(item) for item in value]
+
+    return value
+
+def _to_namespace(value: Any) -> Any:
+    if isinstance(value, dict):
+        return SimpleNamespace(**{key: _to_namespace(item) for key, item in value.items()})
+    elif isinstance(value, list):
+        return [_to_namespace(item) for item in value]
+
+    return value
+
+def get_stream_url_expiration(url: Optional[str]) -> Optional[float]:
+    """
+    Get the expiration timestamp embedded in a YouTube stream URL (the "expire" query parameter).
+    :param url: The stream URL.
+    :return: The expiration timestamp or None if the URL does not have one.
+    """
+
+    if not url:
+        return None
+
+    try:
+        return float(parse_qs(urlparse(url).query)['expire'][0])
+    except (KeyError, IndexError, ValueError):
+        return None
+
+
+class ExtractionCache:
+    """
+    An on-disk LRU cache of the analyzed information and best audio stream of each video.
+    The stable information and the (expiring) stream data have separate TTLs.
+    """
+
+    def __init__(self, path: Union[str, PathLike], information_ttl: float = 7 * 24 * 3600, streams_ttl: float = 5 * 3600, max_entries: int = 10000) -> None:
+        """
+        Initialize the ExtractionCache class.
+        :param path: The path to the SQLite database file (it will be created if it does not exist).
+        :param information_ttl: How long (in seconds) the title, channel, upload date and thumbnails stay valid.
+        :param streams_ttl: How long (in seconds) the stream data stays valid (also capped by the "expire" parameter of the stream URL).
+        :param max_entries: The maximum number of cached videos, the least recently used ones are evicted first.
+        """
+
+        self.path: Path = Path(path)
+        self.information_ttl: float = information_ttl
+        self.streams_ttl: float = streams_ttl
+        self.max_entries: int = max(1, int(max_entries))
+        self.stats: Dict[str, int] = {'information_hits': 0, 'information_misses': 0, 'streams_hits': 0, 'streams_misses': 0, 'evictions': 0}
+        self._lock = Lock()
+        self._connection = sqlite_connect(self.path.as_posix(), check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS extractions ('
+            'video_id TEXT PRIMARY KEY, '
+            'information TEXT, '
+            'information_at REAL, '
+            'stream_info TEXT, '
+            'stream_info_at REAL, '
+            'stream_expires_at REAL, '
+            'last_used_at REAL NOT NULL)'
+        )
+        self._connection.execute('CREATE INDEX IF NOT EXISTS extractions_last_used_at ON extractions (last_used_at)')
+
+        # The information cached by older versions was stored with the private attribute names of streamsnapper
+        if self._connection.execute('PRAGMA user_version').fetchone()[0] < extraction_cache_version:
+            self._connection.execute('UPDATE extractions SET information = NULL, information_at = NULL')
+            self._connection.execute(f'PRAGMA user_version = {extraction_cache_version}')
+
+        self._connection.commit()
+
+    def get_information(self, video_id: str) -> Optional[SimpleNamespace]:
+        """
+        Get the cached information of a video, if it is still fresh.
+        :param video_id: The video ID.
+        :return: The information object (attribute access, like streamsnapper) or None on a miss.
+        """
+
+        now = time()
+
+        with self._lock:
+            row = self._connection.execute('SELECT information, information_at FROM extractions WHERE video_id = ?', (video_id,)).fetchone()
+
+            if not row or row[0] is None or now - row[1] > self.information_ttl:
+                self.stats['information_misses'] += 1
+                return None
+
+            self._connection.execute('UPDATE extractions SET last_used_at = ? WHERE video_id = ?', (now, video_id))
+            self._connection.commit()
+            self.stats['information_hits'] += 1
+
+        return _to_namespace(loads(row[0]))
+
+    def get_stream_info(self, video_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the cached best audio stream of a video, if it is still fresh and its URL has not expired.
+        :param video_id: The video ID.
+        :return: The stream information or None on a miss.
+        """
+
+        now = time()
+
+        with self._lock:
+            row = self._connection.execute('SELECT stream_info, stream_info_at, stream_expires_at FROM extractions WHERE video_id = ?', (video_id,)).fetchone()
+
+            # Keep a small margin, so an URL does not expire in the middle of the download
+            if not row or row[0] is None or now - row[1] > self.streams_ttl or (row[2] and now > row[2] - 600):
+                self.stats['streams_misses'] += 1
+                return None
+
+            self._connection.execute('UPDATE extractions SET last_used_at = ? WHERE video_id = ?', (now, video_id))
+            self._connection.commit()
+            self.stats['streams_hits'] += 1
+
+        return loads(row[0])
+
+    def put(self, video_id: str, information: Any = None, stream_info: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Store the information and/or the stream data of a video. Fields that are None are left untouched.
+        :param video_id: The video ID.
+        :param information: The information object from streamsnapper.
+        :param stream_info: The best audio stream from streamsnapper.
+        """
+
+        now = time()
+
+        with self._lock:
+            self._connection.execute('INSERT OR IGNORE INTO extractions (video_id, last_used_at) VALUES (?, ?)', (video_id, now))
+
+            if information is not None:
+                self._connection.execute('UPDATE extractions SET information = ?, information_at = ? WHERE video_id = ?', (dumps(_to_serializable(information)), now, video_id))
+
+            if stream_info is not None:
+                self._connection.execute('UPDATE extractions SET stream_info = ?, stream_info_at = ?, stream_expires_at = ? WHERE video_id = ?', (dumps(_to_serializable(stream_info)), now, get_stream_url_expiration(stream_info.get('url')), video_id))
+
+            self._connection.execute('UPDATE extractions SET last_used_at = ? WHERE video_id = ?', (now, video_id))
+            self._evict()
+            self._connection.commit()
+
+    def invalidate_streams(self, video_id: str) -> None:
+        """
+        Drop the stream data of a video (e.g. after its URL failed), keeping the stable information.
+        :param video_id: The video ID.
+        """
+
+        with self._lock:
+            self._connection.execute('UPDATE extractions SET stream_info = NULL, stream_info_at = NULL, stream_expires_at = NULL WHERE video_id = ?', (video_id,))
+            self._connection.commit()
+
+    def _evict(self) -> None:
+        excess = self._connection.execute('SELECT COUNT(*) FROM extractions').fetchone()[0] - self.max_entries
+
+        if excess > 0:
+            self._connection.execute('DELETE FROM extractions WHERE video_id IN (SELECT video_id FROM extractions ORDER BY last_used_at ASC LIMIT ?)', (excess,))
+            self.stats['evictions'] += excess
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    def __enter__(self) -> 'ExtractionCache':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalize a free-text query so equivalent queries share the same cache key (case and whitespace folding).
+    :param query: The query to normalize.
+    :return: The normalized query.
+    """
+
+    return ' '.join(query.casefold().split())
+
+
+class QueryCache:
+    """
+    A persistent cache that maps normalized search queries to the video ID of their first result.
+    """
+
+    def __init__(self, path: Union[str, PathLike]) -> None:
+        """
+        Initialize the QueryCache class.
+        :param path: The path to the SQLite database file (it will be created if it does not exist).
+        """
+
+        self.path: Path = Path(path)
+        self.stats: Dict[str, int] = {'hits': 0, 'misses': 0}
+        self._lock = Lock()
+        self._connection = sqlite_connect(self.path.as_posix(), check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('CREATE TABLE IF NOT EXISTS queries (query TEXT PRIMARY KEY, video_id TEXT NOT NULL, resolved_at REAL NOT NULL)')
+        self._connection.commit()
+
+    def get(self, query: str) -> Optional[str]:
+        """
+        Get the video ID a query was resolved to.
+        :param query: The query (it will be normalized).
+        :return: The video ID or None on a miss.
+        """
+
+        with self._lock:
+            row = self._connection.execute('SELECT video_id FROM queries WHERE query = ?', (normalize_query(query),)).fetchone()
+            self.stats['hits' if row else 'misses'] += 1
+
+        return row[0] if row else None
+
+    def put(self, query: str, video_id: str) -> None:
+        """
+        Store the video ID a query was resolved to.
+        :param query: The query (it will be normalized).
+        :param video_id: The video ID.
+        """
+
+        with self._lock:
+            self._connection.execute('INSERT OR REPLACE INTO queries (query, video_id, resolved_at) VALUES (?, ?, ?)', (normalize_query(query), video_id, time()))
+            self._connection.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    def __enter__(self) -> 'QueryCache':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
@@ -1,78 +1,294 @@
 # Built-in imports
-from re import match as re_match
-from typing import Callable, Dict, List
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from re import compile as re_compile
+from threading import local
+from typing import TYPE_CHECKING, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
-# Third-party imports
-from streamsnapper import YouTubeExtractor
+# Local imports
+from utils.cache import QueryCache, normalize_query
+from utils.general import is_valid_url
+from utils.metrics import get_metrics
+from utils.resilience import get_request_guard
 
+if TYPE_CHECKING:
+    from streamsnapper import YouTubeExtractor
 
-youtube_extractor = YouTubeExtractor()
+
+video_id_regex = re_compile(r'(?:[?&]v=|youtu\.be/|/shorts/|/embed/|/live/)([\w-]{11})(?![\w-])')
+_thread_state = local()
+
+# Regexes of each supported domain, used by the URLClassifier objects
+url_regexes: Dict[str, Dict[str, str]] = {
+    'youtube': {
+        'single': r'(https?://)?(www\.)?(youtube\.com/(watch\?v=|shorts/)|youtu\.be/)[\w-]+([?&][^\s]*)?$',
+        'playlist': r'(https?://)?(www\.)?youtube\.com/(watch\?v=[\w-]+&list=|playlist\?list=)[\w-]+'
+    },
+    'youtube_music': {
+        'single': r'(https?://)?(www\.)?music\.youtube\.com/watch\?v=[\w-]+(&[^\s]*)?$',
+        'playlist': r'(https?://)?(www\.)?music\.youtube\.com/playlist\?list=[\w-]+'
+    }
+}
+
+# A single combined pattern that finds the domain, the type and the ID of a URL in one pass (group names are "<domain>__<type>")
+dispatch_regex = re_compile(
+    r'(?:https?://)?(?:www\.)?(?:'
+    r'music\.youtube\.com/(?:playlist\?list=(?P<youtube_music__playlist>[\w-]+)|watch\?v=(?P<youtube_music__single>[\w-]+)(?:&\S*)?$)'
+    r'|youtube\.com/(?:(?:watch\?v=[\w-]+&list=|playlist\?list=)(?P<youtube__playlist>[\w-]+)|(?:watch\?v=|shorts/)(?P<youtube__single>[\w-]+)(?:[?&]\S*)?$)'
+    r'|youtu\.be/(?P<youtube__short_link>[\w-]+)(?:\?\S*)?$'
+    r')'
+)
 
 
 class URLClassifier:
-    def __init__(self, raw_name: str, fancy_name: str, regexes: Dict[str, str], extract_playlist_func: Callable = None) -> None:
+    def __init__(self, raw_name: str, fancy_name: str, regexes: Dict[str, str], extract_playlist_func: Callable = None, canonical_url_template: str = 'https://www.youtube.com/watch?v={}') -> None:
         self.raw_name: str = raw_name
         self.fancy_name: str = fancy_name
-        self.mixed_urls: Dict[str, List[str]] = {'single': [], 'playlist': []}
-        self.single_urls: List[str] = []
         self.regexes: Dict[str, str] = regexes
         self.extract_playlist_func: Callable = extract_playlist_func
+        self.canonical_url_template: str = canonical_url_template
 
-    def classify(self, url: str) -> None:
-        if re_match(self.regexes['playlist'], url):
-            self.mixed_urls['playlist'].append(url)
+    def expand_playlist(self, url: str) -> List[str]:
+        """
+        Get the video URLs of a playlist.
+        :param url: The playlist URL.
+        :return: The video URLs (empty if the playlist cannot be expanded).
+        """
 
-            if self.extract_playlist_func:
-                media_urls = self.extract_playlist_func(url)
+        if not self.extract_playlist_func:
+            return []
 
-                if media_urls:
-                    self.single_urls.extend(media_urls)
+        try:
+            return list(self.extract_playlist_func(url) or [])
+        except Exception:
+            return []
 
-        elif re_match(self.regexes['single'], url):
-            self.mixed_urls['single'].append(url)
-            self.single_urls.append(url)
+    def get_canonical_url(self, url: str) -> str:
+        """
+        Get the canonical form of a single video URL.
+        :param url: The video URL (youtube.com, youtu.be, shorts/ or music.youtube.com form).
+        :return: The canonical URL or the original URL if the video ID cannot be extracted.
+        """
 
+        video_id = extract_video_id(url)
 
-youtube_classifier = URLClassifier(
-    'youtube', 'YouTube', {
-        'single': r'(https?://)?(www\.)?(youtube\.com/(watch\?v=|shorts/)|youtu\.be/)[\w-]+(\?[^\s]*)?$',
-        'playlist': r'(https?://)?(www\.)?youtube\.com/(watch\?v=[\w-]+&list=|playlist\?list=)[\w-]+'
-    },
-    extract_playlist_func=youtube_extractor.get_playlist_videos
-)
+        return self.canonical_url_template.format(video_id) if video_id else url
 
-youtube_music_classifier = URLClassifier(
-    'youtube_music', 'YouTube Music', {
-        'single': r'(https?://)?(www\.)?music\.youtube\.com/watch\?v=[\w-]+(&[^\s]*)?$',
-        'playlist': r'(https?://)?(www\.)?music\.youtube\.com/playlist\?list=[\w-]+'
-    },
-    extract_playlist_func=youtube_extractor.get_playlist_videos
-)
 
+def extract_video_id(url: str) -> Optional[str]:
+    """
+    Extract the 11-character video ID from a YouTube or YouTube Music URL.
+    :param url: The URL to extract the ID from.
+    :return: The video ID or None if the URL does not point to a single video.
+    """
+
+    found_id = video_id_regex.search(url)
+
+    return found_id.group(1) if found_id else None
+
+def classify_url(url: str) -> Optional[Tuple[str, str, str]]:
+    """
+    Classify a URL with the combined dispatch pattern, extracting its ID in the same pass.
+    :param url: The URL to classify.
+    :return: A (domain, type, ID) tuple, e.g. ("youtube", "single", "dQw4w9WgXcQ"), or None if the URL is not supported.
+    """
+
+    found_url = dispatch_regex.match(url)
+
+    if not found_url:
+        return None
+
+    domain, url_type = found_url.lastgroup.split('__')
+
+    return domain, 'single' if url_type == 'short_link' else url_type, found_url.group(found_url.lastgroup)
+
+def is_url_input(line: str) -> bool:
+    """
+    Check if an input line is a URL (True) or a free-text query (False), without running the full URL validator for supported URLs.
+    :param line: The stripped input line.
+    :return: True if the line is a URL, False otherwise.
+    """
+
+    if dispatch_regex.match(line):
+        return True
+
+    # URLs never contain whitespace, so anything with spaces is a query
+    if any(character.isspace() for character in line):
+        return False
+
+    return bool(is_valid_url(line, online_check=False))
+
+def get_thread_extractor() -> 'YouTubeExtractor':
+    """
+    Get the YouTubeExtractor object of the current thread (one per thread, they are not shared).
+    :return: The YouTubeExtractor object.
+    """
+
+    if not hasattr(_thread_state, 'youtube_extractor'):
+        from streamsnapper import YouTubeExtractor
+
+        _thread_state.youtube_extractor = YouTubeExtractor()
 
-def sort_urls_by_type_and_domain(input_queries_obj: type) -> type:
+    return _thread_state.youtube_extractor
+
+def get_playlist_videos(url: str) -> List[str]:
+    """
+    Get the video URLs of a YouTube or YouTube Music playlist, using the extractor of the current thread.
+    :param url: The playlist URL.
+    :return: The video URLs.
+    """
+
+    with get_metrics().span('playlist'):
+        return get_request_guard().call('playlist', get_thread_extractor().get_playlist_videos, url)
+
+def create_classifiers() -> List[URLClassifier]:
+    """
+    Create a fresh set of URL classifiers.
+    :return: The list of URL classifiers (YouTube and YouTube Music).
+    """
+
+    youtube_classifier = URLClassifier('youtube', 'YouTube', url_regexes['youtube'], extract_playlist_func=get_playlist_videos)
+    youtube_music_classifier = URLClassifier(
+        'youtube_music', 'YouTube Music', url_regexes['youtube_music'],
+        extract_playlist_func=get_playlist_videos,
+        canonical_url_template='https://music.youtube.com/watch?v={}'
+    )
+
+    return [youtube_classifier, youtube_music_classifier]
+
+def search_video_id(query: str) -> Optional[str]:
     """
-    Sort URLs by type (single or playlist) and domain.
-    :param input_queries_obj: The InputQueries object.
-    :return: The updated InputQueries object.
+    Search a free-text query on YouTube, using the extractor of the current thread.
+    :param query: The query to search.
+    :return: The video ID of the first result or None if nothing was found.
     """
 
-    classifiers = [youtube_classifier, youtube_music_classifier]
+    try:
+        with get_metrics().span('search'):
+            search_results = get_request_guard().call('search', get_thread_extractor().search, query)
+    except Exception:
+        return None
+
+    return extract_video_id(search_results[0]) if search_results else None
+
+
+class IngestionStats:
+    """
+    Running counters of a streamed ingestion, so any input can be summarized without keeping its lists of URLs in memory, and the playlists each track came from.
+    """
+
+    def __init__(self) -> None:
+        self.urls: int = 0
+        self.queries: int = 0
+        self.unresolved_queries: int = 0
+        self.playlists: int = 0
+        self.unsupported_urls: int = 0
+        self.tracks: int = 0
+        self.duplicates: int = 0
+        self.track_sources: Dict[str, List[str]] = {}  # The playlists each track (video ID) came from, also through its duplicates
+
+
+def iter_track_urls(lines: Iterable[str], search_workers: int = 8, query_cache: Optional[QueryCache] = None, playlist_workers: int = 4, buffer_size: int = 64, stats: Optional[IngestionStats] = None, expand_playlist_func: Optional[Callable[[URLClassifier, str], List[str]]] = None) -> Iterator[str]:
+    """
+    Lazily turn input lines (URLs or queries) into canonical video URLs, yielding each one as soon as it is known.
+    Searches and playlist expansions run in the background, at most "buffer_size" inputs are in flight, and the lines are only read as the consumer asks for more URLs.
+    The URLs keep the input order and every video ID is yielded once, the playlists it came from are recorded in the "track_sources" of the stats.
+    Equivalent queries (after case and whitespace folding) in flight at the same time share a single search, a finished search is forgotten once consumed (the query cache remembers its result).
+    :param lines: The stripped input lines (one URL or query per line).
+    :param search_workers: The maximum number of concurrent searches for the text queries.
+    :param query_cache: The QueryCache object used to memoize the search results between runs.
+    :param playlist_workers: The maximum number of playlists expanded concurrently.
+    :param buffer_size: The maximum number of input lines being resolved ahead of the consumer.
+    :param stats: An optional IngestionStats object where the counters are updated.
+    :param expand_playlist_func: The function called with (classifier, playlist URL) to get the video URLs of a playlist (if None, every playlist is fully enumerated).
+    :return: An iterator over the canonical video URLs.
+    """
+
+    stats = stats if stats is not None else IngestionStats()
+    classifiers_by_name = {classifier.raw_name: classifier for classifier in create_classifiers()}
+    pending_entries: Deque[Tuple[URLClassifier, Union[Future, List[str]], Optional[str], Optional[str]]] = deque()
+    searches: Dict[str, Future] = {}
+    buffer_size = max(1, int(buffer_size))
+    expand_playlist_func = expand_playlist_func or (lambda classifier, url: classifier.expand_playlist(url))
+
+    def search(query: str) -> List[str]:
+        video_id = search_video_id(query)
+
+        if video_id and query_cache:
+            query_cache.put(normalize_query(query), video_id)
+
+        return [f'https://www.youtube.com/watch?v={video_id}'] if video_id else []
+
+    def drain(max_pending_entries: int) -> Iterator[str]:
+        # The oldest entry is waited for only when too many are in flight, finished entries are always released
+        while pending_entries and (len(pending_entries) > max_pending_entries or not isinstance(pending_entries[0][1], Future) or pending_entries[0][1].done()):
+            classifier, result, normalized_query, source_playlist = pending_entries.popleft()
+            media_urls = result.result() if isinstance(result, Future) else result
+
+            # Only the searches still in flight are kept, so the memory does not grow with the number of queries
+            if normalized_query is not None and searches.get(normalized_query) is result:
+                del searches[normalized_query]
+
+            if normalized_query is not None and not media_urls:
+                stats.unresolved_queries += 1
+
+            for media_url in media_urls:
+                track_key = extract_video_id(media_url) or media_url
+                is_duplicate = track_key in stats.track_sources
+                track_sources = stats.track_sources.setdefault(track_key, [])
+
+                if source_playlist and source_playlist not in track_sources:
+                    track_sources.append(source_playlist)
+
+                if is_duplicate:
+                    stats.duplicates += 1
+                    continue
+
+                stats.tracks += 1
+
+                yield classifier.get_canonical_url(media_url)
+
+    search_executor = ThreadPoolExecutor(max_workers=max(1, search_workers), thread_name_prefix='ingestion-search')
+    playlist_executor = ThreadPoolExecutor(max_workers=max(1, playlist_workers), thread_name_prefix='ingestion-playlist')
+
+    try:
+        for line in lines:
+            if is_url_input(line):
+                stats.urls += 1
+                classified_url = classify_url(line)
+
+                if not classified_url:
+                    stats.unsupported_urls += 1
+                    continue
+
+                classifier = classifiers_by_name[classified_url[0]]
+
+                if classified_url[1] == 'playlist':
+                    stats.playlists += 1
+                    pending_entries.append((classifier, playlist_executor.submit(expand_playlist_func, classifier, line), None, line))
+                else:
+                    pending_entries.append((classifier, [line], None, None))
+            else:
+                # At the moment, searching for songs by name is only supported by YouTube
+                stats.queries += 1
+                normalized_query = normalize_query(line)
+                cached_id = query_cache.get(normalized_query) if query_cache else None
 
-    for url in input_queries_obj._urls:
-        for classifier in classifiers:
-            classifier.classify(url)
+                if cached_id:
+                    result = [f'https://www.youtube.com/watch?v={cached_id}']
+                else:
+                    # A query already searched (or being searched) shares the same search
+                    if normalized_query not in searches:
+                        searches[normalized_query] = search_executor.submit(search, line)
 
-    # Classify the queries (at the moment, searching for songs by name is only supported by YouTube)
-    for query in input_queries_obj._queries:
-        youtube_media_url = youtube_extractor.search(query)
+                    result = searches[normalized_query]
 
-        if youtube_media_url:
-            for classifier in classifiers:
-                classifier.classify(youtube_media_url[0])
+                pending_entries.append((classifiers_by_name['youtube'], result, normalized_query, None))
 
-    # Update the object with the sorted URLs
-    input_queries_obj.SortedURLs.youtube = youtube_classifier
-    input_queries_obj.SortedURLs.youtube_music = youtube_music_classifier
+            yield from drain(buffer_size - 1)
 
-    return input_queries_obj
+        yield from drain(0)
+    finally:
+        # Also reached when the consumer stops early, the searches and expansions that have not started are dropped
+        search_executor.shutdown(wait=False, cancel_futures=True)
+        playlist_executor.shutdown(wait=False, cancel_futures=True)
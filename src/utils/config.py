@@ -1,4 +1,5 @@
 # Built-in imports
+from os import cpu_count
 from tempfile import gettempdir
 from pathlib import Path
 from platform import system as system_name
@@ -20,3 +21,74 @@ class Config:
     main_resources_path: str = Path(main_path, 'resources').resolve().as_posix()
     media_path: str = Path(main_resources_path, 'media').resolve().as_posix()
     tools_path: str = Path(main_resources_path, 'tools').resolve().as_posix()
+    archive_path: str = Path(main_resources_path, 'archive.sqlite3').resolve().as_posix()
+    extraction_cache_path: str = Path(main_resources_path, 'extraction_cache.sqlite3').resolve().as_posix()
+    query_cache_path: str = Path(main_resources_path, 'query_cache.sqlite3').resolve().as_posix()
+    covers_path: str = Path(main_resources_path, 'covers').resolve().as_posix()
+    preflight_cache_path: str = Path(main_resources_path, 'preflight.json').resolve().as_posix()
+    metrics_path: str = Path(main_path, 'metrics').resolve().as_posix()
+    bandwidth_state_path: str = Path(main_resources_path, 'bandwidth.json').resolve().as_posix()
+    playlist_snapshots_path: str = Path(main_resources_path, 'playlist_snapshots.sqlite3').resolve().as_posix()
+    library_index_path: str = Path(main_resources_path, 'library.sqlite3').resolve().as_posix()
+    journal_path: str = Path(main_resources_path, 'journal.jsonl').resolve().as_posix()
+    incomplete_downloads_path: str = Path(default_downloaded_musics_path, '.incomplete').resolve().as_posix()
+    version_check_ttl: int = 6 * 3600
+
+    # Pipeline settings (number of workers per stage and the size of the queues between stages)
+    extract_workers: int = 4
+    download_workers: int = 4
+    transcode_workers: int = cpu_count() or 1  # Also the size of the transcoding process pool
+    tag_workers: int = 2
+    pipeline_queue_size: int = 32
+    download_scheduling_policy: str = 'fifo'  # Order of the jobs waiting for a download: "fifo" (input order), "sjf" (smallest stream first) or "ljf" (largest stream first)
+    transcode_scheduling_policy: str = 'fifo'  # Order of the jobs waiting for a transcode: "fifo", "sjf" (shortest estimated CPU time first) or "ljf" (longest first, packs the cores at the end of a batch)
+    search_workers: int = 8
+    playlist_workers: int = 4
+    playlist_snapshot_ttl: int = 300  # Seconds during which a playlist snapshot is trusted and the playlist is not enumerated again
+    removed_tracks_path: str = ''  # Where tracks removed from the synced playlists are moved (empty keeps them in the music folder)
+    ingestion_buffer_size: int = 64  # Maximum number of input lines resolved (searched or expanded) ahead of the pipeline
+    library_scan_workers: int = 8
+    skip_library_duplicates: bool = True  # Skip the tracks already in the library index (renamed files, same artist/title/duration under another video ID)
+    progress_refresh_rate: float = 4.0  # Maximum redraws per second of the progress line on a terminal
+    progress_log_interval: float = 10.0  # Seconds between two progress lines when the output is not a terminal
+    daemon_poll_interval: float = 2.0  # Seconds between two scans of an empty daemon queue
+
+    # Bandwidth settings (global budgets shared by the concurrent downloads, the bandwidth is measured when no limit is set)
+    max_bandwidth: float = 0  # In Mbps, enforced on the "stream" download backend and only passed as a speed hint to TurboDL, 0 disables the limit (the budget is then split from the measured estimate)
+    max_download_connections: int = 16
+    bandwidth_smoothing: float = 0.3  # Weight of the newest measurement in the rolling estimate
+
+    # Request limits per endpoint class (requests per second, 0 disables the limit), slowed down automatically when the server answers with 429
+    endpoint_rate_limits: dict = {'search': 5.0, 'playlist': 2.0, 'extract': 5.0, 'media': 10.0}
+    max_retries: int = 4  # Retries of a call that failed with a transient error (429, 5xx, dropped connection)
+    retry_base_delay: float = 1.0  # In seconds, doubled on every retry (with full jitter)
+    retry_max_delay: float = 30.0
+    max_stream_refreshes: int = 2  # Re-extractions of a track whose stream URL expired during the download
+
+    # Circuit breaker settings (every call waits for the cool-down when the error rate of the window reaches the threshold)
+    circuit_breaker_error_rate: float = 0.5
+    circuit_breaker_min_calls: int = 10
+    circuit_breaker_window: float = 60.0  # In seconds
+    circuit_breaker_cooldown: float = 30.0  # In seconds
+
+    # Audio download backend: "stream" (single pooled connection of the shared session, bandwidth limit enforced, an interrupted download is resumed)
+    # or "turbodl" (multiple connections outside the shared pools, bandwidth limit only passed as a hint, an interrupted download starts over)
+    download_backend: str = 'stream'
+
+    # Transcoding backend: "ffmpeg" (streaming subprocess), "pydub" (full in-memory decode) or "auto"
+    transcode_backend: str = 'auto'
+    max_output_bitrate: int = 0  # In kbps, 0 keeps the source bitrate (allows OPUS sources to be copied without re-encoding)
+
+    # Additional output profiles, produced from the same decode as the main OPUS output (FFmpeg is required when any is set)
+    # Each profile: {"name": ..., "codec": "opus" | "vorbis" | "mp3" | "aac" | "flac", "bitrate": kbps, "path": destination directory, "template": naming template}
+    # Template fields: {title}, {artist}, {year} and {id}, e.g. {"name": "mobile", "codec": "opus", "bitrate": 64, "path": "/sync/mobile", "template": "{artist} - {title}"}
+    output_profiles: list = []
+
+    # Extraction cache settings (TTLs in seconds)
+    extraction_cache_information_ttl: int = 7 * 24 * 3600
+    extraction_cache_streams_ttl: int = 5 * 3600
+    extraction_cache_max_entries: int = 10000
+
+    # Cover art settings (maximum width/height in pixels and JPEG quality of the embedded covers)
+    cover_max_size: int = 600
+    cover_quality: int = 90
@@ -0,0 +1,137 @@
+# Built-in imports
+from hashlib import sha256
+from io import BytesIO
+from os import PathLike, getpid
+from pathlib import Path
+from threading import Lock, get_ident
+from typing import Callable, Dict, Iterable, Optional, Union
+
+# Local imports
+from utils.general import is_image_corrupted
+from utils.network import get_download_manager
+from utils.resilience import get_request_guard
+
+
+def fetch_url_bytes(url: str) -> bytes:
+    """
+    Download a URL into memory with the shared download manager.
+    :param url: The URL to download.
+    :return: The response content.
+    """
+
+    return get_download_manager().fetch_bytes(url)
+
+def resize_cover_image(image_data: bytes, max_size: int = 600, quality: int = 90) -> bytes:
+    """
+    Downsize a cover image so its largest side is at most max_size pixels, re-encoded as JPEG.
+    :param image_data: The image content.
+    :param max_size: The maximum width and height in pixels.
+    :param quality: The JPEG quality (1-95).
+    :return: The processed image content (the original content if it is already a small enough JPEG).
+    """
+
+    from PIL import Image
+
+    with Image.open(BytesIO(image_data)) as image:
+        if image.format == 'JPEG' and max(image.size) <= max_size:
+            return image_data
+
+        image = image.convert('RGB')
+        image.thumbnail((max_size, max_size), Image.LANCZOS)
+
+        output = BytesIO()
+        image.save(output, format='JPEG', quality=quality, optimize=True)
+
+    return output.getvalue()
+
+
+class CoverArtStore:
+    """
+    A content-addressed store of processed cover images.
+    Covers are fetched into memory, validated, downsized once per distinct content and shared by every track that uses them.
+    """
+
+    def __init__(self, path: Union[str, PathLike], max_size: int = 600, quality: int = 90, fetch_func: Optional[Callable[[str], bytes]] = None) -> None:
+        """
+        Initialize the CoverArtStore class.
+        :param path: The directory where the processed covers are stored (named by the SHA-256 of the source image).
+        :param max_size: The maximum width and height of the processed covers, in pixels.
+        :param quality: The JPEG quality of the processed covers.
+        :param fetch_func: The function used to download a URL into memory (defaults to fetch_url_bytes).
+        """
+
+        self.path: Path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.max_size: int = max_size
+        self.quality: int = quality
+        self.fetch_func: Callable[[str], bytes] = fetch_func or fetch_url_bytes
+        self.stats: Dict[str, int] = {'downloads': 0, 'url_hits': 0, 'content_hits': 0, 'processed': 0, 'invalid': 0}
+        self._url_index: Dict[str, Path] = {}
+        self._lock = Lock()
+
+    def get_cover(self, urls: Union[str, Iterable[str]]) -> Optional[Path]:
+        """
+        Get the processed cover of a track, trying each URL in order until a valid image is found.
+        :param urls: The thumbnail URL or URLs (best first).
+        :return: The path to the processed cover in the store or None if no valid image was found.
+        """
+
+        for url in [urls] if isinstance(urls, str) else urls:
+            with self._lock:
+                cover_path = self._url_index.get(url)
+
+            if cover_path and cover_path.is_file():
+                self._count('url_hits')
+                return cover_path
+
+            try:
+                # The covers share the rate limit, the retries and the circuit breaker of the other media downloads
+                image_data = get_request_guard().call('media', self.fetch_func, url)
+                self._count('downloads')
+            except Exception:
+                continue
+
+            cover_path = self.add_image(image_data)
+
+            if cover_path:
+                with self._lock:
+                    self._url_index[url] = cover_path
+
+                return cover_path
+
+        return None
+
+    def add_image(self, image_data: bytes) -> Optional[Path]:
+        """
+        Validate and process an image, unless the same content has already been processed.
+        :param image_data: The source image content.
+        :return: The path to the processed cover in the store or None if the image is corrupted.
+        """
+
+        cover_path = Path(self.path, f'{sha256(image_data).hexdigest()}.jpg')
+
+        if cover_path.is_file():
+            self._count('content_hits')
+            return cover_path
+
+        if not image_data or is_image_corrupted(image_data):
+            self._count('invalid')
+            return None
+
+        try:
+            processed_data = resize_cover_image(image_data, self.max_size, self.quality)
+        except Exception:
+            self._count('invalid')
+            return None
+
+        # Write to a unique temporary name first, so concurrent workers never see a half-written cover
+        temporary_path = cover_path.with_name(f'.{cover_path.name}.{getpid()}.{get_ident()}.tmp')
+        temporary_path.write_bytes(processed_data)
+        temporary_path.replace(cover_path)
+        self._count('processed')
+
+        return cover_path
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self.stats[key] += 1
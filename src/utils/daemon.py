@@ -0,0 +1,125 @@
+# Built-in imports
+from json import dumps
+from os import PathLike
+from pathlib import Path
+from threading import Event
+from time import time
+from typing import Callable, Optional, Union
+
+# Local imports
+from utils.general import iter_lines_from_file
+from utils.runner import BatchResult, SyncRunner
+
+
+class QueueDaemon:
+    """
+    Processes the query files dropped in a queue directory, one batch per file, with a single warm SyncRunner.
+    New jobs are "*.txt" files in the queue directory (write them under another name and rename them, so half-written files are never picked up).
+    A job is claimed by moving it to "processing/", and it ends up in "done/" or "failed/" next to a JSON file with its outcome.
+    Jobs left in "processing/" by a stopped daemon are queued again on the next start.
+    """
+
+    def __init__(self, runner: SyncRunner, queue_path: Union[str, PathLike], poll_interval: float = 2.0, on_event: Optional[Callable[[str, Path, Optional[BatchResult]], None]] = None) -> None:
+        """
+        Initialize the QueueDaemon class.
+        :param runner: The SyncRunner object that processes the batches.
+        :param queue_path: The queue directory (the subdirectories are created if needed).
+        :param poll_interval: How long to wait between two scans of an empty queue, in seconds.
+        :param on_event: An optional callback called with ("started" | "done" | "failed", job path, BatchResult or None).
+        """
+
+        self.runner: SyncRunner = runner
+        self.queue_path: Path = Path(queue_path)
+        self.processing_path: Path = Path(self.queue_path, 'processing')
+        self.done_path: Path = Path(self.queue_path, 'done')
+        self.failed_path: Path = Path(self.queue_path, 'failed')
+        self.poll_interval: float = poll_interval
+        self.on_event: Optional[Callable[[str, Path, Optional[BatchResult]], None]] = on_event
+        self.stop_event = Event()
+
+        for path in (self.queue_path, self.processing_path, self.done_path, self.failed_path):
+            path.mkdir(parents=True, exist_ok=True)
+
+    def recover(self) -> int:
+        """
+        Queue again the jobs that were being processed when the daemon stopped.
+        :return: The number of recovered jobs.
+        """
+
+        recovered_paths = list(self.processing_path.glob('*.txt'))
+
+        for path in recovered_paths:
+            path.replace(Path(self.queue_path, path.name))
+
+        return len(recovered_paths)
+
+    def claim_next_job(self) -> Optional[Path]:
+        """
+        Claim the oldest job of the queue.
+        :return: The path to the claimed job (in "processing/") or None if the queue is empty.
+        """
+
+        for path in sorted(self.queue_path.glob('*.txt'), key=lambda queued_path: queued_path.stat().st_mtime):
+            claimed_path = Path(self.processing_path, path.name)
+
+            try:
+                path.replace(claimed_path)
+            except FileNotFoundError:
+                # Claimed by another daemon watching the same directory
+                continue
+
+            return claimed_path
+
+        return None
+
+    def process_job(self, path: Path) -> Optional[BatchResult]:
+        """
+        Process a claimed job and move it to "done/" or "failed/" with its outcome.
+        :param path: The path to the claimed job.
+        :return: The BatchResult object or None if the batch could not be processed.
+        """
+
+        self._notify('started', path, None)
+        started_at = time()
+
+        try:
+            result = self.runner.run(iter_lines_from_file(path, fix_lines=True))
+        except Exception as e:
+            self._finish(path, self.failed_path, {'started_at': started_at, 'finished_at': time(), 'error': str(e)})
+            self._notify('failed', path, None)
+            return None
+
+        self._finish(path, self.done_path if not result.failed_jobs else self.failed_path, {'started_at': started_at, 'finished_at': time(), **result.to_dict()})
+        self._notify('done' if not result.failed_jobs else 'failed', path, result)
+
+        return result
+
+    def run_forever(self) -> None:
+        """
+        Process the queue until stop() is called.
+        """
+
+        self.recover()
+
+        while not self.stop_event.is_set():
+            path = self.claim_next_job()
+
+            if path:
+                self.process_job(path)
+            else:
+                self.stop_event.wait(self.poll_interval)
+
+    def stop(self) -> None:
+        """
+        Ask the daemon to stop after the current job.
+        """
+
+        self.stop_event.set()
+
+    def _finish(self, path: Path, destination_path: Path, outcome: dict) -> None:
+        Path(destination_path, f'{path.stem}.json').write_text(dumps(outcome, indent=4), 'utf-8')
+        path.replace(Path(destination_path, path.name))
+
+    def _notify(self, event: str, path: Path, result: Optional[BatchResult]) -> None:
+        if self.on_event:
+            self.on_event(event, path, result)
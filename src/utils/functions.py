@@ -1,20 +1,255 @@
 # Built-in imports
+from base64 import b64encode
+from io import BytesIO
 from os import PathLike
 from pathlib import Path
-from typing import Optional, Union
+from shutil import which
+from struct import pack
+from subprocess import run as subprocess_run, PIPE, DEVNULL
+from typing import Any, Dict, List, Optional, Union
 
-# Third-party imports
-from pydub import AudioSegment
-from music_tag import load_file as mt_load_file
 
+def get_ffmpeg_binary() -> Optional[str]:
+    """
+    Get the path to the FFmpeg binary available in the system PATH (added by download_latest_ffmpeg).
+    :return: The path to the FFmpeg binary or None if it cannot be found.
+    """
+
+    return which('ffmpeg')
+
+def build_tags(title: Optional[str] = None, artist: Optional[str] = None, year: Optional[Union[str, int]] = None) -> Dict[str, Optional[str]]:
+    """
+    Build the Vorbis comment tags of a track.
+    :param title: The track title.
+    :param artist: The track artist.
+    :param year: The release year.
+    :return: The tags, ready for run_ffmpeg_to_opus.
+    """
+
+    return {'title': title, 'artist': artist, 'date': str(year) if year is not None else None}
+
+def build_picture_block(image_data: bytes) -> bytes:
+    """
+    Build a FLAC/Vorbis METADATA_BLOCK_PICTURE structure (front cover) for an image.
+    :param image_data: The image file content.
+    :return: The binary picture block (it must be base64-encoded before being stored in a Vorbis comment).
+    """
+
+    mime_type, width, height, depth = 'image/jpeg', 0, 0, 0
+
+    try:
+        from PIL import Image
+
+        with Image.open(BytesIO(image_data)) as image:
+            mime_type = Image.MIME.get(image.format, mime_type)
+            width, height = image.size
+            depth = len(image.getbands()) * 8
+    except Exception:
+        # The dimensions are informative only, players read the image data itself
+        pass
+
+    mime_type = mime_type.encode('ascii')
+
+    return (
+        pack('>II', 3, len(mime_type)) + mime_type
+        + pack('>IIIIII', 0, width, height, depth, 0, len(image_data))
+        + image_data
+    )
+
+def build_ffmetadata(tags: Optional[Dict[str, Optional[str]]] = None, cover_image: Optional[Union[str, PathLike, bytes]] = None) -> str:
+    """
+    Build an FFmpeg metadata file (FFMETADATA1) with the tags and the cover image of a track.
+    :param tags: The tags to write (e.g. {"title": ..., "artist": ..., "date": ...}), None values are skipped.
+    :param cover_image: The cover image, as a path or as the image content.
+    :return: The FFmpeg metadata file content.
+    """
+
+    def escape(value: str) -> str:
+        for character in ('\\', '=', ';', '#', '\n'):
+            value = value.replace(character, f'\\{character}')
+
+        return value
+
+    lines = [';FFMETADATA1']
+
+    for key, value in (tags or {}).items():
+        if value is not None:
+            lines.append(f'{escape(key)}={escape(str(value))}')
+
+    if cover_image:
+        image_data = cover_image if isinstance(cover_image, bytes) else Path(cover_image).read_bytes()
+        lines.append(f'METADATA_BLOCK_PICTURE={escape(b64encode(build_picture_block(image_data)).decode("ascii"))}')
+
+    return '\n'.join(lines) + '\n'
+
+def run_ffmpeg_to_opus(path: Union[str, PathLike], output_path: Union[str, PathLike], codec_args: List[str], tags: Optional[Dict[str, Optional[str]]] = None, cover_image: Optional[Union[str, PathLike, bytes]] = None, ffmpeg_path: Optional[str] = None) -> None:
+    """
+    Run FFmpeg from file to file, producing an Ogg OPUS output with its tags and cover image written in the same pass.
+    :param path: The path to the source audio file.
+    :param output_path: The path to the output audio file.
+    :param codec_args: The audio codec arguments (e.g. ["-c:a", "copy"]).
+    :param tags: The tags to embed (if None and no cover image is given, the output has no tags).
+    :param cover_image: The cover image to embed, as a path or as the image content.
+    :param ffmpeg_path: The path to the FFmpeg binary (if None, it will be looked up in the system PATH).
+    """
+
+    ffmpeg_path = ffmpeg_path or get_ffmpeg_binary()
+
+    if not ffmpeg_path:
+        raise Exception('Failed to find the FFmpeg binary.')
+
+    has_metadata = bool(tags or cover_image)
+
+    # The metadata is sent through stdin, so large cover images never hit the command line length limits
+    command = [ffmpeg_path, '-hide_banner', '-nostdin', '-loglevel', 'error', '-y', '-i', Path(path).as_posix()]
+    command += ['-f', 'ffmetadata', '-i', 'pipe:0', '-map_metadata', '1'] if has_metadata else ['-map_metadata', '-1']
+    command += ['-vn', '-map', '0:a:0', *codec_args, '-f', 'opus', Path(output_path).as_posix()]
+
+    if has_metadata:
+        process = subprocess_run(command, input=build_ffmetadata(tags, cover_image).encode('utf-8'), stdout=DEVNULL, stderr=PIPE)
+    else:
+        process = subprocess_run(command, stdin=DEVNULL, stdout=DEVNULL, stderr=PIPE)
+
+    if process.returncode != 0:
+        Path(output_path).unlink(missing_ok=True)
+        raise Exception(process.stderr.decode('utf-8', errors='replace').strip() or f'FFmpeg exited with code {process.returncode}')
+
+def transcode_audio_with_ffmpeg(path: Union[str, PathLike], output_path: Union[str, PathLike], bitrate: int, ffmpeg_path: Optional[str] = None, tags: Optional[Dict[str, Optional[str]]] = None, cover_image: Optional[Union[str, PathLike, bytes]] = None) -> None:
+    """
+    Transcode an audio file to the OPUS codec by streaming it through an FFmpeg subprocess (file to file, constant memory usage).
+    :param path: The path to the source audio file.
+    :param output_path: The path to the output audio file.
+    :param bitrate: The output bitrate in kbps.
+    :param ffmpeg_path: The path to the FFmpeg binary (if None, it will be looked up in the system PATH).
+    :param tags: The tags to embed during the encoding.
+    :param cover_image: The cover image to embed during the encoding.
+    """
+
+    try:
+        run_ffmpeg_to_opus(path, output_path, ['-c:a', 'libopus', '-b:a', f'{bitrate}k'], tags, cover_image, ffmpeg_path)
+    except Exception as e:
+        raise Exception(f'Failed to transcode the audio file with FFmpeg: {e}')
+
+def remux_audio_with_ffmpeg(path: Union[str, PathLike], output_path: Union[str, PathLike], ffmpeg_path: Optional[str] = None, tags: Optional[Dict[str, Optional[str]]] = None, cover_image: Optional[Union[str, PathLike, bytes]] = None) -> None:
+    """
+    Copy the OPUS audio stream of a file into an Ogg OPUS container without re-encoding it.
+    :param path: The path to the source audio file (the audio stream must already be OPUS).
+    :param output_path: The path to the output audio file.
+    :param ffmpeg_path: The path to the FFmpeg binary (if None, it will be looked up in the system PATH).
+    :param tags: The tags to embed during the copy.
+    :param cover_image: The cover image to embed during the copy.
+    """
+
+    try:
+        run_ffmpeg_to_opus(path, output_path, ['-c:a', 'copy'], tags, cover_image, ffmpeg_path)
+    except Exception as e:
+        raise Exception(f'Failed to remux the audio file with FFmpeg: {e}')
+
+def fan_out_audio_with_ffmpeg(path: Union[str, PathLike], output_path: Union[str, PathLike], codec_args: List[str], profile_outputs: List[Dict[str, Any]], tags: Optional[Dict[str, Optional[str]]] = None, cover_image: Optional[Union[str, PathLike]] = None, ffmpeg_path: Optional[str] = None) -> None:
+    """
+    Produce the main Ogg OPUS output and the outputs of every additional profile in a single FFmpeg run: the source is read and decoded once and its audio is sent to every encoder.
+    Each output gets the tags and the cover image (as a METADATA_BLOCK_PICTURE comment in Ogg containers, as an attached picture otherwise).
+    :param path: The path to the source audio file.
+    :param output_path: The path to the main output audio file.
+    :param codec_args: The audio codec arguments of the main output (e.g. ["-c:a", "copy"]).
+    :param profile_outputs: The additional outputs ("path", "encoder", "muxer" and "bitrate" in kbps, None for lossless codecs).
+    :param tags: The tags to embed.
+    :param cover_image: The path to the cover image to embed.
+    :param ffmpeg_path: The path to the FFmpeg binary (if None, it will be looked up in the system PATH).
+    """
+
+    ffmpeg_path = ffmpeg_path or get_ffmpeg_binary()
+
+    if not ffmpeg_path:
+        raise Exception('Failed to find the FFmpeg binary.')
+
+    output_paths = [Path(output_path).as_posix()] + [profile_output['path'] for profile_output in profile_outputs]
+    outputs = [(codec_args, 'opus')] + [(['-c:a', profile_output['encoder']] + (['-b:a', f'{profile_output["bitrate"]}k'] if profile_output['bitrate'] else []), profile_output['muxer']) for profile_output in profile_outputs]
+    has_metadata = bool(tags or cover_image)
+
+    # The metadata of the Ogg outputs (with the large picture comment) is sent through stdin, the other containers take the cover image as a video stream
+    command = [ffmpeg_path, '-hide_banner', '-nostdin', '-loglevel', 'error', '-y', '-i', Path(path).as_posix(), '-f', 'ffmetadata', '-i', 'pipe:0']
+    command += ['-i', Path(cover_image).as_posix()] if cover_image else []
+
+    for (output_codec_args, muxer), output_file_path in zip(outputs, output_paths):
+        command += ['-map', '0:a:0']
+
+        if muxer in ('opus', 'ogg'):
+            command += ['-map_metadata', '1' if has_metadata else '-1']
+        else:
+            command += ['-map_metadata', '-1']
+            command += [argument for key, value in (tags or {}).items() if value is not None for argument in ('-metadata', f'{key}={value}')]
+
+            if cover_image:
+                command += ['-map', '2:v:0', '-c:v', 'copy', '-disposition:v', 'attached_pic']
+
+        command += [*output_codec_args, '-f', muxer, output_file_path]
+
+    process = subprocess_run(command, input=build_ffmetadata(tags, cover_image).encode('utf-8'), stdout=DEVNULL, stderr=PIPE)
+
+    if process.returncode != 0:
+        for output_file_path in output_paths:
+            Path(output_file_path).unlink(missing_ok=True)
+
+        raise Exception(f'Failed to produce the output files with FFmpeg: {process.stderr.decode("utf-8", errors="replace").strip() or f"FFmpeg exited with code {process.returncode}"}')
+
+def transcode_audio_with_pydub(path: Union[str, PathLike], output_path: Union[str, PathLike], bitrate: int) -> None:
+    """
+    Transcode an audio file to the OPUS codec with pydub (decodes the whole track into memory).
+    :param path: The path to the source audio file.
+    :param output_path: The path to the output audio file.
+    :param bitrate: The output bitrate in kbps.
+    """
+
+    from pydub import AudioSegment
 
-def transcode_and_edit_metadata(path: Union[str, PathLike], output_path: Union[str, PathLike], bitrate: int, title: Optional[str] = None, artist: Optional[str] = None, year: Optional[str] = None, cover_image: Optional[Union[str, PathLike]] = None) -> None:
     audio = AudioSegment.from_file(file=path)
     audio.export(output_path, format='opus', codec='libopus', bitrate=f'{bitrate}k')
 
+def transcode_audio(path: Union[str, PathLike], output_path: Union[str, PathLike], bitrate: int, backend: str = 'auto', tags: Optional[Dict[str, Optional[str]]] = None, cover_image: Optional[Union[str, PathLike, bytes]] = None) -> bool:
+    """
+    Transcode an audio file to the OPUS codec and delete the source file.
+    :param path: The path to the source audio file.
+    :param output_path: The path to the output audio file.
+    :param bitrate: The output bitrate in kbps.
+    :param backend: The transcoding backend: "ffmpeg", "pydub" or "auto" (FFmpeg when available, pydub otherwise).
+    :param tags: The tags to embed during the encoding (FFmpeg backend only).
+    :param cover_image: The cover image to embed during the encoding (FFmpeg backend only).
+    :return: True if the tags and the cover image were embedded, False if they still have to be written with edit_metadata.
+    """
+
+    if backend not in ('auto', 'ffmpeg', 'pydub'):
+        raise ValueError(f'Invalid transcoding backend: {backend}')
+
+    ffmpeg_path = get_ffmpeg_binary() if backend != 'pydub' else None
+    metadata_embedded = False
+
+    if ffmpeg_path:
+        transcode_audio_with_ffmpeg(path, output_path, bitrate, ffmpeg_path, tags, cover_image)
+        metadata_embedded = True
+    elif backend == 'ffmpeg':
+        raise Exception('Failed to find the FFmpeg binary.')
+    else:
+        transcode_audio_with_pydub(path, output_path, bitrate)
+
     Path(path).unlink(missing_ok=True)
 
-    audio = mt_load_file(output_path)
+    return metadata_embedded
+
+def edit_metadata(path: Union[str, PathLike], title: Optional[str] = None, artist: Optional[str] = None, year: Optional[str] = None, cover_image: Optional[Union[str, PathLike]] = None) -> None:
+    """
+    Write the metadata tags and the cover image to an existing audio file.
+    This rewrites the whole file, so it is only used to retag existing files or when the output could not be tagged while it was produced.
+    :param path: The path to the audio file.
+    :param title: The track title.
+    :param artist: The track artist.
+    :param year: The release year.
+    :param cover_image: The path to the cover image.
+    """
+
+    from music_tag import load_file as mt_load_file
+
+    audio = mt_load_file(path)
     audio['tracktitle'] = title
     audio['artist'] = artist
     audio['year'] = year
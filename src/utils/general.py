@@ -1,17 +1,16 @@
 # Built-in imports
-from ctypes import windll, WinError
+from io import BytesIO
 from os import PathLike, environ, pathsep
 from pathlib import Path
 from subprocess import run as subprocess_run, CalledProcessError
-from tkinter import Tk, filedialog as tk_filedialog
-from typing import List, Tuple, Optional, Union
+from sys import stdout
+from typing import Iterator, List, Tuple, Optional, Union
 
 # Third-party imports
 from colorama import init as colorama_init, Fore as ColoramaFore
-from requests import get, head, HTTPError
-from validators import url as is_url, ValidationError
-from PIL import Image
-from pyffmpeg import FFmpeg
+
+# Heavy or platform-specific modules (tkinter, PIL, pyffmpeg, requests, validators, ctypes.windll) are imported lazily by the functions that need them
+# HTTP requests go through the shared download manager (utils.network), so connections are reused across the whole run
 
 
 class ColoredTerminalText:
@@ -80,10 +79,13 @@ def set_terminal_title(config_obj: type, title: str) -> None:
 
     try:
         if config_obj.is_windows:
+            from ctypes import windll
+
             windll.kernel32.SetConsoleTitleW(title)
-        elif config_obj.is_linux:
-            subprocess_run(['echo', '-ne', f'\033]0;{title}\007'], shell=True)
-    except (OSError, WinError, CalledProcessError, Exception) as e:
+        elif config_obj.is_linux and stdout.isatty():
+            stdout.write(f'\033]0;{title}\007')
+            stdout.flush()
+    except (OSError, Exception) as e:
         raise Exception(f'Failed to set terminal title: {e}')
 
 def add_directory_to_system_path(path: Union[str, PathLike]) -> None:
@@ -102,6 +104,8 @@ def is_valid_url(url: str, online_check: bool = False) -> Optional[bool]:
     :return: True if the URL is valid, False if the URL is invalid, and None if the URL is unreachable online.
     """
 
+    from validators import url as is_url, ValidationError
+
     try:
         bool_value = bool(is_url(url))
 
@@ -111,8 +115,11 @@ def is_valid_url(url: str, online_check: bool = False) -> Optional[bool]:
         return False
 
     if online_check:
+        from requests import HTTPError
+        from utils.network import get_download_manager
+
         try:
-            response = head(url, headers={'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36'}, allow_redirects=True, timeout=10)
+            response = get_download_manager().head(url, allow_redirects=True, timeout=10)
             return True if response.is_success or response.is_redirect else None
         except HTTPError:
             return None
@@ -130,7 +137,10 @@ def clear_terminal(config_obj: type, jump_lines: int = 0) -> None:
         if config_obj.is_windows:
             subprocess_run(['cls'], shell=True)
         elif config_obj.is_linux:
-            subprocess_run(['clear'], shell=True)
+            # Clear the screen and the scrollback with ANSI escape codes instead of spawning a shell
+            if stdout.isatty():
+                stdout.write('\033[H\033[2J\033[3J')
+                stdout.flush()
         else:
             raise Exception('The current operating system is not supported.')
     except (OSError, CalledProcessError, Exception) as e:
@@ -162,6 +172,8 @@ def download_latest_ffmpeg(config_obj: type) -> None:
     """
 
     try:
+        from pyffmpeg import FFmpeg
+
         add_directory_to_system_path(Path(FFmpeg(enable_log=False).get_ffmpeg_bin()).parent)
     except (FileNotFoundError, PermissionError, Exception):
         raise Exception('Failed to download the latest FFmpeg binary.')
@@ -175,6 +187,8 @@ def open_windows_filedialog_selector(title: str, allowed_filetypes: List[Tuple[s
     :return: The selected file path or None if no file was selected.
     """
 
+    from tkinter import Tk, filedialog as tk_filedialog
+
     tk = Tk()
     tk.withdraw()
     tk.attributes('-topmost', True)
@@ -193,11 +207,13 @@ def get_latest_app_version() -> Optional[str]:
     :return: The latest version of the application or None if the version cannot be fetched.
     """
 
+    from requests import HTTPError
+    from utils.network import get_download_manager
 
     url = 'https://raw.githubusercontent.com/henrique-coder/syncgroove/refs/heads/main/version'
 
     try:
-        response = get(url, allow_redirects=False, timeout=10)
+        response = get_download_manager().get(url, allow_redirects=False, timeout=10)
 
         if response.ok:
             return response.text.strip()
@@ -206,23 +222,29 @@ def get_latest_app_version() -> Optional[str]:
 
     return None
 
-def extract_lines_from_file(path: Union[str, PathLike], fix_lines: bool = False) -> Optional[List[str]]:
+def iter_lines_from_file(path: Union[str, PathLike], fix_lines: bool = False) -> Iterator[str]:
     """
-    Extract lines from a file.
+    Stream the lines of a file without loading the whole file into memory.
     :param path: The path to the file.
-    :param fix_lines: If True, strip whitespace, remove empty lines, and remove duplicate lines. If False, include all lines as they are in the file.
-    :return: The extracted lines from the file or None if the file does not exist or cannot be read.
+    :param fix_lines: If True, strip whitespace, skip empty lines and skip duplicate lines (keeping the first occurrence and the original order). If False, yield all lines as they are in the file.
+    :return: An iterator over the lines of the file.
     """
 
-    try:
-        extracted_lines = Path(path).read_text('utf-8').splitlines()
-    except (FileNotFoundError, PermissionError, UnicodeDecodeError):
-        return None
+    seen_lines = set()
+
+    with Path(path).open('r', encoding='utf-8') as file:
+        for line in file:
+            line = line.rstrip('\r\n')
+
+            if fix_lines:
+                line = line.strip()
+
+                if not line or line in seen_lines:
+                    continue
 
-    if fix_lines:
-        return list(set([line.strip() for line in extracted_lines if line.strip()]))
-    else:
-        return list(extracted_lines)
+                seen_lines.add(line)
+
+            yield line
 
 def download_app_icon(path: Union[str, PathLike]) -> None:
     """
@@ -230,10 +252,13 @@ def download_app_icon(path: Union[str, PathLike]) -> None:
     :param path: The output path + filename of the app icon.
     """
 
+    from requests import HTTPError
+    from utils.network import get_download_manager
+
     icon_url = 'https://raw.githubusercontent.com/henrique-coder/syncgroove/refs/heads/main/icon.ico'
 
     try:
-        response = get(icon_url, allow_redirects=False, timeout=30)
+        response = get_download_manager().get(icon_url, allow_redirects=False, timeout=30)
 
         if response.ok:
             Path(path).write_bytes(response.content)
@@ -242,15 +267,17 @@ def download_app_icon(path: Union[str, PathLike]) -> None:
     except (HTTPError, PermissionError, FileNotFoundError):
         raise Exception('Failed to download the app icon.')
 
-def is_image_corrupted(path: Union[str, PathLike]) -> bool:
+def is_image_corrupted(path: Union[str, PathLike, bytes]) -> bool:
     """
     Check if an image is corrupted.
-    :param path: The path to the image.
+    :param path: The path to the image or the image content.
     :return: True if the image is corrupted, False otherwise.
     """
 
+    from PIL import Image
+
     try:
-        with Image.open(path) as img:
+        with Image.open(BytesIO(path) if isinstance(path, bytes) else path) as img:
             img.verify()
 
         return False
@@ -0,0 +1,133 @@
+# Built-in imports
+from json import dumps, loads
+from os import PathLike
+from pathlib import Path
+from threading import Lock
+from time import time
+from typing import Any, Dict, Optional, Union
+
+
+class JobJournal:
+    """
+    An append-only journal (JSON lines) of the stage transitions of every track.
+    After a crash, it tells which stage each unfinished track had completed, so the work can resume from there.
+    Finished tracks are forgotten, and the file is rewritten with the unfinished tracks only when it grows too large compared with them, so a long-running process keeps it small.
+    """
+
+    def __init__(self, path: Union[str, PathLike], final_stage: str = 'tag', compact_min_entries: int = 1000, compact_ratio: float = 4.0) -> None:
+        """
+        Initialize the JobJournal class.
+        :param path: The path to the journal file (it will be created if it does not exist).
+        :param final_stage: The last stage of the pipeline, a track that completed it is finished and is dropped from the journal.
+        :param compact_min_entries: The minimum number of entries appended before the journal is compacted again.
+        :param compact_ratio: The journal is compacted when it holds more than this many entries per unfinished track.
+        """
+
+        self.path: Path = Path(path)
+        self.final_stage: str = final_stage
+        self.compact_min_entries: int = max(1, int(compact_min_entries))
+        self.compact_ratio: float = compact_ratio
+        self._states: Dict[str, Dict[str, Any]] = {}
+        self._written_entries: int = 0
+        self._lock = Lock()
+
+        self._replay()
+        self._compact()
+        self._file = self.path.open('a', encoding='utf-8')
+
+    def _replay(self) -> None:
+        try:
+            with self.path.open('r', encoding='utf-8') as file:
+                for line in file:
+                    try:
+                        entry = loads(line)
+                    except ValueError:
+                        # The last line may be truncated if the process died while writing it
+                        continue
+
+                    self._apply(entry)
+        except FileNotFoundError:
+            pass
+
+    def _apply(self, entry: Dict[str, Any]) -> None:
+        # A finished track has nothing left to resume
+        if entry['status'] == 'completed' and entry['stage'] == self.final_stage:
+            self._states.pop(entry['video_id'], None)
+            return
+
+        state = self._states.setdefault(entry['video_id'], {'completed_stage': None, 'data': {}})
+        state['data'].update(entry.get('data') or {})
+
+        if entry['status'] == 'completed':
+            state['completed_stage'] = entry['stage']
+
+    def _compact(self) -> None:
+        # Only the unfinished tracks are kept, written to a temporary file and renamed so the journal is never half-written
+        temporary_path = self.path.with_name(f'.{self.path.name}.tmp')
+
+        with temporary_path.open('w', encoding='utf-8') as file:
+            for video_id, state in self._states.items():
+                file.write(dumps({'video_id': video_id, 'stage': state['completed_stage'], 'status': 'completed' if state['completed_stage'] else 'started', 'at': time(), 'data': state['data']}) + '\n')
+
+        temporary_path.replace(self.path)
+        self._written_entries = len(self._states)
+
+    def record(self, video_id: str, stage: str, status: str, **data: Any) -> None:
+        """
+        Append a stage transition to the journal.
+        :param video_id: The video ID of the track.
+        :param stage: The stage name.
+        :param status: "started", "completed" or "failed".
+        :param data: Extra values to remember for the track (e.g. the paths of its files), they must be JSON-serializable.
+        """
+
+        entry = {'video_id': video_id, 'stage': stage, 'status': status, 'at': time(), 'data': data}
+
+        with self._lock:
+            self._apply(entry)
+            self._file.write(dumps(entry) + '\n')
+            self._file.flush()
+            self._written_entries += 1
+
+            if self._written_entries >= max(self.compact_min_entries, self.compact_ratio * len(self._states)):
+                self._file.close()
+                self._compact()
+                self._file = self.path.open('a', encoding='utf-8')
+
+    def get_completed_stage(self, video_id: Optional[str]) -> Optional[str]:
+        """
+        Get the last stage a track completed.
+        :param video_id: The video ID of the track.
+        :return: The stage name or None if the track has no completed stage.
+        """
+
+        with self._lock:
+            state = self._states.get(video_id)
+
+            return state['completed_stage'] if state else None
+
+    def get_data(self, video_id: Optional[str]) -> Dict[str, Any]:
+        """
+        Get the values remembered for a track.
+        :param video_id: The video ID of the track.
+        :return: The values (empty if the track is unknown).
+        """
+
+        with self._lock:
+            state = self._states.get(video_id)
+
+            return dict(state['data']) if state else {}
+
+    def get_unfinished_count(self) -> int:
+        with self._lock:
+            return len(self._states)
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+    def __enter__(self) -> 'JobJournal':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
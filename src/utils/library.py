@@ -0,0 +1,287 @@
+# Built-in imports
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import blake2b
+from mmap import mmap, ACCESS_READ
+from os import PathLike, scandir
+from pathlib import Path
+from sqlite3 import connect as sqlite_connect, Row
+from struct import unpack_from
+from threading import Lock
+from time import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+# Local imports
+from utils.archive import archived_filename_regex
+from utils.cache import normalize_query
+
+
+library_extensions = {'.opus', '.ogg', '.m4a', '.mp3', '.flac', '.webm'}
+audio_hash_version = 2  # Bumped when compute_audio_hash changes, so the fingerprints of the index are computed again
+
+
+def iter_ogg_pages(data: Union[bytes, mmap], offset: int = 0) -> Iterator[Tuple[int, int, int, int]]:
+    """
+    Walk the pages of an Ogg stream from a page boundary, reading only the page headers.
+    :param data: The file content (a memory map, so only the touched pages are read from the disk).
+    :param offset: The offset of the first page to read.
+    :return: An iterator of (page offset, granule position, payload offset, payload size) tuples.
+    """
+
+    size = len(data)
+
+    while offset + 27 <= size and data[offset:offset + 4] == b'OggS':
+        granule_position = unpack_from('<q', data, offset + 6)[0]
+        segment_count = data[offset + 26]
+        payload_offset = offset + 27 + segment_count
+        payload_size = sum(data[offset + 27:payload_offset])
+
+        yield offset, granule_position, payload_offset, payload_size
+
+        offset = payload_offset + payload_size
+
+def find_ogg_page(data: Union[bytes, mmap], offset: int) -> int:
+    """
+    Find the next Ogg page boundary (capture pattern followed by the stream structure version 0) at or after an offset.
+    :param data: The file content.
+    :param offset: The offset the search starts from.
+    :return: The offset of the page or -1 if there is none.
+    """
+
+    while True:
+        offset = data.find(b'OggS', offset)
+
+        if offset == -1 or (offset + 27 <= len(data) and data[offset + 4] == 0):
+            return offset
+
+        offset += 1
+
+def compute_audio_hash(path: Union[str, PathLike], sample_size: int = 64 * 1024) -> Optional[str]:
+    """
+    Compute a cheap fingerprint of the audio content of a file, using memory-mapped reads of a few samples instead of the whole file.
+    For Ogg files, only the audio packets of a few runs of pages are hashed (not the page headers, the tags or the cover image), so retagging or rewrapping a file does not change its hash.
+    :param path: The path to the audio file.
+    :param sample_size: The number of bytes hashed at the start, the middle and the end of the audio payload.
+    :return: The hexadecimal hash or None if the file is empty or cannot be read.
+    """
+
+    try:
+        with Path(path).open('rb') as file, mmap(file.fileno(), 0, access=ACCESS_READ) as data:
+            content_hash = blake2b(digest_size=16)
+
+            if data[:4] == b'OggS':
+                # The header pages (OpusHead, OpusTags) have a granule position of 0 (or -1 when a large OpusTags packet continues on the next page)
+                audio_start = None
+
+                for page_offset, granule_position, _, _ in iter_ogg_pages(data):
+                    if granule_position not in (0, -1):
+                        audio_start = page_offset
+                        break
+
+                if audio_start is None:
+                    return None
+
+                audio_size = len(data) - audio_start
+                content_hash.update(audio_size.to_bytes(8, 'little'))
+
+                # Each sample starts at the first page boundary after its offset, the same pages are found whatever the size of the tags before them
+                for sample_offset in (audio_start, audio_start + audio_size // 2, max(audio_start, len(data) - sample_size)):
+                    hashed_size = 0
+
+                    for _, _, payload_offset, payload_size in iter_ogg_pages(data, find_ogg_page(data, sample_offset)):
+                        content_hash.update(data[payload_offset:payload_offset + payload_size])
+                        hashed_size += payload_size
+
+                        if hashed_size >= sample_size:
+                            break
+            else:
+                content_hash.update(len(data).to_bytes(8, 'little'))
+
+                for offset in (0, max(0, len(data) // 2 - sample_size // 2), max(0, len(data) - sample_size)):
+                    content_hash.update(data[offset:offset + sample_size])
+
+            return content_hash.hexdigest()
+    except (OSError, ValueError):
+        return None
+
+def read_library_file(path: Union[str, PathLike]) -> Dict[str, Any]:
+    """
+    Read the tags and the audio fingerprint of a library file.
+    :param path: The path to the audio file.
+    :return: The indexed fields ("title", "artist", "year", "duration", "content_hash").
+    """
+
+    from music_tag import load_file as mt_load_file
+
+    fields = {'title': None, 'artist': None, 'year': None, 'duration': None, 'content_hash': compute_audio_hash(path)}
+
+    try:
+        audio = mt_load_file(path)
+        fields['title'] = str(audio['tracktitle']) or None
+        fields['artist'] = str(audio['artist']) or None
+        fields['year'] = str(audio['year']) or None
+        fields['duration'] = float(audio['#length']) or None
+    except Exception:
+        pass
+
+    return fields
+
+def get_tag_key(title: Optional[str], artist: Optional[str]) -> Optional[str]:
+    """
+    Get the key used to find the same song under another video ID (folded artist and title).
+    :param title: The track title.
+    :param artist: The track artist.
+    :return: The key or None if the title is unknown.
+    """
+
+    return f'{normalize_query(artist or "")}\x1f{normalize_query(title)}' if title else None
+
+
+class LibraryIndex:
+    """
+    A persistent SQLite index of the audio files of the music library (tags and audio fingerprint), keyed by path, modification time and size.
+    Re-scans only read the files that changed since the previous scan.
+    """
+
+    def __init__(self, path: Union[str, PathLike]) -> None:
+        """
+        Initialize the LibraryIndex class.
+        :param path: The path to the SQLite database file (it will be created if it does not exist).
+        """
+
+        self.path: Path = Path(path)
+        self._lock = Lock()
+        self._connection = sqlite_connect(self.path.as_posix(), check_same_thread=False)
+        self._connection.row_factory = Row
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS files ('
+            'path TEXT PRIMARY KEY, '
+            'mtime REAL NOT NULL, '
+            'size INTEGER NOT NULL, '
+            'video_id TEXT, '
+            'title TEXT, '
+            'artist TEXT, '
+            'year TEXT, '
+            'duration REAL, '
+            'tag_key TEXT, '
+            'content_hash TEXT, '
+            'scanned_at REAL NOT NULL)'
+        )
+        self._connection.execute('CREATE INDEX IF NOT EXISTS files_video_id ON files (video_id)')
+        self._connection.execute('CREATE INDEX IF NOT EXISTS files_tag_key ON files (tag_key)')
+        self._connection.execute('CREATE INDEX IF NOT EXISTS files_content_hash ON files (content_hash)')
+
+        # Fingerprints of an older version cannot be compared with the new ones, every file is read again on the next scan
+        if self._connection.execute('PRAGMA user_version').fetchone()[0] < audio_hash_version:
+            self._connection.execute('UPDATE files SET mtime = -1, content_hash = NULL')
+            self._connection.execute(f'PRAGMA user_version = {audio_hash_version}')
+
+        self._connection.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute('SELECT COUNT(*) FROM files').fetchone()[0]
+
+    def update(self, path: Union[str, PathLike], video_id: Optional[str] = None, fields: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Index (or re-index) a file.
+        :param path: The path to the audio file.
+        :param video_id: The video ID of the file (if None, it is taken from the "[id]" part of the filename).
+        :param fields: The fields returned by read_library_file (if None, the file is read).
+        """
+
+        path = Path(path).resolve()
+        file_stat = path.stat()
+        fields = fields or read_library_file(path)
+        found_id = archived_filename_regex.search(path.name)
+        video_id = video_id or (found_id.group(1) if found_id else None)
+
+        with self._lock:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO files (path, mtime, size, video_id, title, artist, year, duration, tag_key, content_hash, scanned_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (path.as_posix(), file_stat.st_mtime, file_stat.st_size, video_id, fields['title'], fields['artist'], fields['year'], fields['duration'], get_tag_key(fields['title'], fields['artist']), fields['content_hash'], time())
+            )
+            self._connection.commit()
+
+    def scan(self, music_path: Union[str, PathLike], max_workers: int = 8) -> Dict[str, int]:
+        """
+        Scan a music directory (recursively) with a pool of workers, reading only the new and changed files.
+        Files that disappeared are removed from the index, and a renamed file keeps the video ID of the file it was renamed from (same audio fingerprint).
+        :param music_path: The directory to scan.
+        :param max_workers: The maximum number of files read concurrently.
+        :return: The number of "unchanged", "indexed" and "removed" files and of "duplicates" (files whose audio fingerprint is already indexed under another path).
+        """
+
+        with self._lock:
+            indexed_files = {row['path']: (row['mtime'], row['size']) for row in self._connection.execute('SELECT path, mtime, size FROM files')}
+
+        changed_paths: List[Path] = []
+        seen_paths = set()
+
+        def walk(directory: str) -> None:
+            for entry in scandir(directory):
+                # Hidden entries are temporary files and the incomplete downloads folder
+                if entry.name.startswith('.'):
+                    continue
+                elif entry.is_dir(follow_symlinks=False):
+                    walk(entry.path)
+                elif Path(entry.name).suffix.lower() in library_extensions:
+                    path = Path(entry.path).resolve()
+                    entry_stat = entry.stat()
+                    seen_paths.add(path.as_posix())
+
+                    if indexed_files.get(path.as_posix()) != (entry_stat.st_mtime, entry_stat.st_size):
+                        changed_paths.append(path)
+
+        walk(Path(music_path).as_posix())
+
+        with self._lock:
+            removed_rows = [dict(row) for row in self._connection.execute('SELECT path, video_id, content_hash FROM files') if row['path'] not in seen_paths]
+            self._connection.executemany('DELETE FROM files WHERE path = ?', [(row['path'],) for row in removed_rows])
+            self._connection.commit()
+
+        removed_ids = {row['content_hash']: row['video_id'] for row in removed_rows if row['content_hash'] and row['video_id']}
+
+        with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix='library-scan') as executor:
+            for path, fields in zip(changed_paths, executor.map(read_library_file, changed_paths)):
+                self.update(path, removed_ids.get(fields['content_hash']), fields)
+
+        with self._lock:
+            duplicates = self._connection.execute('SELECT COALESCE(SUM(count - 1), 0) FROM (SELECT COUNT(*) AS count FROM files WHERE content_hash IS NOT NULL GROUP BY content_hash HAVING count > 1)').fetchone()[0]
+
+        return {'unchanged': len(seen_paths) - len(changed_paths), 'indexed': len(changed_paths), 'removed': len(removed_rows), 'duplicates': duplicates}
+
+    def find_duplicate(self, video_id: Optional[str] = None, title: Optional[str] = None, artist: Optional[str] = None, duration: Optional[float] = None, duration_tolerance: float = 2.0) -> Optional[Path]:
+        """
+        Find a library file that already holds a track, by video ID (also after a rename) or by artist, title and a close known duration (re-uploads under another video ID).
+        :param video_id: The video ID of the track.
+        :param title: The track title.
+        :param artist: The track artist.
+        :param duration: The track duration in seconds (if unknown, only the video ID is matched).
+        :param duration_tolerance: The maximum duration difference, in seconds.
+        :return: The path to the existing file or None if the track is not in the library.
+        """
+
+        with self._lock:
+            rows = self._connection.execute('SELECT path, duration FROM files WHERE video_id = ?', (video_id,)).fetchall() if video_id else []
+            tag_key = get_tag_key(title, artist)
+
+            if not rows and tag_key and duration:
+                # Other recordings of a song (live, remix, edit) share its artist and title, so both durations must be known and close
+                rows = [row for row in self._connection.execute('SELECT path, duration FROM files WHERE tag_key = ?', (tag_key,)) if row['duration'] and abs(row['duration'] - duration) <= duration_tolerance]
+
+        for row in rows:
+            if Path(row['path']).is_file():
+                return Path(row['path'])
+
+        return None
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    def __enter__(self) -> 'LibraryIndex':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
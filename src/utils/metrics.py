@@ -0,0 +1,232 @@
+# Built-in imports
+from contextlib import contextmanager
+from json import dumps
+from os import PathLike
+from pathlib import Path
+from threading import Lock
+from time import perf_counter, time
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+
+def get_percentile(sorted_values: List[float], percentile: float) -> float:
+    """
+    Get a percentile of a sorted list with the nearest-rank method.
+    :param sorted_values: The values, sorted in ascending order.
+    :param percentile: The percentile (0-100).
+    :return: The percentile value (0 if the list is empty).
+    """
+
+    if not sorted_values:
+        return 0.0
+
+    index = max(0, min(len(sorted_values) - 1, round(percentile / 100 * len(sorted_values) + 0.5) - 1))
+
+    return sorted_values[index]
+
+
+class MetricsRecorder:
+    """
+    Records timing spans (per stage and per track), bytes moved, error counts and counters of a run.
+    A disabled recorder keeps its API but records nothing, so the instrumented code does not have to check it.
+    """
+
+    def __init__(self, enabled: bool = False) -> None:
+        """
+        Initialize the MetricsRecorder class.
+        :param enabled: If False, nothing is recorded.
+        """
+
+        self.enabled: bool = enabled
+        self.started_at: float = time()
+        self._durations: Dict[str, List[float]] = {}
+        self._errors: Dict[str, int] = {}
+        self._bytes: Dict[str, int] = {}
+        self._counters: Dict[str, Union[int, float]] = {}
+        self._tracks: Dict[str, Dict[str, float]] = {}
+        self._lock = Lock()
+
+    @contextmanager
+    def span(self, name: str, track: Optional[str] = None) -> Iterator[None]:
+        """
+        Time a block of code, counting it as an error if it raises.
+        :param name: The stage name (e.g. "extract", "audio_download").
+        :param track: The track the span belongs to (e.g. the video ID), if any.
+        """
+
+        if not self.enabled:
+            yield
+            return
+
+        start_time = perf_counter()
+        failed = False
+
+        try:
+            yield
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            self.record(name, perf_counter() - start_time, track, failed)
+
+    def record(self, name: str, duration: float, track: Optional[str] = None, failed: bool = False) -> None:
+        """
+        Record a span that was timed by the caller.
+        :param name: The stage name.
+        :param duration: The span duration in seconds.
+        :param track: The track the span belongs to, if any.
+        :param failed: If True, the span is also counted as an error.
+        """
+
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self._durations.setdefault(name, []).append(duration)
+
+            if failed:
+                self._errors[name] = self._errors.get(name, 0) + 1
+
+            if track:
+                track_spans = self._tracks.setdefault(track, {})
+                track_spans[name] = track_spans.get(name, 0.0) + duration
+
+    def add_bytes(self, name: str, size: int) -> None:
+        """
+        Count the bytes moved by a stage.
+        :param name: The stage name.
+        :param size: The number of bytes.
+        """
+
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self._bytes[name] = self._bytes.get(name, 0) + size
+
+    def increment(self, name: str, value: Union[int, float] = 1) -> None:
+        """
+        Increment a run counter.
+        :param name: The counter name (e.g. "tracks_succeeded").
+        :param value: The amount to add.
+        """
+
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def reset(self) -> None:
+        """
+        Forget everything recorded so far and start a new report (e.g. for each batch of a long-running process).
+        """
+
+        with self._lock:
+            self.started_at = time()
+            self._durations.clear()
+            self._errors.clear()
+            self._bytes.clear()
+            self._counters.clear()
+            self._tracks.clear()
+
+    def get_report(self) -> Dict[str, Any]:
+        """
+        Build the run report.
+        :return: A dictionary with the run duration, the statistics of each stage, the counters and the time spent per track and stage.
+        """
+
+        with self._lock:
+            stages = {}
+
+            for name in sorted(set(self._durations) | set(self._bytes) | set(self._errors)):
+                durations = sorted(self._durations.get(name, []))
+                total_seconds = sum(durations)
+                size = self._bytes.get(name, 0)
+
+                stages[name] = {
+                    'count': len(durations),
+                    'errors': self._errors.get(name, 0),
+                    'total_seconds': round(total_seconds, 6),
+                    'mean_seconds': round(total_seconds / len(durations), 6) if durations else 0.0,
+                    'min_seconds': round(durations[0], 6) if durations else 0.0,
+                    'p50_seconds': round(get_percentile(durations, 50), 6),
+                    'p95_seconds': round(get_percentile(durations, 95), 6),
+                    'max_seconds': round(durations[-1], 6) if durations else 0.0,
+                    'bytes': size,
+                    'throughput_bytes_per_second': round(size / total_seconds, 3) if size and total_seconds else 0.0
+                }
+
+            return {
+                'started_at': self.started_at,
+                'duration_seconds': round(time() - self.started_at, 6),
+                'stages': stages,
+                'counters': dict(self._counters),
+                'tracks': {track: {name: round(duration, 6) for name, duration in spans.items()} for track, spans in self._tracks.items()}
+            }
+
+    def get_prometheus_text(self, prefix: str = 'syncgroove') -> str:
+        """
+        Export the stage statistics and the counters in the Prometheus text exposition format.
+        :param prefix: The prefix of every metric name.
+        :return: The metrics text.
+        """
+
+        report = self.get_report()
+        stages = report['stages']
+        lines = [
+            f'# HELP {prefix}_run_duration_seconds Duration of the run.',
+            f'# TYPE {prefix}_run_duration_seconds gauge',
+            f'{prefix}_run_duration_seconds {report["duration_seconds"]}'
+        ]
+
+        def add_stage_metric(name: str, metric_type: str, description: str, key: str) -> None:
+            lines.extend([f'# HELP {prefix}_{name} {description}', f'# TYPE {prefix}_{name} {metric_type}'])
+            lines.extend(f'{prefix}_{name}{{stage="{stage}"}} {values[key]}' for stage, values in stages.items())
+
+        add_stage_metric('stage_spans_total', 'counter', 'Number of spans per stage.', 'count')
+        add_stage_metric('stage_errors_total', 'counter', 'Number of failed spans per stage.', 'errors')
+        add_stage_metric('stage_bytes_total', 'counter', 'Bytes moved per stage.', 'bytes')
+        add_stage_metric('stage_throughput_bytes_per_second', 'gauge', 'Average throughput per stage.', 'throughput_bytes_per_second')
+
+        lines.extend([f'# HELP {prefix}_stage_duration_seconds Span duration per stage.', f'# TYPE {prefix}_stage_duration_seconds summary'])
+
+        for stage, values in stages.items():
+            lines.append(f'{prefix}_stage_duration_seconds{{stage="{stage}",quantile="0.5"}} {values["p50_seconds"]}')
+            lines.append(f'{prefix}_stage_duration_seconds{{stage="{stage}",quantile="0.95"}} {values["p95_seconds"]}')
+            lines.append(f'{prefix}_stage_duration_seconds_sum{{stage="{stage}"}} {values["total_seconds"]}')
+            lines.append(f'{prefix}_stage_duration_seconds_count{{stage="{stage}"}} {values["count"]}')
+
+        for name, value in sorted(report['counters'].items()):
+            lines.extend([f'# TYPE {prefix}_{name}_total counter', f'{prefix}_{name}_total {value}'])
+
+        return '\n'.join(lines) + '\n'
+
+    def export(self, path: Union[str, PathLike], report_name: Optional[str] = None) -> List[Path]:
+        """
+        Write the JSON run report (one file per run) and the Prometheus text file (overwritten by each run).
+        :param path: The output directory.
+        :param report_name: The name of the JSON report, without the extension (defaults to "run-<start timestamp>").
+        :return: The paths of the written files.
+        """
+
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+
+        report_path = Path(path, f'{report_name or f"run-{int(self.started_at)}"}.json')
+        prometheus_path = Path(path, 'metrics.prom')
+        report_path.write_text(dumps(self.get_report(), indent=4), 'utf-8')
+        prometheus_path.write_text(self.get_prometheus_text(), 'utf-8')
+
+        return [report_path, prometheus_path]
+
+
+_metrics_recorder = MetricsRecorder()
+
+
+def get_metrics() -> MetricsRecorder:
+    """
+    Get the metrics recorder of the process (disabled until the application enables it).
+    :return: The shared MetricsRecorder object.
+    """
+
+    return _metrics_recorder
@@ -0,0 +1,189 @@
+# Built-in imports
+from os import PathLike
+from pathlib import Path
+from threading import Lock
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+# Local imports
+from utils.metrics import get_metrics
+
+
+default_user_agent = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36'
+
+
+class DownloadManager:
+    """
+    A long-lived download manager shared by the whole process.
+    Every request (thumbnails, version checks, URL checks and streamed audio downloads) goes through a single requests session with keep-alive connection pools per host.
+    TurboDL audio downloads open their own connections, outside these pools. They reuse idle TurboDL instances, which stay warm between batches, and are counted separately.
+    """
+
+    def __init__(self, pool_connections: int = 32, pool_maxsize: int = 32, user_agent: str = default_user_agent) -> None:
+        """
+        Initialize the DownloadManager class.
+        :param pool_connections: The number of hosts whose connection pools are kept alive.
+        :param pool_maxsize: The maximum number of kept-alive connections per host.
+        :param user_agent: The User-Agent header sent with every request.
+        """
+
+        from requests import Session
+        from requests.adapters import HTTPAdapter
+
+        self.session = Session()
+        self.session.headers['User-Agent'] = user_agent
+        self._adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+        self.session.mount('https://', self._adapter)
+        self.session.mount('http://', self._adapter)
+        self._idle_turbodls: Dict[Tuple[Union[int, str], Union[float, str]], List[Any]] = {}
+        self._turbodl_stats: Dict[str, int] = {'downloads': 0, 'max_connections': 0}
+        self._lock = Lock()
+
+    def get(self, url: str, **kwargs: Any) -> Any:
+        """
+        Send a GET request through the shared session.
+        :param url: The URL to request.
+        :param kwargs: Extra arguments for requests (timeout, allow_redirects, ...).
+        :return: The requests Response object.
+        """
+
+        kwargs.setdefault('timeout', 30)
+
+        return self.session.get(url, **kwargs)
+
+    def head(self, url: str, **kwargs: Any) -> Any:
+        """
+        Send a HEAD request through the shared session.
+        :param url: The URL to request.
+        :param kwargs: Extra arguments for requests (timeout, allow_redirects, ...).
+        :return: The requests Response object.
+        """
+
+        kwargs.setdefault('timeout', 30)
+
+        return self.session.head(url, **kwargs)
+
+    def fetch_bytes(self, url: str) -> bytes:
+        """
+        Download a URL into memory through the shared session.
+        :param url: The URL to download.
+        :return: The response content.
+        """
+
+        response = self.get(url)
+        response.raise_for_status()
+        get_metrics().add_bytes('http_fetch', len(response.content))
+
+        return response.content
+
+    def download(self, url: str, output_path: Union[str, PathLike], connection_speed: Union[float, str] = 'auto', max_connections: Union[int, str] = 'auto') -> None:
+        """
+        Download a (large) file with TurboDL, reusing an idle TurboDL instance with the same settings when there is one.
+        TurboDL opens its own connections, they are not part of the connection pools of the shared session.
+        :param url: The URL to download.
+        :param output_path: The output file path.
+        :param connection_speed: The connection speed hint passed to TurboDL (in Mbps or "auto").
+        :param max_connections: The maximum number of connections TurboDL may open (a number or "auto").
+        """
+
+        settings = (max_connections, connection_speed)
+
+        with self._lock:
+            idle_turbodls = self._idle_turbodls.get(settings)
+            turbodl = idle_turbodls.pop() if idle_turbodls else None
+            self._turbodl_stats['downloads'] += 1
+            self._turbodl_stats['max_connections'] += max_connections if isinstance(max_connections, int) else 0
+
+        if turbodl is None:
+            from turbodl import TurboDL
+
+            turbodl = TurboDL(max_connections=max_connections, connection_speed=connection_speed, overwrite=True, show_progress_bars=False)
+
+        try:
+            turbodl.download(url=url, output_path=output_path)
+        finally:
+            with self._lock:
+                self._idle_turbodls[settings] = self._idle_turbodls.pop(settings, []) + [turbodl]
+
+                # The bandwidth shares change as the estimate is refined, only the most recent settings are kept
+                while len(self._idle_turbodls) > 4:
+                    self._idle_turbodls.pop(next(iter(self._idle_turbodls)))
+
+    def stream_download(self, url: str, output_path: Union[str, PathLike], resume: bool = True, chunk_size: int = 256 * 1024, on_chunk: Optional[Callable[[int], None]] = None) -> int:
+        """
+        Download a file with a single connection of the shared session, writing it sequentially so an interrupted download can be resumed with a range request.
+        :param url: The URL to download.
+        :param output_path: The output file path (an existing file is treated as the beginning of the download if resume is True).
+        :param resume: If True, continue an existing partial file instead of starting over.
+        :param chunk_size: The size of the chunks written to the file, in bytes.
+        :param on_chunk: An optional callback called with the size of every chunk read (it may block to throttle the download).
+        :return: The size of the downloaded file, in bytes.
+        """
+
+        output_path = Path(output_path)
+        offset = output_path.stat().st_size if resume and output_path.is_file() else 0
+        response = self.get(url, headers={'Range': f'bytes={offset}-'} if offset else None, stream=True)
+
+        # The partial file is longer than the resource (it changed or the file is not a prefix of it), start over
+        if offset and response.status_code == 416:
+            response.close()
+            offset = 0
+            response = self.get(url, stream=True)
+
+        with response:
+            response.raise_for_status()
+
+            # A server that ignores the range request sends the whole file again
+            if response.status_code != 206:
+                offset = 0
+
+            with output_path.open('ab' if offset else 'wb') as file:
+                for chunk in response.iter_content(chunk_size):
+                    file.write(chunk)
+
+                    if on_chunk:
+                        on_chunk(len(chunk))
+
+        return output_path.stat().st_size
+
+    def get_connection_stats(self) -> Dict[str, int]:
+        """
+        Get the number of connections opened and reused by the shared session, and the number of TurboDL downloads, which open their own connections outside the session.
+        :return: A dictionary with the "requests", "new_connections" and "reused_connections" counts of the session, and the "turbodl_downloads" and "turbodl_max_connections" counts (the connections TurboDL was allowed to open, "auto" ones are not counted).
+        """
+
+        with self._lock:
+            pools = [self._adapter.poolmanager.pools[key] for key in self._adapter.poolmanager.pools.keys()]
+            turbodl_stats = dict(self._turbodl_stats)
+
+        total_requests = sum(pool.num_requests for pool in pools)
+        new_connections = sum(pool.num_connections for pool in pools)
+
+        return {
+            'requests': total_requests,
+            'new_connections': new_connections,
+            'reused_connections': max(0, total_requests - new_connections),
+            'turbodl_downloads': turbodl_stats['downloads'],
+            'turbodl_max_connections': turbodl_stats['max_connections']
+        }
+
+    def close(self) -> None:
+        self.session.close()
+
+
+_download_manager: Optional[DownloadManager] = None
+_download_manager_lock = Lock()
+
+
+def get_download_manager() -> DownloadManager:
+    """
+    Get the download manager of the process, creating it on first use.
+    :return: The shared DownloadManager object.
+    """
+
+    global _download_manager
+
+    with _download_manager_lock:
+        if _download_manager is None:
+            _download_manager = DownloadManager()
+
+        return _download_manager
@@ -0,0 +1,598 @@
+# Built-in imports
+from contextlib import contextmanager
+from datetime import datetime
+from itertools import count
+from pathlib import Path
+from queue import PriorityQueue, Queue
+from shutil import copyfile
+from threading import Event, Thread, Lock
+from time import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Union
+
+# Local imports
+from utils.archive import DownloadArchive
+from utils.bandwidth import BandwidthManager
+from utils.cache import ExtractionCache, get_stream_url_expiration
+from utils.classifier import extract_video_id
+from utils.covers import CoverArtStore
+from utils.functions import build_tags, edit_metadata
+from utils.journal import JobJournal
+from utils.library import LibraryIndex
+from utils.metrics import get_metrics
+from utils.network import DownloadManager, get_download_manager
+from utils.policy import TranscodeDecision, TranscodeStats, choose_transcode_action, log_transcode_decision
+from utils.profiles import load_output_profiles
+from utils.resilience import get_request_guard, is_expired_stream_error
+from utils.scheduler import estimate_download_cost, estimate_transcode_cost, get_stage_priority
+from utils.transcoder import TranscodePool, get_partial_path, run_transcode_job
+
+
+_SENTINEL = object()
+track_stage_names = ['extract', 'download', 'transcode', 'tag']  # The stages of the track pipeline, in order
+
+
+class TrackJob:
+    """
+    A single track moving through the processing pipeline.
+    """
+
+    def __init__(self, url: str) -> None:
+        """
+        Initialize the TrackJob class.
+        :param url: The URL of the track to process.
+        """
+
+        self.url: str = url
+        self.video_id: Optional[str] = extract_video_id(url)
+        self.information: Any = None
+        self.stream_info: Optional[Dict[str, Any]] = None
+        self.cover_image_path: Optional[Path] = None
+        self.audio_path: Optional[Path] = None
+        self.output_path: Optional[Path] = None
+        self.profile_paths: Dict[str, Path] = {}
+        self.transcode_decision: Optional[TranscodeDecision] = None
+        self.stream_from_cache: bool = False
+        self.metadata_embedded: bool = False
+        self.resumed_stage: Optional[str] = None
+        self.skip_reason: Optional[str] = None
+        self.journal_data: Dict[str, Any] = {}
+        self.on_bytes: Optional[Callable[[int], None]] = None  # Called with the number of audio bytes downloaded as they arrive (e.g. to report the progress)
+        self.error: Optional[Exception] = None
+        self.failed_stage: Optional[str] = None
+
+    @property
+    def succeeded(self) -> bool:
+        return self.error is None
+
+
+class PipelineStage:
+    """
+    A named processing stage backed by a pool of worker threads.
+    """
+
+    def __init__(self, name: str, func: Callable[[Any], None], workers: int = 1, priority: Optional[Callable[[Any], float]] = None) -> None:
+        """
+        Initialize the PipelineStage class.
+        :param name: The name of the stage.
+        :param func: The function called with each job, it mutates the job in place.
+        :param workers: The number of worker threads for this stage.
+        :param priority: An optional function giving the priority of a waiting job (lowest first), if None the jobs are handled in arrival order.
+        """
+
+        self.name: str = name
+        self.func: Callable[[Any], None] = func
+        self.workers: int = max(1, int(workers))
+        self.priority: Optional[Callable[[Any], float]] = priority
+
+
+class Pipeline:
+    """
+    A staged pipeline where each stage has its own worker pool, connected by bounded queues.
+    A stage with a priority function picks the job with the lowest priority value among the ones waiting for it, instead of the oldest one.
+    """
+
+    def __init__(self, queue_size: int = 32, cancel_event: Optional[Event] = None) -> None:
+        """
+        Initialize the Pipeline class.
+        :param queue_size: The maximum number of jobs waiting between two stages (backpressure).
+        :param cancel_event: The Event object set when a batch is cancelled, shared with the stage functions so their long waits can stop early (if None, a new one is created).
+        """
+
+        self.queue_size: int = max(1, int(queue_size))
+        self.stages: List[PipelineStage] = []
+        self._cancel_event: Event = cancel_event if cancel_event is not None else Event()
+        self._threads: List[Thread] = []
+
+    def add_stage(self, name: str, func: Callable[[Any], None], workers: int = 1, priority: Optional[Callable[[Any], float]] = None) -> 'Pipeline':
+        """
+        Append a stage to the pipeline.
+        :param name: The name of the stage.
+        :param func: The function called with each job.
+        :param workers: The number of worker threads for this stage.
+        :param priority: An optional function giving the priority of a waiting job (lowest first), the jobs waiting for this stage are then kept in a priority queue.
+        :return: The pipeline itself, so calls can be chained.
+        """
+
+        self.stages.append(PipelineStage(name, func, workers, priority))
+
+        return self
+
+    def cancel(self) -> None:
+        """
+        Stop a running batch: the remaining input is not read, the jobs still waiting for a stage leave the pipeline unprocessed, and the call waits for the jobs already running in a stage to finish (or to give up, for the stage functions that watch the cancel event).
+        """
+
+        self._cancel_event.set()
+
+        for thread in self._threads:
+            thread.join()
+
+    def run(self, jobs: Iterable[Any], on_complete: Optional[Callable[[Any], None]] = None, on_event: Optional[Callable[[str, str, Any], None]] = None, keep_jobs: bool = True) -> List[Any]:
+        """
+        Push the jobs through every stage and wait for all of them to finish.
+        A job that fails in one stage keeps its error and skips the remaining stages, so does a job given a "skip_reason" (e.g. already in the library).
+        If the calling thread is interrupted (e.g. Ctrl-C), the batch is cancelled and the worker threads are joined before the exception is raised.
+        :param jobs: The jobs to process (objects with "error" and "failed_stage" attributes).
+        :param on_complete: An optional callback called from the calling thread as each job leaves the pipeline.
+        :param on_event: An optional callback called with (stage name, "queued" | "started" | "finished", job) as the jobs move through the stages (from the worker threads, it must be fast).
+        :param keep_jobs: If False, the finished jobs are only given to on_complete and then released, so any number of jobs runs in bounded memory.
+        :return: The finished jobs, in completion order (empty if keep_jobs is False).
+        """
+
+        if not self.stages:
+            raise Exception('The pipeline has no stages.')
+
+        metrics = get_metrics()
+        queues = [PriorityQueue(maxsize=self.queue_size) if stage.priority else Queue(maxsize=self.queue_size) for stage in self.stages]
+        output_queue = Queue()
+        threads: List[Thread] = []
+        cancel_event = self._cancel_event
+        cancel_event.clear()
+        feed_errors: List[BaseException] = []
+        sequence = count()
+
+        def put(index: int, job: Any) -> None:
+            if index >= len(self.stages):
+                output_queue.put(job)
+            elif self.stages[index].priority:
+                # The sequence number keeps equal priorities in arrival order, the sentinels come after every job
+                if job is _SENTINEL:
+                    priority = float('inf')
+                else:
+                    # A failing priority function must not kill the worker (the sentinels would never be sent), the job is then handled in arrival order with the other unknown costs
+                    try:
+                        priority = self.stages[index].priority(job)
+                    except Exception:
+                        priority = float('-inf')
+
+                queues[index].put((priority, next(sequence), job))
+            else:
+                queues[index].put(job)
+
+        def get(index: int) -> Any:
+            item = queues[index].get()
+
+            return item[2] if self.stages[index].priority else item
+
+        def feed() -> None:
+            # The jobs may be a lazy stream (e.g. input still being resolved), put() blocks while the first stage is busy
+            try:
+                for job in jobs:
+                    if cancel_event.is_set():
+                        break
+
+                    if on_event:
+                        on_event(self.stages[0].name, 'queued', job)
+
+                    put(0, job)
+            except BaseException as e:
+                feed_errors.append(e)
+            finally:
+                for _ in range(self.stages[0].workers):
+                    put(0, _SENTINEL)
+
+        def work(index: int, state: Dict[str, Union[int, Lock]]) -> None:
+            stage = self.stages[index]
+            is_last_stage = index + 1 == len(self.stages)
+
+            while True:
+                job = get(index)
+
+                if job is _SENTINEL:
+                    break
+
+                # After a cancellation the waiting jobs are only passed along, so the sentinels still reach every stage
+                if job.error is None and not getattr(job, 'skip_reason', None) and not cancel_event.is_set():
+                    if on_event:
+                        on_event(stage.name, 'started', job)
+
+                    try:
+                        with metrics.span(stage.name, getattr(job, 'video_id', None)):
+                            stage.func(job)
+                    except Exception as e:
+                        job.error = e
+                        job.failed_stage = stage.name
+
+                    if on_event:
+                        on_event(stage.name, 'finished', job)
+
+                if on_event and not is_last_stage and job.error is None and not getattr(job, 'skip_reason', None) and not cancel_event.is_set():
+                    on_event(self.stages[index + 1].name, 'queued', job)
+
+                put(index + 1, job)
+
+            # The last worker of a stage to finish closes the next stage
+            with state['lock']:
+                state['alive'] -= 1
+                is_last_worker = state['alive'] == 0
+
+            if is_last_worker:
+                next_workers = 1 if is_last_stage else self.stages[index + 1].workers
+
+                for _ in range(next_workers):
+                    put(index + 1, _SENTINEL)
+
+        threads.append(Thread(target=feed, name='pipeline-feeder', daemon=True))
+
+        for index, stage in enumerate(self.stages):
+            state = {'alive': stage.workers, 'lock': Lock()}
+
+            for worker_index in range(stage.workers):
+                threads.append(Thread(target=work, args=(index, state), name=f'pipeline-{stage.name}-{worker_index}', daemon=True))
+
+        self._threads = threads
+
+        for thread in threads:
+            thread.start()
+
+        finished_jobs = []
+
+        try:
+            while True:
+                job = output_queue.get()
+
+                if job is _SENTINEL:
+                    break
+
+                if keep_jobs:
+                    finished_jobs.append(job)
+
+                if on_complete:
+                    on_complete(job)
+        except BaseException:
+            self.cancel()
+            raise
+
+        for thread in threads:
+            thread.join()
+
+        # An error while producing the jobs (e.g. an unreadable input file) is raised in the calling thread
+        if feed_errors:
+            raise feed_errors[0]
+
+        return finished_jobs
+
+
+def build_track_pipeline(config_obj: type, bandwidth_manager: Optional[BandwidthManager] = None, transcode_stats: Optional[TranscodeStats] = None, transcode_pool: Optional[TranscodePool] = None, archive: Optional[DownloadArchive] = None, extraction_cache: Optional[ExtractionCache] = None, cover_store: Optional[CoverArtStore] = None, download_manager: Optional[DownloadManager] = None, journal: Optional[JobJournal] = None, library_index: Optional[LibraryIndex] = None) -> Pipeline:
+    """
+    Build the extract -> download -> transcode -> tag pipeline for YouTube tracks.
+    :param config_obj: The configuration object.
+    :param bandwidth_manager: The BandwidthManager object that splits the bandwidth and connection budgets among the downloads (if None, the downloader picks its own settings).
+    :param transcode_stats: The TranscodeStats object where the transcode decisions of the batch are counted.
+    :param transcode_pool: The TranscodePool object that runs the transcoding jobs (if None, they run in the transcode stage threads).
+    :param archive: The DownloadArchive object where every finished track is recorded.
+    :param extraction_cache: The ExtractionCache object used to skip repeated extractions and analyses.
+    :param cover_store: The CoverArtStore object that fetches and processes the cover images (if None, one is created from the configuration).
+    :param download_manager: The DownloadManager object shared by every download of the run (if None, the process-wide one is used).
+    :param journal: The JobJournal object where the stage transitions are recorded, tracks found in it resume after their last completed stage.
+    :param library_index: The LibraryIndex object used to skip the tracks already in the music library (also renamed files and re-uploads), every new output is added to it.
+    :return: The configured Pipeline object.
+    """
+
+    # Imported here to keep the application startup fast
+    from streamsnapper import YouTube
+
+    metrics = get_metrics()
+    request_guard = get_request_guard()
+
+    # Set by the pipeline when a batch is cancelled, the downloads and the waits of the request guard then stop early
+    cancel_event = request_guard.cancel_event
+
+    download_manager = download_manager or get_download_manager()
+    cover_store = cover_store or CoverArtStore(config_obj.covers_path, config_obj.cover_max_size, config_obj.cover_quality, download_manager.fetch_bytes)
+
+    # Sources are downloaded outside the music folder (on the same filesystem), only finished outputs are renamed into it
+    incomplete_path = Path(config_obj.incomplete_downloads_path)
+    incomplete_path.mkdir(parents=True, exist_ok=True)
+
+    # Every additional output profile is produced by the transcode stage, from the same decode as the main output
+    output_profiles = load_output_profiles(config_obj)
+
+    for profile in output_profiles:
+        profile.path.mkdir(parents=True, exist_ok=True)
+
+    # streamsnapper keeps the last extraction on the instance, so an instance is only used by one worker at a time
+    # Idle instances are kept with the pipeline, so they stay warm between the batches of a long-running process
+    idle_youtubes: List[YouTube] = []
+    idle_youtubes_lock = Lock()
+
+    @contextmanager
+    def borrow_youtube() -> Iterator[YouTube]:
+        with idle_youtubes_lock:
+            youtube = idle_youtubes.pop() if idle_youtubes else None
+
+        youtube = youtube or YouTube(logging=False)
+
+        try:
+            yield youtube
+        finally:
+            with idle_youtubes_lock:
+                idle_youtubes.append(youtube)
+
+    def extract_streams(job: TrackJob, cached_information: Any = None) -> None:
+        with borrow_youtube() as youtube:
+            youtube.extract(url=job.url)
+
+            # Only the stream data has to be refreshed when the stable information is already known
+            with metrics.span('analyze', job.video_id):
+                if cached_information:
+                    job.information = cached_information
+                else:
+                    youtube.analyze_information(check_thumbnails=True, retrieve_dislike_count=False)
+                    job.information = youtube.information
+
+                youtube.analyze_audio_streams(preferred_language='local')
+                job.stream_info = youtube.best_audio_stream
+
+    def refresh_stream_info(job: TrackJob) -> None:
+        request_guard.call('extract', extract_streams, job, job.information)
+
+        job.stream_from_cache = False
+
+        # The refreshed stream may come in another container
+        if job.audio_path:
+            job.audio_path = job.audio_path.with_suffix(f'.{job.stream_info["extension"]}')
+
+        if extraction_cache:
+            extraction_cache.put(job.video_id, stream_info=job.stream_info)
+
+    def skip_if_in_library(job: TrackJob, title: Optional[str] = None, artist: Optional[str] = None, duration: Optional[float] = None) -> bool:
+        if library_index is None or not config_obj.skip_library_duplicates:
+            return False
+
+        # With output profiles, a track is only skipped once its profile outputs are known and all exist, so a missing one is produced again
+        if output_profiles and not (job.profile_paths and all(path.is_file() for path in job.profile_paths.values())):
+            return False
+
+        duplicate_path = library_index.find_duplicate(job.video_id, title, artist, duration)
+
+        if not duplicate_path:
+            return False
+
+        job.skip_reason = 'duplicate'
+        job.output_path = duplicate_path
+        metrics.increment('tracks_duplicate')
+
+        # The archive points to the existing file, so the next runs skip the track before anything is extracted
+        if archive is not None and job.video_id:
+            archive.add(job.video_id, duplicate_path)
+
+        return True
+
+    def extract(job: TrackJob) -> None:
+        # A file of the library may hold the track under another name (renamed file), this is checked before anything is extracted (after it with output profiles)
+        if skip_if_in_library(job):
+            return
+
+        cached_information = extraction_cache.get_information(job.video_id) if extraction_cache and job.video_id else None
+        cached_stream_info = extraction_cache.get_stream_info(job.video_id) if cached_information else None
+
+        if cached_information and cached_stream_info:
+            job.information = cached_information
+            job.stream_info = cached_stream_info
+            job.stream_from_cache = True
+        else:
+            request_guard.call('extract', extract_streams, job, cached_information)
+
+            if extraction_cache:
+                extraction_cache.put(job.information.id, information=None if cached_information else job.information, stream_info=job.stream_info)
+
+        job.video_id = job.information.id
+        job.audio_path = Path(incomplete_path, f'{job.information.cleanTitle} [{job.information.id}].{job.stream_info["extension"]}').resolve()
+        job.output_path = Path(config_obj.default_downloaded_musics_path, f'{job.information.cleanTitle} [{job.information.id}].opus').resolve()
+        job.profile_paths = {profile.name: profile.get_output_path(job.information.cleanTitle, job.information.channelName, get_year(job), job.information.id) for profile in output_profiles}
+
+        # The same song may be in the library under another video ID (re-upload)
+        if skip_if_in_library(job, job.information.title, job.information.channelName, getattr(job.information, 'duration', None)):
+            return
+
+        # With output profiles, the archive is checked here (the profile paths depend on the track information), so a missing profile output is still produced
+        if output_profiles and archive is not None and archive.contains(job.video_id) and outputs_exist(job):
+            job.skip_reason = 'archived'
+
+    def outputs_exist(job: TrackJob) -> bool:
+        return job.output_path.is_file() and all(path.is_file() for path in job.profile_paths.values())
+
+    def get_stream_key(job: TrackJob) -> Optional[str]:
+        # Identifies the stream a partial file was written from (a new extraction may pick another format with the same extension)
+        itag = (job.stream_info or {}).get('itag', (job.stream_info or {}).get('youtubeFormatId'))
+
+        return f'{itag}:{job.stream_info.get("size")}' if itag is not None else None
+
+    def fetch_audio(job: TrackJob, partial_path: Path, connection_speed: Union[float, str] = 'auto', max_connections: Union[int, str] = 'auto') -> None:
+        if config_obj.download_backend == 'stream':
+            def on_chunk(size: int) -> None:
+                # The partial file is kept, so the next run continues it
+                if cancel_event.is_set():
+                    raise Exception('Failed to finish the download, the batch was cancelled.')
+
+                if bandwidth_manager:
+                    bandwidth_manager.throttle(size, cancel_event)
+
+                if job.on_bytes:
+                    job.on_bytes(size)
+
+            # A partial file is only continued if a previous run wrote it sequentially (TurboDL writes its parts out of order) from the same stream
+            stream_key = get_stream_key(job)
+            resume = job.journal_data.get('downloader') == 'stream' and stream_key is not None and job.journal_data.get('stream_key') == stream_key
+
+            try:
+                download_manager.stream_download(job.stream_info['url'], partial_path, resume=resume, on_chunk=on_chunk)
+            finally:
+                # Whatever is left in the partial file was written sequentially from this stream, so a retry can continue it
+                job.journal_data['downloader'] = 'stream'
+                job.journal_data['stream_key'] = stream_key
+        else:
+            partial_path.unlink(missing_ok=True)
+            download_manager.download(job.stream_info['url'], partial_path, connection_speed, max_connections)
+
+            # TurboDL does not report its progress, the whole file is counted once it is written
+            if job.on_bytes:
+                job.on_bytes(partial_path.stat().st_size)
+
+    def download_audio(job: TrackJob) -> None:
+        partial_path = get_partial_path(job.audio_path)
+
+        with metrics.span('audio_download', job.video_id):
+            if bandwidth_manager:
+                with bandwidth_manager.transfer() as allocation:
+                    previous_size = partial_path.stat().st_size if partial_path.is_file() else 0
+                    fetch_audio(job, partial_path, allocation.connection_speed, 1 if config_obj.download_backend == 'stream' else allocation.max_connections)
+                    allocation.bytes_transferred = max(0, partial_path.stat().st_size - previous_size)
+            else:
+                fetch_audio(job, partial_path)
+
+        partial_path.replace(job.audio_path)
+        metrics.add_bytes('audio_download', job.audio_path.stat().st_size)
+
+    def download(job: TrackJob) -> None:
+        with metrics.span('thumbnail', job.video_id):
+            job.cover_image_path = cover_store.get_cover(job.information.thumbnails)
+
+        # Resume: the source (or the output) was already written by a previous run
+        if job.resumed_stage == 'download' and job.audio_path.is_file():
+            return
+        elif job.resumed_stage == 'transcode' and outputs_exist(job):
+            return
+
+        # A stream URL about to expire is refreshed before the download starts
+        expires_at = get_stream_url_expiration(job.stream_info.get('url'))
+        refresh_count = 0
+
+        if expires_at and expires_at < time() + 60:
+            refresh_stream_info(job)
+
+        while True:
+            try:
+                request_guard.call('media', download_audio, job)
+                return
+            except Exception as e:
+                # A cached stream URL that fails or a stream URL rejected as expired is extracted again, without losing the track
+                if cancel_event.is_set() or refresh_count >= config_obj.max_stream_refreshes or not (job.stream_from_cache or is_expired_stream_error(e)):
+                    raise
+
+            if extraction_cache:
+                extraction_cache.invalidate_streams(job.video_id)
+
+            refresh_stream_info(job)
+            refresh_count += 1
+            metrics.increment('stream_refreshes')
+
+    def get_year(job: TrackJob) -> int:
+        return datetime.fromtimestamp(job.information.uploadTimestamp).year
+
+    def transcode(job: TrackJob) -> None:
+        bitrate = int(job.stream_info['bitrate'])
+
+        if config_obj.max_output_bitrate:
+            bitrate = min(bitrate, config_obj.max_output_bitrate)
+
+        job.transcode_decision = choose_transcode_action(job.stream_info, config_obj.max_output_bitrate or None)
+
+        # Resume: the outputs were already produced by a previous run
+        if job.resumed_stage == 'transcode' and outputs_exist(job):
+            job.metadata_embedded = bool(job.journal_data.get('metadata_embedded'))
+            return
+
+        log_transcode_decision(job.url, job.transcode_decision, transcode_stats)
+
+        # The tags and the cover image are written while the output is produced, so the file is only written once
+        tags = build_tags(job.information.title, job.information.channelName, get_year(job))
+        profile_outputs = [profile.to_output(job.profile_paths[profile.name]) for profile in output_profiles]
+
+        if transcode_pool:
+            job.metadata_embedded = transcode_pool.run(job.audio_path, job.output_path, bitrate, job.transcode_decision.action, config_obj.transcode_backend, tags, job.cover_image_path, profile_outputs)
+        else:
+            job.metadata_embedded = run_transcode_job(job.audio_path, job.output_path, bitrate, job.transcode_decision.action, config_obj.transcode_backend, tags, job.cover_image_path, profile_outputs)
+
+    def tag(job: TrackJob) -> None:
+        # Only needed when the output could not be tagged during the transcode (e.g. pydub backend)
+        # The tags are written to a copy that replaces the output, so a crash never leaves a half-tagged file
+        if not job.metadata_embedded:
+            tagging_path = job.output_path.with_name(f'.{job.output_path.stem}.tagging{job.output_path.suffix}')
+
+            try:
+                copyfile(job.output_path, tagging_path)
+                edit_metadata(tagging_path, title=job.information.title, artist=job.information.channelName, year=get_year(job), cover_image=job.cover_image_path)
+                tagging_path.replace(job.output_path)
+            except BaseException:
+                tagging_path.unlink(missing_ok=True)
+                raise
+
+        if archive is not None:
+            archive.add(job.video_id, job.output_path, itag=job.stream_info.get('itag', job.stream_info.get('youtubeFormatId')), bitrate=job.stream_info.get('bitrate'))
+
+        if library_index is not None:
+            library_index.update(job.output_path, job.video_id)
+
+    def journaled(stage_name: str, func: Callable[[TrackJob], None]) -> Callable[[TrackJob], None]:
+        def run(job: TrackJob) -> None:
+            if not journal:
+                func(job)
+                return
+
+            # The previous state is read before the first transition of this run overwrites it
+            if stage_name == 'extract' and job.video_id:
+                job.resumed_stage = journal.get_completed_stage(job.video_id)
+                job.journal_data = journal.get_data(job.video_id)
+
+            def get_journal_data() -> Dict[str, Any]:
+                journal_data = {
+                    'audio_path': job.audio_path.as_posix() if job.audio_path else None,
+                    'output_path': job.output_path.as_posix() if job.output_path else None,
+                    'downloader': config_obj.download_backend,
+                    'metadata_embedded': job.metadata_embedded
+                }
+
+                # The stream of a partial file is kept until the stream of this run is known
+                if job.stream_info:
+                    journal_data['stream_key'] = get_stream_key(job)
+
+                return journal_data
+
+            journal_id = job.video_id or job.url
+            journal.record(journal_id, stage_name, 'started', **get_journal_data())
+
+            try:
+                func(job)
+            except Exception as e:
+                journal.record(job.video_id or journal_id, stage_name, 'failed', error=str(e))
+                raise
+
+            # A stage replayed to resume the track (e.g. the extraction) only updates its values, so the stage completed in a previous run is not lowered
+            is_replayed = job.resumed_stage in track_stage_names and track_stage_names.index(job.resumed_stage) > track_stage_names.index(stage_name)
+            journal.record(job.video_id or journal_id, stage_name, 'started' if is_replayed else 'completed', **get_journal_data())
+
+            # A skipped track is finished, so it is dropped from the journal
+            if job.skip_reason:
+                journal.record(job.video_id or journal_id, journal.final_stage, 'completed')
+
+        return run
+
+    pipeline = Pipeline(queue_size=config_obj.pipeline_queue_size, cancel_event=cancel_event)
+    pipeline.add_stage('extract', journaled('extract', extract), config_obj.extract_workers)
+    pipeline.add_stage('download', journaled('download', download), config_obj.download_workers, get_stage_priority(config_obj.download_scheduling_policy, estimate_download_cost))
+    pipeline.add_stage('transcode', journaled('transcode', transcode), transcode_pool.max_workers if transcode_pool else config_obj.transcode_workers, get_stage_priority(config_obj.transcode_scheduling_policy, estimate_transcode_cost))
+    pipeline.add_stage('tag', journaled('tag', tag), config_obj.tag_workers)
+
+    return pipeline
@@ -0,0 +1,174 @@
+# Built-in imports
+from logging import getLogger
+from os import PathLike
+from pathlib import Path
+from threading import Lock
+from typing import Any, Dict, List, Optional, Union
+
+# Local imports
+from utils.functions import fan_out_audio_with_ffmpeg, get_ffmpeg_binary, remux_audio_with_ffmpeg, transcode_audio
+
+
+logger = getLogger(__name__)
+
+
+class TranscodeAction:
+    """
+    The possible ways of turning a downloaded stream into an OPUS file.
+    """
+
+    remux = 'remux'
+    rewrap = 'rewrap'
+    transcode = 'transcode'
+
+
+class TranscodeDecision:
+    """
+    The action chosen for a source stream and the reason behind it.
+    """
+
+    def __init__(self, action: str, reason: str, codec: Optional[str] = None, container: Optional[str] = None, bitrate: Optional[float] = None) -> None:
+        """
+        Initialize the TranscodeDecision class.
+        :param action: The chosen TranscodeAction.
+        :param reason: A short human-readable explanation of the choice.
+        :param codec: The detected source codec.
+        :param container: The detected source container (file extension).
+        :param bitrate: The source bitrate in kbps.
+        """
+
+        self.action: str = action
+        self.reason: str = reason
+        self.codec: Optional[str] = codec
+        self.container: Optional[str] = container
+        self.bitrate: Optional[float] = bitrate
+
+    def __str__(self) -> str:
+        return f'{self.action} (codec={self.codec}, container={self.container}, bitrate={self.bitrate}k): {self.reason}'
+
+
+class TranscodeStats:
+    """
+    Thread-safe counters of the decisions taken during a batch.
+    """
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self.counts: Dict[str, int] = {TranscodeAction.remux: 0, TranscodeAction.rewrap: 0, TranscodeAction.transcode: 0}
+
+    def record(self, decision: TranscodeDecision) -> None:
+        """
+        Count a decision.
+        :param decision: The decision to count.
+        """
+
+        with self._lock:
+            self.counts[decision.action] += 1
+
+
+def get_stream_codec(stream_info: Dict[str, Any]) -> Optional[str]:
+    """
+    Get the normalized audio codec name of a stream.
+    :param stream_info: The stream information from streamsnapper (analyze_audio_streams).
+    :return: The lowercase codec name (e.g. "opus", "mp4a") or None if it is unknown.
+    """
+
+    for key in ('codec', 'rawCodec', 'mimeType'):
+        value = stream_info.get(key)
+
+        if not value:
+            continue
+
+        value = str(value).lower()
+
+        for codec in ('opus', 'vorbis', 'mp4a', 'aac', 'mp3', 'flac'):
+            if codec in value:
+                return codec
+
+        return value.split('.')[0]
+
+    return None
+
+def choose_transcode_action(stream_info: Dict[str, Any], target_bitrate: Optional[int] = None, ffmpeg_available: Optional[bool] = None) -> TranscodeDecision:
+    """
+    Choose how a downloaded stream should become an OPUS file, avoiding lossy re-encodes whenever possible.
+    :param stream_info: The stream information from streamsnapper (analyze_audio_streams).
+    :param target_bitrate: The maximum output bitrate in kbps (if the source is above it, a re-encode is required). None means keep the source bitrate.
+    :param ffmpeg_available: If the FFmpeg binary can be used for stream copies (if None, it will be looked up in the system PATH).
+    :return: The TranscodeDecision object.
+    """
+
+    codec = get_stream_codec(stream_info)
+    container = str(stream_info.get('extension') or '').lower().lstrip('.') or None
+    bitrate = float(stream_info['bitrate']) if stream_info.get('bitrate') else None
+
+    if ffmpeg_available is None:
+        ffmpeg_available = get_ffmpeg_binary() is not None
+
+    if codec != 'opus':
+        return TranscodeDecision(TranscodeAction.transcode, 'source codec is not OPUS', codec, container, bitrate)
+
+    if target_bitrate and bitrate and bitrate > target_bitrate * 1.1:
+        return TranscodeDecision(TranscodeAction.transcode, f'source bitrate is above the {target_bitrate}k target', codec, container, bitrate)
+
+    if container in ('opus', 'ogg'):
+        return TranscodeDecision(TranscodeAction.rewrap, 'source is already an Ogg OPUS file', codec, container, bitrate)
+
+    if not ffmpeg_available:
+        return TranscodeDecision(TranscodeAction.transcode, 'OPUS source but FFmpeg is not available for a stream copy', codec, container, bitrate)
+
+    return TranscodeDecision(TranscodeAction.remux, f'OPUS stream can be copied out of the {container} container', codec, container, bitrate)
+
+def apply_transcode_decision(path: Union[str, PathLike], output_path: Union[str, PathLike], bitrate: int, action: str, backend: str = 'auto', tags: Optional[Dict[str, Optional[str]]] = None, cover_image: Optional[Union[str, PathLike, bytes]] = None, profile_outputs: Optional[List[Dict[str, Any]]] = None) -> bool:
+    """
+    Produce the OPUS output file according to the chosen action and delete the source file.
+    The tags and the cover image are embedded in the same pass whenever FFmpeg is used.
+    :param path: The path to the source audio file.
+    :param output_path: The path to the output audio file.
+    :param bitrate: The output bitrate in kbps (only used when transcoding).
+    :param action: The TranscodeAction to apply.
+    :param backend: The transcoding backend used when a re-encode is required.
+    :param tags: The tags to embed.
+    :param cover_image: The cover image to embed, as a path or as the image content.
+    :param profile_outputs: The outputs of the additional profiles (see fan_out_audio_with_ffmpeg), produced in the same FFmpeg run as the main output whatever the backend.
+    :return: True if the tags and the cover image were embedded, False if they still have to be written with edit_metadata.
+    """
+
+    if action not in (TranscodeAction.remux, TranscodeAction.rewrap, TranscodeAction.transcode):
+        raise ValueError(f'Invalid transcode action: {action}')
+
+    if profile_outputs:
+        # An OPUS source is still copied into the main output, only the profile outputs are encoded
+        codec_args = ['-c:a', 'libopus', '-b:a', f'{bitrate}k'] if action == TranscodeAction.transcode else ['-c:a', 'copy']
+        fan_out_audio_with_ffmpeg(path, output_path, codec_args, profile_outputs, tags, cover_image)
+        Path(path).unlink(missing_ok=True)
+        return True
+
+    has_metadata = bool(tags or cover_image)
+
+    # An Ogg OPUS source that needs tags goes through a stream copy instead, so it is only written once
+    if action == TranscodeAction.rewrap and has_metadata and get_ffmpeg_binary():
+        action = TranscodeAction.remux
+
+    if action == TranscodeAction.rewrap:
+        Path(path).replace(output_path)
+        return not has_metadata
+    elif action == TranscodeAction.remux:
+        remux_audio_with_ffmpeg(path, output_path, tags=tags, cover_image=cover_image)
+        Path(path).unlink(missing_ok=True)
+        return True
+
+    return transcode_audio(path, output_path, bitrate, backend, tags, cover_image)
+
+def log_transcode_decision(url: str, decision: TranscodeDecision, stats: Optional[TranscodeStats] = None) -> None:
+    """
+    Log a decision and count it in the batch statistics.
+    :param url: The URL of the track.
+    :param decision: The decision to log.
+    :param stats: The TranscodeStats object of the current batch.
+    """
+
+    logger.info(f'Transcode decision for {url}: {decision}')
+
+    if stats is not None:
+        stats.record(decision)
@@ -0,0 +1,174 @@
+# Built-in imports
+from concurrent.futures import Future, ThreadPoolExecutor
+from json import dumps, loads
+from logging import getLogger, CRITICAL
+from os import PathLike
+from pathlib import Path
+from shutil import which
+from threading import Lock
+from time import time
+from typing import Any, Dict, Optional, Union
+
+# Local imports
+from utils.general import add_directory_to_system_path, download_app_icon, download_latest_ffmpeg, get_latest_app_version, is_image_corrupted
+
+
+class PreflightCache:
+    """
+    A small JSON file that keeps the results of the pre-flight checks between runs.
+    """
+
+    def __init__(self, path: Union[str, PathLike]) -> None:
+        """
+        Initialize the PreflightCache class.
+        :param path: The path to the JSON file (it will be created if it does not exist).
+        """
+
+        self.path: Path = Path(path)
+        self._lock = Lock()
+
+        try:
+            self._data: Dict[str, Any] = loads(self.path.read_text('utf-8'))
+        except (FileNotFoundError, PermissionError, ValueError):
+            self._data = {}
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            return self._data.get(key, default)
+
+    def set(self, **values: Any) -> None:
+        """
+        Update some values and write the file.
+        :param values: The values to update.
+        """
+
+        with self._lock:
+            self._data.update(values)
+
+            try:
+                self.path.write_text(dumps(self._data, indent=4), 'utf-8')
+            except (FileNotFoundError, PermissionError):
+                pass
+
+
+def check_app_version(cache: PreflightCache, ttl: float) -> Optional[str]:
+    """
+    Get the latest version of the application, reusing the last check if it is recent enough.
+    :param cache: The PreflightCache object.
+    :param ttl: How long (in seconds) a successful version check is reused.
+    :return: The latest version of the application or None if the version cannot be fetched.
+    """
+
+    checked_at = cache.get('version_checked_at', 0)
+
+    if cache.get('latest_app_version') and time() - checked_at < ttl:
+        return cache.get('latest_app_version')
+
+    try:
+        latest_app_version = get_latest_app_version()
+    except Exception:
+        latest_app_version = None
+
+    if latest_app_version:
+        cache.set(latest_app_version=latest_app_version, version_checked_at=time())
+
+    return latest_app_version
+
+def check_app_icon(path: Union[str, PathLike]) -> str:
+    """
+    Make sure the application icon exists and is not corrupted, downloading it if needed.
+    :param path: The path to the application icon.
+    :return: "ok", "downloaded", "redownloaded" or "failed".
+    """
+
+    path = Path(path)
+
+    try:
+        if not path.exists():
+            download_app_icon(path)
+            return 'downloaded'
+        elif is_image_corrupted(path):
+            download_app_icon(path)
+            return 'redownloaded'
+    except Exception:
+        return 'failed'
+
+    return 'ok'
+
+def resolve_ffmpeg(config_obj: type, cache: PreflightCache) -> Optional[str]:
+    """
+    Make the FFmpeg binary available in the system PATH, reusing the path resolved in a previous run.
+    :param config_obj: The configuration object.
+    :param cache: The PreflightCache object.
+    :return: The path to the FFmpeg binary or None if it cannot be found.
+    """
+
+    cached_ffmpeg_path = cache.get('ffmpeg_path')
+
+    if cached_ffmpeg_path and Path(cached_ffmpeg_path).is_file():
+        add_directory_to_system_path(Path(cached_ffmpeg_path).parent)
+        return cached_ffmpeg_path
+
+    # Set the logging level to CRITICAL for the FFmpeg and FFprobe classes
+    getLogger('pyffmpeg.pseudo_ffprobe.FFprobe').setLevel(CRITICAL)
+    getLogger('pyffmpeg.misc.Paths').setLevel(CRITICAL)
+
+    # A failed download is not fatal, an FFmpeg binary may still be installed in the system PATH
+    try:
+        download_latest_ffmpeg(config_obj)
+    except Exception:
+        pass
+
+    ffmpeg_path = which('ffmpeg')
+
+    if ffmpeg_path:
+        cache.set(ffmpeg_path=Path(ffmpeg_path).resolve().as_posix())
+
+    return ffmpeg_path
+
+
+class PreflightChecks:
+    """
+    Runs the version check, the icon check and the FFmpeg resolution concurrently in the background.
+    """
+
+    def __init__(self, config_obj: type) -> None:
+        """
+        Initialize the PreflightChecks class.
+        :param config_obj: The configuration object.
+        """
+
+        self.config_obj: type = config_obj
+        self.cache = PreflightCache(config_obj.preflight_cache_path)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._futures: Dict[str, Future] = {}
+
+    def start(self) -> 'PreflightChecks':
+        """
+        Start all checks in the background.
+        :return: The PreflightChecks object itself.
+        """
+
+        self._executor = ThreadPoolExecutor(max_workers=3, thread_name_prefix='preflight')
+        self._futures = {
+            'version': self._executor.submit(check_app_version, self.cache, self.config_obj.version_check_ttl),
+            'icon': self._executor.submit(check_app_icon, Path(self.config_obj.media_path, 'icon.ico')),
+            'ffmpeg': self._executor.submit(resolve_ffmpeg, self.config_obj, self.cache)
+        }
+        self._executor.shutdown(wait=False)
+
+        return self
+
+    def get_latest_app_version(self) -> Optional[str]:
+        return self._futures['version'].result()
+
+    def get_icon_status(self) -> str:
+        return self._futures['icon'].result()
+
+    def get_ffmpeg_path(self) -> Optional[str]:
+        """
+        Wait for the FFmpeg resolution.
+        :return: The path to the FFmpeg binary or None if it cannot be found.
+        """
+
+        return self._futures['ffmpeg'].result()
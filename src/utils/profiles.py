@@ -0,0 +1,95 @@
+# Built-in imports
+from pathlib import Path
+from re import compile as re_compile
+from typing import Any, Dict, List, Optional
+
+
+invalid_filename_characters_regex = re_compile(r'[<>:"/\\|?*\x00-\x1f]')
+
+# The FFmpeg encoder, muxer and file extension of each supported output codec
+output_codecs = {
+    'opus': ('libopus', 'opus', '.opus'),
+    'vorbis': ('libvorbis', 'ogg', '.ogg'),
+    'mp3': ('libmp3lame', 'mp3', '.mp3'),
+    'aac': ('aac', 'ipod', '.m4a'),
+    'flac': ('flac', 'flac', '.flac')
+}
+lossless_codecs = {'flac'}
+ogg_muxers = {'opus', 'ogg'}
+
+
+class OutputProfile:
+    """
+    An additional output format of every track (e.g. a low-bitrate copy for mobile sync), produced from the same decode as the main OPUS output.
+    """
+
+    def __init__(self, name: str, codec: str, bitrate: int, path: str, template: str = '{title} [{id}]') -> None:
+        """
+        Initialize the OutputProfile class.
+        :param name: The name of the profile.
+        :param codec: The output codec ("opus", "vorbis", "mp3", "aac" or "flac").
+        :param bitrate: The output bitrate in kbps (ignored for lossless codecs).
+        :param path: The destination directory of the outputs.
+        :param template: The naming template of the outputs, without the extension (fields: {title}, {artist}, {year} and {id}).
+        """
+
+        if codec not in output_codecs:
+            raise ValueError(f'Invalid output codec for the "{name}" profile: {codec}')
+
+        self.name: str = name
+        self.codec: str = codec
+        self.bitrate: int = int(bitrate)
+        self.path: Path = Path(path).resolve()
+        self.template: str = template
+
+    @property
+    def encoder(self) -> str:
+        return output_codecs[self.codec][0]
+
+    @property
+    def muxer(self) -> str:
+        return output_codecs[self.codec][1]
+
+    @property
+    def extension(self) -> str:
+        return output_codecs[self.codec][2]
+
+    def get_output_path(self, title: str, artist: Optional[str], year: Optional[int], video_id: str) -> Path:
+        """
+        Get the output path of a track in this profile.
+        :param title: The track title.
+        :param artist: The track artist.
+        :param year: The release year.
+        :param video_id: The video ID of the track.
+        :return: The output path.
+        """
+
+        fields = {'title': title, 'artist': artist or '', 'year': year or '', 'id': video_id}
+        filename = self.template.format(**{key: invalid_filename_characters_regex.sub('_', str(value)) for key, value in fields.items()}).strip()
+
+        return Path(self.path, f'{filename}{self.extension}')
+
+    def to_output(self, output_path: Path) -> Dict[str, Any]:
+        """
+        Get the description of an output of this profile, as sent to the transcoding workers.
+        :param output_path: The output path.
+        :return: The output path, the encoder, the muxer and the bitrate (None for lossless codecs).
+        """
+
+        return {'path': output_path.as_posix(), 'encoder': self.encoder, 'muxer': self.muxer, 'bitrate': None if self.codec in lossless_codecs else self.bitrate}
+
+
+def load_output_profiles(config_obj: type) -> List[OutputProfile]:
+    """
+    Load the additional output profiles of a configuration object.
+    :param config_obj: The configuration object.
+    :return: The OutputProfile objects (empty if only the main output is produced).
+    """
+
+    profiles = [OutputProfile(**profile) for profile in config_obj.output_profiles]
+    names = [profile.name for profile in profiles]
+
+    if len(set(names)) != len(names):
+        raise ValueError('Output profile names must be unique.')
+
+    return profiles
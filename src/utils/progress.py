@@ -0,0 +1,215 @@
+# Built-in imports
+from collections import deque
+from sys import stdout
+from threading import Event, Lock, Thread
+from time import monotonic
+from typing import Any, Deque, Dict, Optional, TextIO, Tuple
+
+# Local imports
+from utils.general import ColoredTerminalText as Color, CustomBracket as Bracket
+
+
+def format_duration(seconds: Optional[float]) -> str:
+    """
+    Format a duration for the progress line.
+    :param seconds: The duration in seconds (None if unknown).
+    :return: The formatted duration (e.g. "1h02m", "3m05s", "42s" or "--").
+    """
+
+    if seconds is None:
+        return '--'
+
+    seconds = int(seconds)
+
+    if seconds >= 3600:
+        return f'{seconds // 3600}h{seconds % 3600 // 60:02d}m'
+    elif seconds >= 60:
+        return f'{seconds // 60}m{seconds % 60:02d}s'
+
+    return f'{seconds}s'
+
+
+class ProgressDashboard:
+    """
+    A single progress display for the whole run, fed with the events of every pipeline stage.
+    The events only update counters, the status line is rendered by a background thread at a capped rate.
+    On a terminal, the status line is redrawn in place below the log messages. Otherwise, it is written as a plain log line at a low rate.
+    """
+
+    def __init__(self, refresh_rate: float = 4.0, log_interval: float = 10.0, stream: Optional[TextIO] = None, interactive: Optional[bool] = None, speed_window: float = 10.0) -> None:
+        """
+        Initialize the ProgressDashboard class.
+        :param refresh_rate: The maximum number of redraws per second on a terminal.
+        :param log_interval: The interval between two status lines when the output is not a terminal, in seconds.
+        :param stream: The output stream (defaults to the standard output).
+        :param interactive: True to redraw the status line in place, False for the line-log mode (if None, it is True when the stream is a terminal).
+        :param speed_window: The length of the window the download speed is averaged over, in seconds.
+        """
+
+        self.stream: TextIO = stream or stdout
+        self.interactive: bool = interactive if interactive is not None else self.stream.isatty()
+        self.refresh_interval: float = 1 / max(0.1, refresh_rate) if self.interactive else max(1.0, log_interval)
+        self.speed_window: float = speed_window
+        self.stage_counts: Dict[str, Dict[str, int]] = {}
+        self.totals: Dict[str, int] = {'queued': 0, 'succeeded': 0, 'failed': 0, 'skipped': 0}
+        self._byte_samples: Deque[Tuple[float, int]] = deque()
+        self._started_at: float = monotonic()
+        self._changed: bool = True
+        self._status_visible: bool = False
+        self._lock = Lock()
+        self._write_lock = Lock()
+        self._stop_event = Event()
+        self._thread: Optional[Thread] = None
+
+    def start(self) -> 'ProgressDashboard':
+        """
+        Start the rendering thread.
+        :return: The ProgressDashboard object itself.
+        """
+
+        if not self._thread:
+            self._started_at = monotonic()
+            self._thread = Thread(target=self._render_loop, name='progress-dashboard', daemon=True)
+            self._thread.start()
+
+        return self
+
+    def on_stage_event(self, stage_name: str, event: str, job: Any = None) -> None:
+        """
+        Record a pipeline event (the signature matches the "on_event" callback of Pipeline.run).
+        :param stage_name: The name of the stage.
+        :param event: "queued", "started" or "finished".
+        :param job: The job concerned by the event (unused).
+        """
+
+        with self._lock:
+            counts = self.stage_counts.setdefault(stage_name, {'queued': 0, 'started': 0, 'finished': 0})
+            counts[event] += 1
+
+            # The first stage to see a job is the entry of the pipeline
+            if event == 'queued' and next(iter(self.stage_counts)) == stage_name:
+                self.totals['queued'] += 1
+
+            self._changed = True
+
+    def add_bytes(self, size: int) -> None:
+        """
+        Record downloaded bytes (called as the chunks of the downloads arrive).
+        :param size: The number of bytes.
+        """
+
+        with self._lock:
+            self._byte_samples.append((monotonic(), size))
+            self._changed = True
+
+    def add_result(self, outcome: str) -> None:
+        """
+        Record a finished track.
+        :param outcome: "succeeded", "failed" or "skipped".
+        """
+
+        with self._lock:
+            self.totals[outcome] += 1
+            self._changed = True
+
+    def log(self, message: str) -> None:
+        """
+        Write a permanent message above the status line.
+        :param message: The message.
+        """
+
+        with self._write_lock:
+            if self._status_visible:
+                self.stream.write('\r\x1b[2K')
+                self._status_visible = False
+
+            self.stream.write(f'{message}\n')
+            self.stream.flush()
+
+        with self._lock:
+            self._changed = True
+
+    def get_status(self) -> Dict[str, Any]:
+        """
+        Get the aggregated progress.
+        :return: The totals, the pending and active jobs per stage, the download speed (bytes/s) and the ETA (seconds, None if unknown).
+        """
+
+        now = monotonic()
+
+        with self._lock:
+            while self._byte_samples and self._byte_samples[0][0] < now - self.speed_window:
+                self._byte_samples.popleft()
+
+            window_bytes = sum(size for _, size in self._byte_samples)
+            stages = {name: {'pending': counts['queued'] - counts['started'], 'active': counts['started'] - counts['finished']} for name, counts in self.stage_counts.items()}
+            totals = dict(self.totals)
+
+        elapsed_time = now - self._started_at
+        finished = totals['succeeded'] + totals['failed'] + totals['skipped']
+        remaining = totals['queued'] - finished
+
+        return {
+            **totals,
+            'finished': finished,
+            'stages': stages,
+            'bytes_per_second': window_bytes / min(self.speed_window, elapsed_time) if elapsed_time > 0 else 0.0,
+            'eta': remaining / (finished / elapsed_time) if finished and elapsed_time > 0 else None,
+            'elapsed': elapsed_time
+        }
+
+    def render(self) -> str:
+        status = self.get_status()
+        stages = ' '.join(f'{name} {counts["active"]}+{counts["pending"]}' for name, counts in status['stages'].items())
+
+        if not self.interactive:
+            return f'[progress] {status["finished"]}/{status["queued"]} tracks ({status["succeeded"]} ok, {status["failed"]} failed, {status["skipped"]} skipped), {status["bytes_per_second"] / 1_000_000:.1f} MB/s, stages (active+queued): {stages}, ETA {format_duration(status["eta"])}'
+
+        return (
+            f'{Bracket("~", Color.magenta)} {Color.cyan}{status["finished"]}/{status["queued"]}{Color.blue} tracks '
+            f'({Color.green}{status["succeeded"]} ok{Color.blue}, {Color.red}{status["failed"]} failed{Color.blue}, {status["skipped"]} skipped) '
+            f'{Color.cyan}{status["bytes_per_second"] / 1_000_000:.1f} MB/s{Color.blue} | {stages} | ETA {Color.cyan}{format_duration(status["eta"])}{Color.blue} | {format_duration(status["elapsed"])}'
+        )
+
+    def _render_loop(self) -> None:
+        while not self._stop_event.wait(self.refresh_interval):
+            with self._lock:
+                changed, self._changed = self._changed, False
+
+            # Nothing is written when nothing changed, a single line is written otherwise
+            if changed:
+                self._draw()
+
+    def _draw(self) -> None:
+        line = self.render()
+
+        with self._write_lock:
+            if self.interactive:
+                self.stream.write(f'\r\x1b[2K{line}')
+                self._status_visible = True
+            else:
+                self.stream.write(f'{line}\n')
+
+            self.stream.flush()
+
+    def close(self) -> None:
+        """
+        Stop the rendering thread and leave the final status on its own line.
+        """
+
+        if self._thread:
+            self._stop_event.set()
+            self._thread.join()
+            self._thread = None
+            self._draw()
+
+            if self.interactive:
+                with self._write_lock:
+                    self.stream.write('\n')
+                    self._status_visible = False
+
+    def __enter__(self) -> 'ProgressDashboard':
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
@@ -0,0 +1,335 @@
+# Built-in imports
+from collections import deque
+from random import uniform
+from re import compile as re_compile
+from threading import Condition, Event, Lock
+from time import monotonic, sleep
+from typing import Any, Callable, Deque, Dict, Optional, Tuple, TypeVar
+
+# Local imports
+from utils.metrics import get_metrics
+
+
+T = TypeVar('T')
+status_code_regex = re_compile(r'(?i)(?:http|status|error|code)\D{0,12}\b(4\d\d|5\d\d)\b')
+retryable_status_codes = {408, 429, 500, 502, 503, 504}
+expired_stream_status_codes = {403, 410}
+connection_error_names = {'ConnectionError', 'ConnectTimeout', 'ReadTimeout', 'Timeout', 'ChunkedEncodingError', 'ProtocolError', 'RemoteDisconnected', 'IncompleteRead'}
+
+
+def get_error_status_code(error: BaseException) -> Optional[int]:
+    """
+    Get the HTTP status code behind an error, from its response (requests) or from its message (extractors and downloaders only report it as text).
+    :param error: The raised exception.
+    :return: The HTTP status code or None if the error is not an HTTP error.
+    """
+
+    status_code = getattr(getattr(error, 'response', None), 'status_code', None)
+
+    if isinstance(status_code, int):
+        return status_code
+
+    found_status_code = status_code_regex.search(str(error))
+
+    if found_status_code:
+        return int(found_status_code.group(1))
+    elif 'too many requests' in str(error).lower():
+        return 429
+
+    return None
+
+def is_retryable_error(error: BaseException) -> bool:
+    """
+    Check if an error is transient (rate limiting, server errors, dropped connections), so the same call can be tried again.
+    :param error: The raised exception.
+    :return: True if the call should be retried, False otherwise.
+    """
+
+    if isinstance(error, (ConnectionError, TimeoutError)) or type(error).__name__ in connection_error_names:
+        return True
+
+    return get_error_status_code(error) in retryable_status_codes
+
+def is_expired_stream_error(error: BaseException) -> bool:
+    """
+    Check if a media download failed because the signed stream URL is no longer valid (it has to be extracted again).
+    :param error: The raised exception.
+    :return: True if the stream URL expired, False otherwise.
+    """
+
+    return get_error_status_code(error) in expired_stream_status_codes
+
+
+def wait_unless_cancelled(delay: float, cancel_event: Optional[Event] = None) -> None:
+    """
+    Sleep for a delay, stopping early if a cancel event is set.
+    :param delay: The delay, in seconds.
+    :param cancel_event: An optional Event object that interrupts the wait when it is set.
+    """
+
+    if cancel_event is None:
+        sleep(delay)
+    elif cancel_event.wait(delay):
+        raise Exception('Failed to wait for the request, the operation was cancelled.')
+
+
+class TokenBucket:
+    """
+    A thread-safe token bucket that adapts its rate: it is halved every time the server answers with 429 and it grows back slowly after each success.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None, min_rate_ratio: float = 0.1, recovery_ratio: float = 0.05) -> None:
+        """
+        Initialize the TokenBucket class.
+        :param rate: The maximum number of requests per second (0 disables the limit).
+        :param capacity: The maximum number of tokens (burst size), defaults to the rate (at least 1).
+        :param min_rate_ratio: The lowest rate the bucket can be slowed down to, as a fraction of the maximum rate.
+        :param recovery_ratio: How much the rate grows back after each success, as a fraction of the maximum rate.
+        """
+
+        self.max_rate: float = max(0.0, float(rate))
+        self.rate: float = self.max_rate
+        self.capacity: float = max(1.0, float(capacity if capacity is not None else self.max_rate))
+        self.min_rate: float = self.max_rate * min_rate_ratio
+        self.recovery_ratio: float = recovery_ratio
+        self._tokens: float = self.capacity
+        self._updated_at: float = monotonic()
+        self._lock = Lock()
+
+    def acquire(self, tokens: float = 1.0, cancel_event: Optional[Event] = None) -> float:
+        """
+        Take tokens, waiting until they are available.
+        A request larger than the capacity only waits for a full bucket and leaves the bucket in debt, so the next callers wait for it.
+        :param tokens: The number of tokens to take (e.g. a number of bytes for a byte-rate bucket).
+        :param cancel_event: An optional Event object that interrupts the wait when it is set (an exception is then raised).
+        :return: The time spent waiting, in seconds.
+        """
+
+        if not self.max_rate:
+            return 0.0
+
+        required_tokens = min(tokens, self.capacity)
+        waited_time = 0.0
+
+        while True:
+            with self._lock:
+                now = monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+
+                if self._tokens >= required_tokens:
+                    self._tokens -= tokens
+                    return waited_time
+
+                wait_time = (required_tokens - self._tokens) / self.rate
+
+            wait_unless_cancelled(wait_time, cancel_event)
+            waited_time += wait_time
+
+    def penalize(self) -> None:
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+
+    def reward(self) -> None:
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * self.recovery_ratio)
+
+
+class CircuitBreaker:
+    """
+    A global circuit breaker: when the error rate of the recent calls spikes, every new call waits for a cool-down period instead of hammering a failing service.
+    After the cool-down, calls go through again (half-open), and a single failure re-opens the circuit.
+    """
+
+    def __init__(self, error_rate: float = 0.5, min_calls: int = 10, window: float = 60.0, cooldown: float = 30.0) -> None:
+        """
+        Initialize the CircuitBreaker class.
+        :param error_rate: The fraction of failed calls in the window that opens the circuit (0 disables the breaker).
+        :param min_calls: The minimum number of calls in the window before the error rate is considered.
+        :param window: The length of the sliding window, in seconds.
+        :param cooldown: How long the circuit stays open, in seconds.
+        """
+
+        self.error_rate: float = error_rate
+        self.min_calls: int = max(1, int(min_calls))
+        self.window: float = window
+        self.cooldown: float = cooldown
+        self.opened_count: int = 0
+        self._outcomes: Deque[Tuple[float, bool]] = deque()
+        self._open_until: float = 0.0
+        self._half_open: bool = False
+        self._condition = Condition()
+
+    def wait(self, cancel_event: Optional[Event] = None) -> float:
+        """
+        Wait while the circuit is open.
+        :param cancel_event: An optional Event object that interrupts the wait when it is set (an exception is then raised).
+        :return: The time spent waiting, in seconds.
+        """
+
+        started_at = monotonic()
+
+        while True:
+            with self._condition:
+                remaining_time = self._open_until - monotonic()
+
+            if remaining_time <= 0:
+                return monotonic() - started_at
+
+            wait_unless_cancelled(remaining_time, cancel_event)
+
+    def record(self, succeeded: bool) -> None:
+        """
+        Record the outcome of a call.
+        :param succeeded: True if the call succeeded, False if it failed with a transient error.
+        """
+
+        if not self.error_rate:
+            return
+
+        with self._condition:
+            now = monotonic()
+            self._outcomes.append((now, succeeded))
+
+            while self._outcomes and self._outcomes[0][0] < now - self.window:
+                self._outcomes.popleft()
+
+            if now < self._open_until:
+                return
+
+            failed_calls = sum(1 for _, outcome in self._outcomes if not outcome)
+
+            if (self._half_open and not succeeded) or (len(self._outcomes) >= self.min_calls and failed_calls / len(self._outcomes) >= self.error_rate):
+                self._open_until = now + self.cooldown
+                self._half_open = True
+                self._outcomes.clear()
+                self.opened_count += 1
+            elif self._half_open and succeeded:
+                self._half_open = False
+
+
+class RequestGuard:
+    """
+    Rate limits, retries and a shared circuit breaker for the calls made to remote services, per endpoint class ("search", "playlist", "extract" and "media").
+    Transient errors (429, 5xx, dropped connections) are retried with a jittered exponential backoff, any other error is raised immediately.
+    """
+
+    def __init__(self, rate_limits: Optional[Dict[str, float]] = None, max_retries: int = 4, base_delay: float = 1.0, max_delay: float = 30.0, circuit_breaker: Optional[CircuitBreaker] = None) -> None:
+        """
+        Initialize the RequestGuard class.
+        :param rate_limits: The maximum number of requests per second of each endpoint class (missing or 0 disables the limit).
+        :param max_retries: The maximum number of retries of a call that failed with a transient error.
+        :param base_delay: The backoff delay before the first retry, in seconds (doubled on every retry, with full jitter).
+        :param max_delay: The maximum backoff delay, in seconds.
+        :param circuit_breaker: The CircuitBreaker object shared by every endpoint class (if None, a default one is created).
+        """
+
+        self.max_retries: int = max(0, int(max_retries))
+        self.base_delay: float = base_delay
+        self.max_delay: float = max_delay
+        self.circuit_breaker: CircuitBreaker = circuit_breaker or CircuitBreaker()
+        self.cancel_event: Event = Event()  # Once set (e.g. on Ctrl-C), the waits stop early and the calls fail instead of being made or retried
+        self._buckets: Dict[str, TokenBucket] = {endpoint: TokenBucket(rate) for endpoint, rate in (rate_limits or {}).items()}
+        self._lock = Lock()
+
+    def configure(self, config_obj: type) -> 'RequestGuard':
+        """
+        Apply the rate limit, retry and circuit breaker settings of a configuration object.
+        :param config_obj: The configuration object.
+        :return: The RequestGuard object itself.
+        """
+
+        with self._lock:
+            self.max_retries = max(0, int(config_obj.max_retries))
+            self.base_delay = config_obj.retry_base_delay
+            self.max_delay = config_obj.retry_max_delay
+            self.circuit_breaker = CircuitBreaker(config_obj.circuit_breaker_error_rate, config_obj.circuit_breaker_min_calls, config_obj.circuit_breaker_window, config_obj.circuit_breaker_cooldown)
+            self._buckets = {endpoint: TokenBucket(rate) for endpoint, rate in config_obj.endpoint_rate_limits.items()}
+
+        return self
+
+    def get_backoff_delay(self, attempt: int, error: BaseException) -> float:
+        """
+        Get the delay before a retry: the "Retry-After" header when the server sent one, otherwise a jittered exponential backoff.
+        :param attempt: The number of the retry (0 for the first one).
+        :param error: The error of the failed call.
+        :return: The delay, in seconds.
+        """
+
+        retry_after = getattr(getattr(error, 'response', None), 'headers', {}).get('Retry-After')
+
+        try:
+            return min(self.max_delay, float(retry_after))
+        except (TypeError, ValueError):
+            return uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def call(self, endpoint: str, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """
+        Call a function that reaches a remote service, within the limits of its endpoint class.
+        :param endpoint: The endpoint class ("search", "playlist", "extract" or "media").
+        :param func: The function to call.
+        :param args: The positional arguments of the function.
+        :param kwargs: The keyword arguments of the function.
+        :return: The return value of the function.
+        """
+
+        metrics = get_metrics()
+
+        with self._lock:
+            bucket, circuit_breaker = self._buckets.get(endpoint), self.circuit_breaker
+
+        attempt = 0
+
+        while True:
+            if self.cancel_event.is_set():
+                raise Exception(f'Failed to call the {endpoint} endpoint, the operation was cancelled.')
+
+            waited_time = circuit_breaker.wait(self.cancel_event) + (bucket.acquire(cancel_event=self.cancel_event) if bucket else 0.0)
+
+            if waited_time:
+                metrics.record(f'{endpoint}_throttled', waited_time)
+
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                if not is_retryable_error(e):
+                    raise
+
+                circuit_breaker.record(False)
+
+                if bucket and get_error_status_code(e) == 429:
+                    bucket.penalize()
+
+                if attempt >= self.max_retries:
+                    raise
+
+                metrics.increment(f'{endpoint}_retries')
+                wait_unless_cancelled(self.get_backoff_delay(attempt, e), self.cancel_event)
+                attempt += 1
+                continue
+
+            circuit_breaker.record(True)
+
+            if bucket:
+                bucket.reward()
+
+            return result
+
+
+_request_guard: Optional[RequestGuard] = None
+_request_guard_lock = Lock()
+
+
+def get_request_guard() -> RequestGuard:
+    """
+    Get the request guard of the process, creating it on first use.
+    :return: The shared RequestGuard object.
+    """
+
+    global _request_guard
+
+    with _request_guard_lock:
+        if _request_guard is None:
+            _request_guard = RequestGuard()
+
+        return _request_guard
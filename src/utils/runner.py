@@ -0,0 +1,342 @@
+# Built-in imports
+from contextlib import ExitStack
+from pathlib import Path
+from shutil import move
+from threading import Lock
+from typing import Any, Callable, Dict, Iterable, List, Optional, Union
+
+# Local imports
+from utils.archive import DownloadArchive, filter_archived_urls
+from utils.bandwidth import BandwidthManager
+from utils.cache import ExtractionCache, QueryCache
+from utils.classifier import IngestionStats, URLClassifier, classify_url, iter_track_urls, extract_video_id
+from utils.journal import JobJournal
+from utils.library import LibraryIndex
+from utils.metrics import get_metrics
+from utils.network import get_download_manager
+from utils.pipeline import Pipeline, TrackJob, build_track_pipeline
+from utils.policy import TranscodeStats
+from utils.preflight import PreflightChecks
+from utils.progress import ProgressDashboard
+from utils.resilience import get_request_guard
+from utils.snapshots import PlaylistSnapshotStore
+from utils.transcoder import TranscodePool
+
+
+class TrackSummary:
+    """
+    The outcome of a track that left the pipeline, without the extracted information and stream data of its job.
+    """
+
+    def __init__(self, job: TrackJob) -> None:
+        """
+        Initialize the TrackSummary class.
+        :param job: The finished TrackJob object.
+        """
+
+        self.url: str = job.url
+        self.video_id: Optional[str] = job.video_id
+        self.output_path: Optional[Path] = job.output_path
+        self.skip_reason: Optional[str] = job.skip_reason
+        self.failed_stage: Optional[str] = job.failed_stage
+        self.error: Optional[str] = str(job.error) if job.error is not None else None
+
+    @property
+    def succeeded(self) -> bool:
+        return self.error is None
+
+
+class BatchResult:
+    """
+    The outcome of a batch of queries processed by a SyncRunner.
+    """
+
+    def __init__(self, finished_jobs: List[TrackSummary], skipped_urls: List[str], ingestion_stats: Optional[IngestionStats] = None, counters: Optional[Dict[str, Dict[str, Union[int, float]]]] = None) -> None:
+        """
+        Initialize the BatchResult class.
+        :param finished_jobs: The summaries of the tracks that left the pipeline, in completion order.
+        :param skipped_urls: The URLs skipped because they were already in the download archive (with all their outputs).
+        :param ingestion_stats: The IngestionStats object of the input.
+        :param counters: The counters of the runner components (caches, bandwidth, connections, transcode decisions...) for this batch only, per component.
+        """
+
+        self.finished_jobs: List[TrackSummary] = finished_jobs
+        self.skipped_urls: List[str] = skipped_urls
+        self.ingestion_stats: Optional[IngestionStats] = ingestion_stats
+        self.counters: Dict[str, Dict[str, Union[int, float]]] = counters or {}
+
+    @property
+    def track_sources(self) -> Dict[str, List[str]]:
+        return self.ingestion_stats.track_sources if self.ingestion_stats else {}
+
+    @property
+    def succeeded_jobs(self) -> List[TrackSummary]:
+        return [job for job in self.finished_jobs if job.succeeded and not job.skip_reason]
+
+    @property
+    def duplicate_jobs(self) -> List[TrackSummary]:
+        return [job for job in self.finished_jobs if job.skip_reason == 'duplicate']
+
+    @property
+    def failed_jobs(self) -> List[TrackSummary]:
+        return [job for job in self.finished_jobs if not job.succeeded]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Get a JSON-serializable summary of the batch.
+        :return: The counts and the outcome of every track.
+        """
+
+        return {
+            'succeeded': len(self.succeeded_jobs),
+            'failed': len(self.failed_jobs),
+            'skipped': len(self.skipped_urls),
+            'duplicates': len(self.duplicate_jobs),
+            'tracks': [
+                {'url': job.url, 'video_id': job.video_id, 'sources': self.track_sources.get(job.video_id, []), 'output_path': job.output_path.as_posix() if job.succeeded and job.output_path else None, 'failed_stage': job.failed_stage, 'skip_reason': job.skip_reason, 'error': job.error}
+                for job in self.finished_jobs
+            ],
+            'skipped_urls': self.skipped_urls,
+            'track_sources': self.track_sources,
+            'counters': self.counters,
+            'ingestion': {name: value for name, value in vars(self.ingestion_stats).items() if name != 'track_sources'} if self.ingestion_stats else None
+        }
+
+
+class SyncRunner:
+    """
+    Processes batches of queries/URLs without any user interaction.
+    The pre-flight checks, the caches, the transcoding processes and the pipeline (with its extractor and downloader instances) are set up once and stay warm between batches.
+    """
+
+    def __init__(self, config_obj: type, preflight_checks: Optional[PreflightChecks] = None) -> None:
+        """
+        Initialize the SyncRunner class.
+        :param config_obj: The configuration object.
+        :param preflight_checks: The started PreflightChecks object (if None, the checks are started by the runner).
+        """
+
+        self.config_obj: type = config_obj
+        self.preflight_checks: PreflightChecks = preflight_checks or PreflightChecks(config_obj).start()
+        self.transcode_stats = TranscodeStats()
+        self.archive: Optional[DownloadArchive] = None
+        self.extraction_cache: Optional[ExtractionCache] = None
+        self.query_cache: Optional[QueryCache] = None
+        self.bandwidth_manager: Optional[BandwidthManager] = None
+        self.transcode_pool: Optional[TranscodePool] = None
+        self.journal: Optional[JobJournal] = None
+        self.snapshot_store: Optional[PlaylistSnapshotStore] = None
+        self.library_index: Optional[LibraryIndex] = None
+        self.playlist_sync_stats: Dict[str, int] = {'enumerated': 0, 'from_snapshot': 0, 'changed': 0, 'reordered': 0, 'added': 0, 'removed': 0, 'moved': 0}
+        self._playlist_sync_lock = Lock()
+        self.pipeline: Optional[Pipeline] = None
+        self._exit_stack: Optional[ExitStack] = None
+
+    def open(self) -> 'SyncRunner':
+        """
+        Open the caches and create the transcoding pool and the pipeline.
+        :return: The SyncRunner object itself.
+        """
+
+        if self._exit_stack:
+            return self
+
+        # The rate limits, retries and circuit breaker are shared by every extractor and downloader call of the process
+        get_request_guard().configure(self.config_obj)
+
+        with ExitStack() as exit_stack:
+            # The archive is rebuilt from the music folder if it is empty
+            self.archive = exit_stack.enter_context(DownloadArchive(self.config_obj.archive_path))
+
+            if not len(self.archive):
+                self.archive.rebuild(self.config_obj.default_downloaded_musics_path)
+
+            self.extraction_cache = exit_stack.enter_context(ExtractionCache(self.config_obj.extraction_cache_path, self.config_obj.extraction_cache_information_ttl, self.config_obj.extraction_cache_streams_ttl, self.config_obj.extraction_cache_max_entries))
+            self.query_cache = exit_stack.enter_context(QueryCache(self.config_obj.query_cache_path))
+            self.snapshot_store = exit_stack.enter_context(PlaylistSnapshotStore(self.config_obj.playlist_snapshots_path))
+            self.bandwidth_manager = exit_stack.enter_context(BandwidthManager(self.config_obj.bandwidth_state_path, self.config_obj.max_bandwidth, self.config_obj.max_download_connections, self.config_obj.download_workers, self.config_obj.bandwidth_smoothing))
+            self.transcode_pool = exit_stack.enter_context(TranscodePool(self.config_obj.transcode_workers))
+
+            # Tracks interrupted by a crash are resumed from the last stage they completed
+            self.journal = exit_stack.enter_context(JobJournal(self.config_obj.journal_path))
+            self.library_index = exit_stack.enter_context(LibraryIndex(self.config_obj.library_index_path))
+            self.pipeline = build_track_pipeline(self.config_obj, self.bandwidth_manager, self.transcode_stats, self.transcode_pool, self.archive, self.extraction_cache, journal=self.journal, library_index=self.library_index)
+            self._exit_stack = exit_stack.pop_all()
+
+        return self
+
+    def run(self, lines: Iterable[str], on_complete: Optional[Callable[[TrackJob], None]] = None, ingestion_stats: Optional[IngestionStats] = None, progress: Optional[ProgressDashboard] = None) -> BatchResult:
+        """
+        Resolve and download a batch of queries/URLs as a stream: each track enters the pipeline as soon as its URL is known, while the rest of the input is still being read, searched and expanded.
+        The pipeline queues apply backpressure, so the input is never read further ahead than the pipeline can absorb.
+        :param lines: The input lines (one URL or query per line), they are consumed lazily.
+        :param on_complete: An optional callback called as each track leaves the pipeline.
+        :param ingestion_stats: An optional IngestionStats object where the ingestion counters are updated (a new one is created if None).
+        :param progress: An optional ProgressDashboard object fed with the events of every stage.
+        :return: The BatchResult object.
+        """
+
+        self.open()
+        self.check_ffmpeg()
+
+        # The counters of the runner components live as long as the process, the batch reports their difference
+        counters_before = self._get_counters()
+
+        on_event = None
+
+        if progress:
+            def on_event(stage_name: str, event: str, job: TrackJob) -> None:
+                progress.on_stage_event(stage_name, event, job)
+
+            def report_complete(job: TrackJob) -> None:
+                progress.add_result('failed' if job.error else 'skipped' if job.skip_reason else 'succeeded')
+
+                if on_complete:
+                    on_complete(job)
+
+            on_complete = report_complete
+
+        ingestion_stats = ingestion_stats if ingestion_stats is not None else IngestionStats()
+        urls = iter_track_urls(lines, self.config_obj.search_workers, self.query_cache, self.config_obj.playlist_workers, self.config_obj.ingestion_buffer_size, ingestion_stats, self.sync_playlist)
+        skipped_urls = []
+
+        # The outputs of the profiles are only known after the extraction, the archived tracks are then skipped by the pipeline
+        if not self.config_obj.output_profiles:
+            urls = filter_archived_urls(urls, self.archive, extract_video_id, skipped_urls)
+
+        finished_jobs: List[TrackSummary] = []
+
+        def summarize(job: TrackJob) -> None:
+            # Only a small summary of each track is kept, so a large input does not keep every job (and its extracted information) in memory
+            finished_jobs.append(TrackSummary(job))
+
+            if on_complete:
+                on_complete(job)
+
+        self.pipeline.run((self._create_job(url, progress) for url in urls), on_complete=summarize, on_event=on_event, keep_jobs=False)
+        skipped_urls.extend(job.url for job in finished_jobs if job.skip_reason == 'archived')
+        self._count_jobs(finished_jobs, skipped_urls)
+        batch_counters = {component: {name: value - counters_before[component].get(name, 0) for name, value in values.items()} for component, values in self._get_counters().items()}
+
+        return BatchResult(finished_jobs, skipped_urls, ingestion_stats, batch_counters)
+
+    def check_ffmpeg(self) -> Optional[str]:
+        """
+        Wait for the FFmpeg resolution and make sure FFmpeg is available if output profiles are configured (they are always produced by FFmpeg, whatever the transcoding backend).
+        :return: The path to the FFmpeg binary or None if it cannot be found.
+        """
+
+        ffmpeg_path = self.preflight_checks.get_ffmpeg_path()
+
+        if self.config_obj.output_profiles and not ffmpeg_path:
+            raise Exception('Failed to find the FFmpeg binary, it is required to produce the output profiles.')
+
+        return ffmpeg_path
+
+    @staticmethod
+    def _create_job(url: str, progress: Optional[ProgressDashboard] = None) -> TrackJob:
+        job = TrackJob(url)
+
+        # The downloaded bytes are reported as they arrive, so the speed does not only move when a download finishes
+        if progress:
+            job.on_bytes = progress.add_bytes
+
+        return job
+
+    def sync_playlist(self, classifier: URLClassifier, url: str) -> List[str]:
+        """
+        Get the video URLs of a playlist that still have to be downloaded, using its last snapshot.
+        A playlist enumerated less than "playlist_snapshot_ttl" seconds ago is not enumerated again. Otherwise, the new enumeration is compared with the snapshot.
+        Only the added videos and the videos that are not in the download archive (e.g. failed in a previous run) are returned.
+        :param classifier: The URLClassifier object of the playlist domain.
+        :param url: The playlist URL.
+        :return: The video URLs to download, in playlist order.
+        """
+
+        playlist_id = classify_url(url)[2]
+        snapshot = self.snapshot_store.get(playlist_id)
+
+        if snapshot and snapshot.age < self.config_obj.playlist_snapshot_ttl:
+            video_ids, added_ids = snapshot.video_ids, set()
+            self._count_playlist_sync('from_snapshot')
+        else:
+            video_ids = [video_id for video_id in map(extract_video_id, classifier.expand_playlist(url)) if video_id]
+
+            # An empty enumeration of a known playlist is most likely a failed one, the snapshot is kept
+            if not video_ids and snapshot:
+                video_ids, added_ids = snapshot.video_ids, set()
+            else:
+                diff = self.snapshot_store.put(playlist_id, video_ids)
+                added_ids = set(diff.added)
+                self._count_playlist_sync('changed', int(diff.changed))
+                self._count_playlist_sync('reordered', int(diff.reordered))
+                self._count_playlist_sync('added', len(diff.added))
+                self._count_playlist_sync('removed', len(diff.removed))
+
+                if self.config_obj.removed_tracks_path:
+                    self._move_removed_tracks(playlist_id, diff.removed)
+
+            self._count_playlist_sync('enumerated')
+
+        return [f'https://www.youtube.com/watch?v={video_id}' for video_id in video_ids if video_id in added_ids or not self.archive.contains(video_id)]
+
+    def _move_removed_tracks(self, playlist_id: str, video_ids: List[str]) -> None:
+        for video_id in video_ids:
+            entry = self.archive.get(video_id)
+
+            # A track that is still part of another synced playlist stays in the mirror folder
+            if not entry or self.snapshot_store.is_referenced(video_id, playlist_id):
+                continue
+
+            output_path = Path(entry['output_path'])
+
+            if output_path.is_file():
+                Path(self.config_obj.removed_tracks_path).mkdir(parents=True, exist_ok=True)
+                move(output_path.as_posix(), Path(self.config_obj.removed_tracks_path, output_path.name).as_posix())
+                self._count_playlist_sync('moved')
+
+            self.archive.remove(video_id)
+
+    def _count_playlist_sync(self, name: str, value: int = 1) -> None:
+        with self._playlist_sync_lock:
+            self.playlist_sync_stats[name] += value
+
+    def _get_counters(self) -> Dict[str, Dict[str, Union[int, float]]]:
+        with self._playlist_sync_lock:
+            playlist_sync_stats = dict(self.playlist_sync_stats)
+
+        return {
+            'extraction_cache': dict(self.extraction_cache.stats),
+            'bandwidth': dict(self.bandwidth_manager.stats),
+            'connections': get_download_manager().get_connection_stats(),
+            'circuit_breaker': {'opened': get_request_guard().circuit_breaker.opened_count},
+            'transcode': dict(self.transcode_stats.counts),
+            'playlist_sync': playlist_sync_stats
+        }
+
+    def _count_jobs(self, finished_jobs: List[TrackSummary], skipped_urls: List[str]) -> None:
+        metrics = get_metrics()
+        metrics.increment('tracks_succeeded', sum(1 for job in finished_jobs if job.succeeded and not job.skip_reason))
+        metrics.increment('tracks_failed', sum(1 for job in finished_jobs if not job.succeeded))
+        metrics.increment('tracks_skipped', len(skipped_urls))
+
+    def close(self, cancel_pending: bool = False) -> None:
+        """
+        Stop the pipeline threads and the transcoding processes, then close the caches.
+        :param cancel_pending: If True, transcoding jobs that have not started yet are cancelled.
+        """
+
+        if self._exit_stack:
+            # The stage threads of an interrupted batch still use the caches and the transcoding pool
+            if cancel_pending:
+                self.pipeline.cancel()
+
+            self.transcode_pool.shutdown(cancel_pending)
+            self._exit_stack.close()
+            self._exit_stack = None
+
+    def __enter__(self) -> 'SyncRunner':
+        return self.open()
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close(cancel_pending=exc_type is not None)
@@ -0,0 +1,105 @@
+# Built-in imports
+from typing import Any, Callable, Optional
+
+# Local imports
+from utils.policy import TranscodeAction, choose_transcode_action
+
+
+# Relative CPU cost of one second of audio for each transcode action (a stream copy is mostly I/O)
+transcode_action_weights = {TranscodeAction.rewrap: 0.01, TranscodeAction.remux: 0.05, TranscodeAction.transcode: 1.0}
+
+
+class SchedulingPolicy:
+    """
+    The possible orders in which a stage picks the waiting jobs.
+    """
+
+    fifo = 'fifo'  # Input order
+    sjf = 'sjf'  # Shortest job first, more completed tracks early and a shorter time to the first results
+    ljf = 'ljf'  # Longest job first, the long jobs start early so the workers stay busy until the end of the batch
+
+
+def get_track_duration(job: Any) -> Optional[float]:
+    """
+    Get the duration of a track, from its information or estimated from the size and the bitrate of its stream.
+    :param job: The TrackJob object.
+    :return: The duration in seconds or None if it is unknown.
+    """
+
+    duration = getattr(job.information, 'duration', None)
+
+    if duration:
+        return float(duration)
+
+    stream_info = job.stream_info or {}
+
+    if stream_info.get('size') and stream_info.get('bitrate'):
+        return float(stream_info['size']) * 8 / (float(stream_info['bitrate']) * 1000)
+
+    return None
+
+def estimate_download_cost(job: Any) -> Optional[float]:
+    """
+    Estimate the cost of downloading the audio stream of a track.
+    :param job: The TrackJob object (after the extraction).
+    :return: The estimated size of the stream in bytes (0 if the file is already on disk) or None if it is unknown.
+    """
+
+    if job.resumed_stage in ('download', 'transcode'):
+        return 0.0
+
+    stream_info = job.stream_info or {}
+
+    if stream_info.get('size'):
+        return float(stream_info['size'])
+
+    duration = get_track_duration(job)
+
+    return duration * float(stream_info['bitrate']) * 1000 / 8 if duration and stream_info.get('bitrate') else None
+
+def estimate_transcode_cost(job: Any) -> Optional[float]:
+    """
+    Estimate the CPU cost of producing the output of a track.
+    :param job: The TrackJob object (after the download).
+    :return: The duration of the track weighted by the expected transcode action (a stream copy is much cheaper than a re-encode) and the number of additional output profiles, or None if it is unknown.
+    """
+
+    duration = get_track_duration(job)
+
+    if not duration or not job.stream_info:
+        return None
+
+    # FFmpeg is assumed to be available, the exact decision is taken (and logged) by the transcode stage
+    action = choose_transcode_action(job.stream_info, ffmpeg_available=True).action
+
+    # Every additional output profile is one more encoder fed by the same decode
+    return duration * (transcode_action_weights[action] + len(getattr(job, 'profile_paths', {})))
+
+def get_stage_priority(policy: str, estimate_cost: Callable[[Any], Optional[float]]) -> Optional[Callable[[Any], float]]:
+    """
+    Get the priority function of a pipeline stage (the waiting job with the lowest priority value is picked first).
+    Failed and skipped jobs have no work left, they always pass first. Jobs with an unknown cost are handled before the others.
+    :param policy: The SchedulingPolicy of the stage.
+    :param estimate_cost: The function that estimates the cost of a job in this stage.
+    :return: The priority function or None for the FIFO policy (plain queue).
+    """
+
+    policy = policy.lower()
+
+    if policy == SchedulingPolicy.fifo:
+        return None
+    elif policy not in (SchedulingPolicy.sjf, SchedulingPolicy.ljf):
+        raise ValueError(f'Invalid scheduling policy: {policy}')
+
+    def get_priority(job: Any) -> float:
+        if job.error is not None or getattr(job, 'skip_reason', None):
+            return float('-inf')
+
+        cost = estimate_cost(job)
+
+        if cost is None:
+            return float('-inf')
+
+        return cost if policy == SchedulingPolicy.sjf else -cost
+
+    return get_priority
@@ -0,0 +1,130 @@
+# Built-in imports
+from json import dumps, loads
+from os import PathLike
+from pathlib import Path
+from sqlite3 import connect as sqlite_connect
+from threading import Lock
+from time import time
+from typing import List, Optional, Union
+
+
+class PlaylistDiff:
+    """
+    The changes of a playlist between two enumerations.
+    """
+
+    def __init__(self, added: List[str], removed: List[str], reordered: bool) -> None:
+        """
+        Initialize the PlaylistDiff class.
+        :param added: The video IDs that were not in the previous snapshot, in playlist order.
+        :param removed: The video IDs that are no longer in the playlist, in their previous order.
+        :param reordered: True if the video IDs present in both snapshots changed order.
+        """
+
+        self.added: List[str] = added
+        self.removed: List[str] = removed
+        self.reordered: bool = reordered
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.added or self.removed or self.reordered)
+
+
+class PlaylistSnapshot:
+    def __init__(self, playlist_id: str, video_ids: List[str], fetched_at: float) -> None:
+        self.playlist_id: str = playlist_id
+        self.video_ids: List[str] = video_ids
+        self.fetched_at: float = fetched_at
+
+    @property
+    def age(self) -> float:
+        return time() - self.fetched_at
+
+
+def compute_playlist_diff(previous_ids: List[str], current_ids: List[str]) -> PlaylistDiff:
+    """
+    Compare two enumerations of a playlist.
+    :param previous_ids: The video IDs of the previous snapshot, in order.
+    :param current_ids: The current video IDs, in order.
+    :return: The PlaylistDiff object.
+    """
+
+    previous_set, current_set = set(previous_ids), set(current_ids)
+    kept_previous_ids = [video_id for video_id in previous_ids if video_id in current_set]
+    kept_current_ids = [video_id for video_id in current_ids if video_id in previous_set]
+
+    return PlaylistDiff(
+        added=[video_id for video_id in current_ids if video_id not in previous_set],
+        removed=[video_id for video_id in previous_ids if video_id not in current_set],
+        reordered=kept_previous_ids != kept_current_ids
+    )
+
+
+class PlaylistSnapshotStore:
+    """
+    A persistent store of the last enumeration (ordered video IDs and fetch time) of every playlist, so a playlist that was synced recently does not have to be enumerated again.
+    """
+
+    def __init__(self, path: Union[str, PathLike]) -> None:
+        """
+        Initialize the PlaylistSnapshotStore class.
+        :param path: The path to the SQLite database file (it will be created if it does not exist).
+        """
+
+        self.path: Path = Path(path)
+        self._lock = Lock()
+        self._connection = sqlite_connect(self.path.as_posix(), check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('CREATE TABLE IF NOT EXISTS playlists (playlist_id TEXT PRIMARY KEY, video_ids TEXT NOT NULL, fetched_at REAL NOT NULL)')
+        self._connection.commit()
+
+    def get(self, playlist_id: str) -> Optional[PlaylistSnapshot]:
+        """
+        Get the last snapshot of a playlist.
+        :param playlist_id: The playlist ID.
+        :return: The PlaylistSnapshot object or None if the playlist was never enumerated.
+        """
+
+        with self._lock:
+            row = self._connection.execute('SELECT video_ids, fetched_at FROM playlists WHERE playlist_id = ?', (playlist_id,)).fetchone()
+
+        return PlaylistSnapshot(playlist_id, loads(row[0]), row[1]) if row else None
+
+    def put(self, playlist_id: str, video_ids: List[str]) -> PlaylistDiff:
+        """
+        Store a new enumeration of a playlist.
+        :param playlist_id: The playlist ID.
+        :param video_ids: The video IDs of the playlist, in order.
+        :return: The PlaylistDiff object against the previous snapshot (every video is added if there was none).
+        """
+
+        previous_snapshot = self.get(playlist_id)
+
+        with self._lock:
+            self._connection.execute('INSERT OR REPLACE INTO playlists (playlist_id, video_ids, fetched_at) VALUES (?, ?, ?)', (playlist_id, dumps(video_ids), time()))
+            self._connection.commit()
+
+        return compute_playlist_diff(previous_snapshot.video_ids if previous_snapshot else [], video_ids)
+
+    def is_referenced(self, video_id: str, excluded_playlist_id: Optional[str] = None) -> bool:
+        """
+        Check if a video is part of any stored playlist.
+        :param video_id: The video ID.
+        :param excluded_playlist_id: A playlist ID to ignore (e.g. the playlist the video was just removed from).
+        :return: True if another playlist still contains the video, False otherwise.
+        """
+
+        with self._lock:
+            rows = self._connection.execute('SELECT playlist_id, video_ids FROM playlists WHERE video_ids LIKE ?', (f'%"{video_id}"%',)).fetchall()
+
+        return any(playlist_id != excluded_playlist_id and video_id in loads(video_ids) for playlist_id, video_ids in rows)
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    def __enter__(self) -> 'PlaylistSnapshotStore':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
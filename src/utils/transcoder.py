@@ -0,0 +1,148 @@
+# Built-in imports
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import get_context
+from os import PathLike, cpu_count
+from pathlib import Path
+from signal import signal, SIGINT, SIG_IGN
+from threading import Lock
+from typing import Any, Dict, List, Optional, Set, Union
+
+# Local imports
+from utils.policy import apply_transcode_decision
+
+
+def get_partial_path(output_path: Union[str, PathLike]) -> Path:
+    """
+    Get the temporary path used while an output file is being written.
+    :param output_path: The final output path.
+    :return: The temporary path, in the same directory so the final rename is atomic.
+    """
+
+    output_path = Path(output_path)
+
+    return output_path.with_name(f'.{output_path.name}.part')
+
+def _ignore_interrupts() -> None:
+    # Ctrl-C is handled by the parent process, which shuts the pool down and cleans up
+    signal(SIGINT, SIG_IGN)
+
+def run_transcode_job(path: Union[str, PathLike], output_path: Union[str, PathLike], bitrate: int, action: str, backend: str = 'auto', tags: Optional[Dict[str, Optional[str]]] = None, cover_image: Optional[Union[str, PathLike]] = None, profile_outputs: Optional[List[Dict[str, Any]]] = None) -> bool:
+    """
+    Apply a transcode decision to temporary files next to the outputs and rename them, so an output is never seen half-written.
+    :param path: The path to the source audio file.
+    :param output_path: The path to the output audio file.
+    :param bitrate: The output bitrate in kbps.
+    :param action: The TranscodeAction to apply.
+    :param backend: The transcoding backend used when a re-encode is required.
+    :param tags: The tags to embed.
+    :param cover_image: The path to the cover image to embed.
+    :param profile_outputs: The outputs of the additional profiles, produced from the same decode.
+    :return: True if the tags and the cover image were embedded, False if they still have to be written with edit_metadata.
+    """
+
+    profile_outputs = profile_outputs or []
+    partial_path = get_partial_path(output_path)
+    partial_profile_outputs = [{**profile_output, 'path': get_partial_path(profile_output['path']).as_posix()} for profile_output in profile_outputs]
+
+    try:
+        metadata_embedded = apply_transcode_decision(path, partial_path, bitrate, action, backend, tags, cover_image, partial_profile_outputs)
+
+        for profile_output, partial_profile_output in zip(profile_outputs, partial_profile_outputs):
+            Path(partial_profile_output['path']).replace(profile_output['path'])
+
+        partial_path.replace(output_path)
+    except BaseException:
+        for partial_output_path in [partial_path] + [Path(partial_profile_output['path']) for partial_profile_output in partial_profile_outputs]:
+            partial_output_path.unlink(missing_ok=True)
+
+        raise
+
+    return metadata_embedded
+
+
+class TranscodePool:
+    """
+    A process pool that runs transcoding jobs on every available core.
+    Jobs only carry paths and metadata, the audio itself never leaves the worker process.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None) -> None:
+        """
+        Initialize the TranscodePool class.
+        :param max_workers: The number of worker processes (if None or 0, os.cpu_count() is used).
+        """
+
+        self.max_workers: int = max(1, int(max_workers or cpu_count() or 1))
+        self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=get_context('spawn'), initializer=_ignore_interrupts)
+        self._pending_outputs: Set[str] = set()
+        self._lock = Lock()
+
+    def submit(self, path: Union[str, PathLike], output_path: Union[str, PathLike], bitrate: int, action: str, backend: str = 'auto', tags: Optional[Dict[str, Optional[str]]] = None, cover_image: Optional[Union[str, PathLike]] = None, profile_outputs: Optional[List[Dict[str, Any]]] = None) -> Future:
+        """
+        Submit a transcoding job to the pool.
+        :param path: The path to the source audio file.
+        :param output_path: The path to the output audio file.
+        :param bitrate: The output bitrate in kbps.
+        :param action: The TranscodeAction to apply.
+        :param backend: The transcoding backend used when a re-encode is required.
+        :param tags: The tags to embed.
+        :param cover_image: The path to the cover image to embed.
+        :param profile_outputs: The outputs of the additional profiles, produced from the same decode.
+        :return: The Future of the job, it resolves to True if the tags and the cover image were embedded.
+        """
+
+        output_path = Path(output_path).as_posix()
+        output_paths = [output_path] + [profile_output['path'] for profile_output in profile_outputs or []]
+
+        with self._lock:
+            self._pending_outputs.update(output_paths)
+
+        future = self._executor.submit(run_transcode_job, Path(path).as_posix(), output_path, bitrate, action, backend, tags, Path(cover_image).as_posix() if cover_image else None, profile_outputs)
+        future.add_done_callback(lambda finished_future: self._on_job_done(output_paths, finished_future))
+
+        return future
+
+    def run(self, path: Union[str, PathLike], output_path: Union[str, PathLike], bitrate: int, action: str, backend: str = 'auto', tags: Optional[Dict[str, Optional[str]]] = None, cover_image: Optional[Union[str, PathLike]] = None, profile_outputs: Optional[List[Dict[str, Any]]] = None) -> bool:
+        """
+        Submit a transcoding job and wait for it to finish. An error only affects this job.
+        :param path: The path to the source audio file.
+        :param output_path: The path to the output audio file.
+        :param bitrate: The output bitrate in kbps.
+        :param action: The TranscodeAction to apply.
+        :param backend: The transcoding backend used when a re-encode is required.
+        :param tags: The tags to embed.
+        :param cover_image: The path to the cover image to embed.
+        :param profile_outputs: The outputs of the additional profiles, produced from the same decode.
+        :return: True if the tags and the cover image were embedded, False if they still have to be written with edit_metadata.
+        """
+
+        return self.submit(path, output_path, bitrate, action, backend, tags, cover_image, profile_outputs).result()
+
+    def shutdown(self, cancel_pending: bool = False) -> None:
+        """
+        Shut the pool down and remove every partially written output file.
+        :param cancel_pending: If True, jobs that have not started yet are cancelled.
+        """
+
+        self._executor.shutdown(wait=True, cancel_futures=cancel_pending)
+
+        with self._lock:
+            for output_path in self._pending_outputs:
+                get_partial_path(output_path).unlink(missing_ok=True)
+
+            self._pending_outputs.clear()
+
+    def _on_job_done(self, output_paths: List[str], future: Future) -> None:
+        with self._lock:
+            self._pending_outputs.difference_update(output_paths)
+
+        # A worker that died abruptly could not clean up after itself
+        if future.cancelled() or future.exception() is not None:
+            for output_path in output_paths:
+                get_partial_path(output_path).unlink(missing_ok=True)
+
+    def __enter__(self) -> 'TranscodePool':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.shutdown(cancel_pending=exc_type is not None)